@@ -47,6 +47,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'quiz.context_processors.counters',
             ],
         },
     },
@@ -61,6 +62,64 @@ DATABASES = {
     }
 }
 
+# Cache dùng cho đáp án đã biên dịch, đề thi, bộ đếm... PHẢI dùng chung giữa mọi tiến trình:
+# worker `grade_submissions` đọc đáp án từ cache, còn signal xoá cache chạy ở tiến trình web;
+# với cache riêng từng tiến trình (LocMemCache) worker sẽ chấm theo đáp án cũ (xem quiz/checks.py).
+# Mặc định dùng bảng quiz_cache trong DB (tạo bởi migration quiz 0016); khi triển khai thật nên
+# chuyển sang 'django.core.cache.backends.redis.RedisCache' (cần gói redis).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'quiz_cache',
+        'OPTIONS': {
+            # Mặc định 300: quá nhỏ cho đáp án / đề / bộ đếm của mọi đề và người dùng
+            'MAX_ENTRIES': 100000,
+        },
+    }
+}
+
+# Chấm điểm bất đồng bộ: submit_quiz chỉ lưu bài vào hộp thư, worker
+# `python manage.py grade_submissions` chấm theo lô. Nếu bài chờ quá
+# QUIZ_GRADING_FALLBACK_SECONDS giây (worker không chạy), trang chờ sẽ chấm trực tiếp.
+QUIZ_ASYNC_GRADING = True
+QUIZ_GRADING_FALLBACK_SECONDS = 30
+# Bài nộp ở trạng thái "đang chấm" quá QUIZ_GRADING_LEASE_SECONDS giây (tiến trình chấm đã chết) được nhận lại.
+QUIZ_GRADING_LEASE_SECONDS = 120
+
+# Autosave bài làm: trình duyệt gửi bản nháp mỗi QUIZ_AUTOSAVE_CLIENT_SECONDS giây (khi có thay đổi),
+# bản nháp giữ trong cache (dùng chung, xem CACHES) và chỉ ghi xuống DB tối đa một lần mỗi
+# QUIZ_AUTOSAVE_FLUSH_SECONDS giây; với cache riêng từng tiến trình mỗi lần autosave đều ghi xuống DB.
+# Bài nộp trễ hơn hạn làm bài quá QUIZ_SUBMIT_GRACE_SECONDS giây chỉ được chấm phần đã autosave.
+QUIZ_AUTOSAVE_CLIENT_SECONDS = 10
+QUIZ_AUTOSAVE_FLUSH_SECONDS = 30
+QUIZ_SUBMIT_GRACE_SECONDS = 60
+
+# Lưu lựa chọn của câu trắc nghiệm dạng nén trong Result.packed_answers (xem quiz/responses.py),
+# chỉ câu tự luận tạo dòng StudentAnswer. False: mỗi lựa chọn là một dòng StudentAnswer như cũ.
+QUIZ_PACKED_ANSWERS = True
+
+# Import câu hỏi từ Excel chạy nền: file tải lên được lưu ở QUIZ_IMPORT_ROOT cho worker
+# (manage.py process_import_jobs). Nếu job chờ quá QUIZ_IMPORT_FALLBACK_SECONDS giây mà
+# chưa có worker nhận, trang tiến độ sẽ chạy job trong một thread nền.
+QUIZ_IMPORT_ROOT = os.path.join(BASE_DIR, 'imports')
+QUIZ_IMPORT_FALLBACK_SECONDS = 5
+# Tiến trình chạy job import gia hạn lease sau mỗi lô; job RUNNING không được gia hạn quá
+# QUIZ_IMPORT_LEASE_SECONDS giây (worker / thread đã chết) được nhận lại và chạy tiếp từ lô cuối đã lưu.
+QUIZ_IMPORT_LEASE_SECONDS = 120
+
+# Bộ đếm thời gian thực (yêu cầu hỗ trợ chưa đọc, bài chờ chấm) đẩy qua server-sent events, xem
+# quiz/notifications.py. Cần chạy bằng ASGI (uvicorn/daphne config.asgi:application) để giữ kết nối;
+# chạy WSGI thì mỗi lần chỉ gửi 1 bản và trình duyệt kết nối lại sau QUIZ_NOTIFICATION_FALLBACK_RETRY_SECONDS giây.
+# Sự kiện phát ra ở tiến trình khác (VD Result do worker grade_submissions tạo) chỉ tới được trình duyệt qua
+# broker dùng chung: CacheBroker đi qua CACHES (phải là cache dùng chung), các tiến trình web đọc lại mỗi
+# QUIZ_NOTIFICATION_POLL_SECONDS giây. InProcessBroker chỉ phát trong cùng tiến trình: chỉ dùng khi chạy
+# một tiến trình và QUIZ_ASYNC_GRADING = False.
+QUIZ_NOTIFICATION_BROKER = 'quiz.notifications.CacheBroker'
+QUIZ_NOTIFICATION_POLL_SECONDS = 2
+QUIZ_NOTIFICATION_HEARTBEAT_SECONDS = 15
+QUIZ_NOTIFICATION_RETRY_SECONDS = 5
+QUIZ_NOTIFICATION_FALLBACK_RETRY_SECONDS = 60
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -1,6 +1,7 @@
 # quiz/admin.py
 from django.contrib import admin
 from .models import Subject, Question, Answer, Quiz 
+from .signals import deferred_question_refresh
 
 # 1. Đăng ký Môn học (Quan trọng nhất để fix lỗi của bạn)
 @admin.register(Subject)
@@ -20,6 +21,11 @@ class QuestionAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     inlines = [AnswerInline] # Cho phép sửa đáp án ngay trong câu hỏi
 
+    def save_related(self, request, form, formsets, change):
+        # Tính lại search_text / chữ ký MinHash 1 lần cho cả inline đáp án
+        with deferred_question_refresh():
+            super().save_related(request, form, formsets, change)
+
 # 3. Đăng ký Đề thi
 @admin.register(Quiz)
 class QuizAdmin(admin.ModelAdmin):
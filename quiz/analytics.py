@@ -0,0 +1,292 @@
+# quiz/analytics.py
+
+# ===========================================================================
+# PHÂN TÍCH CÂU HỎI (ITEM ANALYSIS): ĐỘ KHÓ, ĐỘ PHÂN BIỆT, PHƯƠNG ÁN NHIỄU, KR-20
+# ===========================================================================
+
+import math
+from array import array
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .answer_key import get_answer_key
+from .models import Question
+from .paper import get_quiz_payload
+from results.models import Attempt, Result
+
+ANALYSIS_TIMEOUT = 60 * 60 * 24
+# Tỉ lệ nhóm giỏi / nhóm yếu dùng cho chỉ số phân biệt
+GROUP_FRACTION = 0.27
+STREAM_CHUNK_SIZE = 5000
+# Định dạng Result.packed_answers (xem quiz/responses.py) và Attempt.question_ids (quiz/attempts.py)
+PACKED_DTYPE = '<u4'
+
+
+def _cache_key(quiz_id):
+    return f'quiz:{quiz_id}:item_analysis'
+
+
+def invalidate_item_analysis(quiz_ids):
+    cache.delete_many([_cache_key(quiz_id) for quiz_id in quiz_ids])
+
+
+def load_responses(quiz):
+    """
+    Đọc toàn bộ câu trả lời của đề bằng MỘT truy vấn (LEFT JOIN Result -> StudentAnswer,
+    stream bằng iterator() nên bài nộp trống vẫn được tính). Lựa chọn lưu dạng nén
+    (Result.packed_answers) được đọc thẳng thành mảng numpy.
+    Trả về (result_ids, mảng hàng, mảng id câu hỏi, mảng id đáp án, mảng điểm tự luận).
+    """
+    result_index = {}
+    rows, question_ids, answer_ids, points = array('q'), array('q'), array('q'), array('d')
+    packed_rows, packed_pairs = [], []
+
+    responses = Result.objects.filter(quiz=quiz).values_list(
+        'id', 'packed_answers',
+        'student_answers__question_id', 'student_answers__selected_answer_id', 'student_answers__points_earned',
+    ).order_by().iterator(chunk_size=STREAM_CHUNK_SIZE)
+    for result_id, packed, question_id, answer_id, points_earned in responses:
+        row = result_index.get(result_id)
+        if row is None:
+            row = result_index[result_id] = len(result_index)
+            if packed:
+                pairs = np.frombuffer(packed, dtype=PACKED_DTYPE).reshape(-1, 2)
+                packed_rows.append(np.full(len(pairs), row, dtype=np.int64))
+                packed_pairs.append(pairs)
+        if question_id is None:
+            continue
+        rows.append(row)
+        question_ids.append(question_id)
+        answer_ids.append(answer_id or 0)
+        points.append(points_earned or 0)
+
+    pairs = np.concatenate(packed_pairs).astype(np.int64) if packed_pairs else np.zeros((0, 2), dtype=np.int64)
+    return (
+        list(result_index),
+        np.concatenate([np.array(rows, dtype=np.int64)] + packed_rows),
+        np.concatenate([np.array(question_ids, dtype=np.int64), pairs[:, 0]]),
+        np.concatenate([np.array(answer_ids, dtype=np.int64), pairs[:, 1]]),
+        np.concatenate([np.array(points, dtype=np.float64), np.zeros(len(pairs))]),
+    )
+
+
+def _lookup(ids, sorted_ids, columns):
+    """Map mảng id -> chỉ số cột (vector hoá bằng searchsorted), id không có trong đề -> -1"""
+    if not len(sorted_ids):
+        return np.full(len(ids), -1, dtype=np.int64)
+    pos = np.searchsorted(sorted_ids, ids).clip(max=len(sorted_ids) - 1)
+    return np.where(sorted_ids[pos] == ids, columns[pos], -1)
+
+
+def load_drawn(quiz, result_ids):
+    """
+    Câu hỏi từng bài làm được bốc (đề bốc ngẫu nhiên / theo khung, Attempt.question_ids): 1 truy vấn.
+    Trả về {chỉ số hàng: mảng id câu hỏi}; bài làm không có trong dict được phát toàn bộ đề.
+    """
+    row_of = {result_id: row for row, result_id in enumerate(result_ids)}
+    drawn = Attempt.objects.filter(result__quiz=quiz, question_ids__isnull=False).values_list('result_id', 'question_ids')
+    return {
+        row_of[result_id]: np.frombuffer(bytes(blob), dtype=PACKED_DTYPE).astype(np.int64)
+        for result_id, blob in drawn.iterator()
+        if result_id in row_of
+    }
+
+
+def drawn_matrix(question_list, n_students, drawn_ids):
+    """Ma trận học sinh × câu hỏi: True nếu câu có trong đề của học sinh (ô False bị loại khỏi mọi chỉ số)"""
+    drawn = np.ones((n_students, len(question_list)), dtype=bool)
+    if not drawn_ids:
+        return drawn
+    q_sorted = np.array(question_list, dtype=np.int64)
+    columns = np.arange(len(question_list), dtype=np.int64)
+    for row, ids in drawn_ids.items():
+        cols = _lookup(ids, q_sorted, columns)
+        drawn[row] = False
+        drawn[row, cols[cols >= 0]] = True
+    return drawn
+
+
+def score_matrix(answer_key, n_students, rows, question_ids, answer_ids, points):
+    """
+    Ma trận học sinh × câu hỏi (0/1) và ma trận học sinh × phương án (đã chọn hay chưa), tính vector hoá.
+    Quy tắc chấm giống quiz/grading.py: nhiều lựa chọn phải đúng và đủ, tự luận đúng khi có điểm.
+    """
+    question_list = sorted(answer_key)
+    question_col = {question_id: j for j, question_id in enumerate(question_list)}
+    option_list = [answer_id for question_id in question_list for answer_id in sorted(answer_key[question_id].answer_ids)]
+    option_col = {answer_id: k for k, answer_id in enumerate(option_list)}
+    n_questions, n_options = len(question_list), len(option_list)
+
+    option_question = np.array([question_col[q] for q in question_list for _ in answer_key[q].answer_ids], dtype=np.int64)
+    option_correct = np.array(
+        [a in answer_key[q].correct_ids for q in question_list for a in sorted(answer_key[q].answer_ids)], dtype=bool
+    )
+    n_correct = np.array([len(answer_key[q].correct_ids) for q in question_list], dtype=np.int64)
+    types = [answer_key[q].type for q in question_list]
+    is_multiple = np.array([t == Question.QuestionType.MULTIPLE_CHOICE for t in types], dtype=bool)
+    is_short = np.array([t == Question.QuestionType.SHORT_ANSWER for t in types], dtype=bool)
+
+    # Map id -> cột (câu hỏi đã bị gỡ khỏi đề / đáp án đã xoá được bỏ qua)
+    q_sorted = np.array(sorted(question_col), dtype=np.int64)
+    q_cols = _lookup(question_ids, q_sorted, np.array([question_col[q] for q in q_sorted.tolist()], dtype=np.int64))
+    o_sorted = np.array(sorted(option_col), dtype=np.int64)
+    o_cols = _lookup(answer_ids, o_sorted, np.array([option_col[a] for a in o_sorted.tolist()], dtype=np.int64))
+
+    selections = np.zeros((n_students, n_options), dtype=bool)
+    chosen = o_cols >= 0
+    selections[rows[chosen], o_cols[chosen]] = True
+
+    size = n_students * n_questions
+    if n_options:
+        flat = np.nonzero(selections.ravel())[0]
+        sel_rows, sel_cols = np.divmod(flat, n_options)
+        cells = sel_rows * n_questions + option_question[sel_cols]
+        correct_hits = np.bincount(cells[option_correct[sel_cols]], minlength=size).reshape(n_students, n_questions)
+        wrong_hits = np.bincount(cells[~option_correct[sel_cols]], minlength=size).reshape(n_students, n_questions)
+    else:
+        correct_hits = wrong_hits = np.zeros((n_students, n_questions), dtype=np.int64)
+
+    short_rows = (q_cols >= 0) & (points > 0)
+    short_hits = np.bincount(rows[short_rows] * n_questions + q_cols[short_rows], minlength=size).reshape(
+        n_students, n_questions
+    )
+
+    single = correct_hits > 0
+    multiple = (correct_hits == n_correct) & (wrong_hits == 0) & (n_correct > 0)
+    scores = np.where(is_multiple, multiple, single)
+    scores = np.where(is_short, short_hits > 0, scores).astype(np.float64)
+    return question_list, option_list, option_question, option_correct, scores, selections
+
+
+def _masked_mean(values, mask, axis=0):
+    """Trung bình theo cột chỉ trên các ô mask (NaN nếu cột không có ô nào)"""
+    counts = mask.sum(axis=axis)
+    sums = np.where(mask, values, 0).sum(axis=axis)
+    return np.divide(sums, counts, out=np.full(counts.shape, np.nan), where=counts > 0)
+
+
+def analyze(scores, selections, drawn, option_question):
+    """
+    Các chỉ số thống kê trên ma trận điểm (học sinh × câu hỏi). Ô không được bốc (drawn = False)
+    không tính là sai: bị loại khỏi độ khó, độ phân biệt, tỉ lệ chọn phương án và KR-20.
+    """
+    n_students, n_questions = scores.shape
+    scores = np.where(drawn, scores, 0.0)
+    n_drawn = drawn.sum(axis=1)
+    totals = scores.sum(axis=1)
+    # Năng lực = tỉ lệ câu đúng trên các câu được bốc (đề đủ câu: tỉ lệ thuận với tổng điểm)
+    ability = np.divide(totals, n_drawn, out=np.zeros(n_students), where=n_drawn > 0)
+
+    p_values = _masked_mean(scores, drawn)
+
+    # Point-biserial với điểm phần còn lại (đã loại câu đang xét), chỉ trên học sinh được bốc câu đó
+    rest_count = n_drawn[:, None] - 1
+    rest = np.divide(totals[:, None] - scores, rest_count, out=np.zeros(scores.shape), where=rest_count > 0)
+    mean_s, mean_r = p_values, _masked_mean(rest, drawn)
+    cov = _masked_mean(scores * rest, drawn) - mean_s * mean_r
+    var_s = _masked_mean(scores * scores, drawn) - mean_s ** 2
+    var_r = _masked_mean(rest * rest, drawn) - mean_r ** 2
+    denom = np.sqrt(np.clip(var_s, 0, None) * np.clip(var_r, 0, None))
+    point_biserial = np.divide(cov, denom, out=np.full(n_questions, np.nan), where=denom > 1e-12)
+
+    # Chỉ số phân biệt nhóm giỏi / nhóm yếu 27%
+    group_size = max(1, math.ceil(GROUP_FRACTION * n_students))
+    order = np.argsort(ability, kind='stable')
+    lower, upper = order[:group_size], order[-group_size:]
+    discrimination = _masked_mean(scores[upper], drawn[upper]) - _masked_mean(scores[lower], drawn[lower])
+
+    # Tỉ lệ chọn phương án: trên số học sinh được bốc câu chứa phương án
+    option_drawn = drawn[:, option_question]
+    option_rates = _masked_mean(selections, option_drawn)
+    option_upper = _masked_mean(selections[upper], option_drawn[upper])
+    option_lower = _masked_mean(selections[lower], option_drawn[lower])
+
+    # KR-20 (độ tin cậy của đề). Đề bốc ngẫu nhiên: k = số câu trung bình mỗi bài, tổng p(1-p)
+    # lấy trung bình trên tập câu của từng học sinh (đề đủ câu: đúng công thức gốc)
+    item_variance = np.nan_to_num(p_values * (1 - p_values))
+    k = n_drawn.mean()
+    variance = totals.var()
+    kr20 = None
+    if k > 1 and variance > 0:
+        kr20 = (k / (k - 1)) * (1 - (drawn @ item_variance).mean() / variance)
+
+    return {
+        'p_values': p_values,
+        'point_biserial': point_biserial,
+        'discrimination': discrimination,
+        'option_rates': option_rates,
+        'option_upper': option_upper,
+        'option_lower': option_lower,
+        'kr20': kr20,
+        'mean_score': totals.mean(),
+    }
+
+
+def _round(value, digits=3):
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+
+def compute_item_analysis(quiz):
+    """Tính phân tích câu hỏi của đề (không dùng cache)"""
+    answer_key = get_answer_key(quiz)
+    payload = {q.id: q for q in get_quiz_payload(quiz)}
+    result_ids, rows, question_ids, answer_ids, points = load_responses(quiz)
+    n_students = len(result_ids)
+    if not n_students or not answer_key:
+        return {'students': n_students, 'kr20': None, 'mean_score': None, 'items': []}
+
+    question_list, option_list, option_question, option_correct, scores, selections = score_matrix(
+        answer_key, n_students, rows, question_ids, answer_ids, points
+    )
+    drawn = drawn_matrix(question_list, n_students, load_drawn(quiz, result_ids))
+    stats = analyze(scores, selections, drawn, option_question)
+
+    items = []
+    for j, question_id in enumerate(question_list):
+        question = payload.get(question_id)
+        answer_texts = dict(question.answers) if question else {}
+        options = [
+            {
+                'answer_id': option_list[k],
+                'text': answer_texts.get(option_list[k], ''),
+                'is_correct': bool(option_correct[k]),
+                'rate': _round(stats['option_rates'][k]),
+                'upper_rate': _round(stats['option_upper'][k]),
+                'lower_rate': _round(stats['option_lower'][k]),
+            }
+            for k in np.nonzero(option_question == j)[0]
+        ]
+        items.append({
+            'question_id': question_id,
+            'text': question.text if question else '',
+            'question_type': answer_key[question_id].type,
+            'p_value': _round(stats['p_values'][j]),
+            'point_biserial': _round(stats['point_biserial'][j]),
+            'discrimination': _round(stats['discrimination'][j]),
+            'options': options,
+        })
+
+    return {
+        'students': n_students,
+        'kr20': _round(stats['kr20']),
+        'mean_score': _round(stats['mean_score'], 2),
+        'items': items,
+    }
+
+
+def get_item_analysis(quiz):
+    """
+    Phân tích câu hỏi của đề, lưu cache theo phiên bản (số bài nộp, id bài nộp lớn nhất):
+    chỉ tính lại khi có Result mới. Cache cũng bị xoá khi đáp án / câu hỏi của đề thay đổi.
+    """
+    version = Result.objects.filter(quiz=quiz).aggregate(count=Count('id'), last=Max('id'))
+    version = (version['count'], version['last'])
+    cached = cache.get(_cache_key(quiz.pk))
+    if cached is not None and cached['version'] == version:
+        return cached['analysis']
+
+    analysis = compute_item_analysis(quiz)
+    cache.set(_cache_key(quiz.pk), {'version': version, 'analysis': analysis}, ANALYSIS_TIMEOUT)
+    return analysis
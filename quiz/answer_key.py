@@ -0,0 +1,123 @@
+# quiz/answer_key.py
+
+# ===========================================================================
+# ĐÁP ÁN BIÊN DỊCH SẴN CHO TỪNG ĐỀ THI (LƯU TRONG CACHE)
+# ===========================================================================
+
+from collections.abc import Mapping
+from typing import NamedTuple
+
+from django.core.cache import cache
+
+from .models import Question, Quiz
+
+# Thời gian sống của đáp án trong cache (giây). Cache bị xoá ngay khi
+# câu hỏi / đáp án / danh sách câu hỏi của đề thay đổi (xem quiz/signals.py).
+ANSWER_KEY_TIMEOUT = 60 * 60 * 24
+
+
+class QuestionKey(NamedTuple):
+    """Đáp án của một câu hỏi: loại câu, id đáp án hợp lệ, id đáp án đúng, ánh xạ Đúng/Sai."""
+    type: str
+    answer_ids: frozenset
+    correct_ids: frozenset
+    true_false: tuple = ()  # (('Đúng', answer_id), ('Sai', answer_id))
+
+    def true_false_id(self, text):
+        """Id đáp án có nội dung 'Đúng' / 'Sai'"""
+        for answer_text, answer_id in self.true_false:
+            if answer_text == text:
+                return answer_id
+        return None
+
+
+class AnswerKey(Mapping):
+    """Map bất biến question_id -> QuestionKey của một đề thi."""
+    __slots__ = ('quiz_id', '_entries')
+
+    def __init__(self, quiz_id, entries):
+        self.quiz_id = quiz_id
+        self._entries = dict(entries)
+
+    def __getitem__(self, question_id):
+        return self._entries[question_id]
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getstate__(self):
+        return self.quiz_id, self._entries
+
+    def __setstate__(self, state):
+        self.quiz_id, self._entries = state
+
+    @property
+    def scorable_count(self):
+        """Số câu được chấm tự động (không tính câu tự luận)"""
+        return sum(1 for entry in self._entries.values() if entry.type != Question.QuestionType.SHORT_ANSWER)
+
+
+def compile_question_key(question_type, answers):
+    """Tạo QuestionKey từ danh sách (answer_id, text, is_correct)"""
+    answer_ids = frozenset(answer_id for answer_id, _, _ in answers)
+    correct_ids = frozenset(answer_id for answer_id, _, is_correct in answers if is_correct)
+    true_false = ()
+    if question_type == Question.QuestionType.TRUE_FALSE:
+        true_false = tuple(sorted((text, answer_id) for answer_id, text, _ in answers))
+    return QuestionKey(question_type, answer_ids, correct_ids, true_false)
+
+
+def compile_answer_key(quiz_id):
+    """
+    Biên dịch đáp án của đề thi bằng MỘT truy vấn (LEFT JOIN qua bảng M2M).
+    """
+    rows = Quiz.questions.through.objects.filter(quiz_id=quiz_id).values_list(
+        'question_id',
+        'question__question_type',
+        'question__answers__id',
+        'question__answers__text',
+        'question__answers__is_correct',
+    )
+
+    types = {}
+    answers = {}
+    for question_id, question_type, answer_id, answer_text, is_correct in rows:
+        types[question_id] = question_type
+        bucket = answers.setdefault(question_id, [])
+        if answer_id is not None:
+            # Câu tự luận không có đáp án
+            bucket.append((answer_id, answer_text, is_correct))
+
+    return AnswerKey(quiz_id, {
+        question_id: compile_question_key(question_type, answers[question_id])
+        for question_id, question_type in types.items()
+    })
+
+
+def _cache_key(quiz_id):
+    return f'quiz:{quiz_id}:answer_key'
+
+
+def get_answer_key(quiz, refresh=False):
+    """Lấy đáp án đã biên dịch của đề thi (từ cache, biên dịch lại nếu chưa có hoặc refresh=True)"""
+    quiz_id = quiz.pk if isinstance(quiz, Quiz) else quiz
+    answer_key = None if refresh else cache.get(_cache_key(quiz_id))
+    if answer_key is None:
+        answer_key = compile_answer_key(quiz_id)
+        cache.set(_cache_key(quiz_id), answer_key, ANSWER_KEY_TIMEOUT)
+    return answer_key
+
+
+def invalidate_answer_keys(quiz_ids):
+    """Xoá đáp án đã cache của các đề thi"""
+    cache.delete_many([_cache_key(quiz_id) for quiz_id in quiz_ids])
+
+
+def quiz_ids_for_questions(question_ids):
+    """Id các đề thi chứa các câu hỏi này"""
+    return set(
+        Quiz.questions.through.objects.filter(question_id__in=question_ids).values_list('quiz_id', flat=True)
+    )
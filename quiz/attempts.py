@@ -0,0 +1,170 @@
+# quiz/attempts.py
+
+# ===========================================================================
+# LƯỢT LÀM BÀI & AUTOSAVE: BẢN NHÁP GIỮ TRONG CACHE, GHI XUỐNG DB THEO LÔ
+# ===========================================================================
+
+import random
+import sys
+from array import array
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .answer_key import get_answer_key
+from .blueprints import student_seed
+from .checks import is_process_local_cache
+from results.models import Attempt
+
+DRAFT_TIMEOUT = 60 * 60 * 12
+
+
+def _draft_key(attempt_id):
+    return f'attempt:{attempt_id}:draft'
+
+
+def _flush_key(attempt_id):
+    return f'attempt:{attempt_id}:flushed'
+
+
+# ===== ĐỀ BỐC NGẪU NHIÊN: MỖI HỌC SINH MỘT TẬP CON CỐ ĐỊNH CỦA BỘ CÂU HỎI =====
+
+def pack_question_ids(question_ids):
+    """[id câu hỏi] -> bytes (mảng uint32 little-endian, đã sắp xếp)"""
+    packed = array('I', sorted(question_ids))
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_question_ids(blob):
+    packed = array('I')
+    packed.frombytes(bytes(blob))
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return frozenset(packed)
+
+
+def draw_questions(quiz, student):
+    """
+    Các câu học sinh nhận được khi đề có pool_size: pool_size câu trong bộ câu của đề, chọn bằng RNG
+    có seed (đề, học sinh) nên mỗi học sinh luôn nhận cùng một tập. None nếu học sinh làm tất cả các câu.
+    """
+    if not quiz.pool_size:
+        return None
+    question_ids = sorted(get_answer_key(quiz))
+    if quiz.pool_size >= len(question_ids):
+        return None
+    return random.Random(student_seed(quiz.pk, student.pk)).sample(question_ids, quiz.pool_size)
+
+
+def attempt_question_ids(attempt):
+    """Tập id câu hỏi đã ghi nhận cho lượt làm bài; None = toàn bộ câu của đề"""
+    if attempt is None or attempt.question_ids is None:
+        return None
+    return unpack_question_ids(attempt.question_ids)
+
+
+def result_question_ids(result):
+    """Tập id câu hỏi của bài làm (theo lượt làm bài gắn với kết quả); None = toàn bộ câu của đề"""
+    try:
+        attempt = result.attempt
+    except Attempt.DoesNotExist:
+        return None
+    return attempt_question_ids(attempt)
+
+
+def current_attempt(quiz, student):
+    """Lượt làm bài đang dở của học sinh (None nếu không có)"""
+    return Attempt.objects.filter(
+        quiz=quiz, student=student, status=Attempt.Status.IN_PROGRESS
+    ).order_by('-number').first()
+
+
+def start_attempt(quiz, student):
+    """
+    Lấy lượt làm bài đang dở của học sinh, hoặc tạo lượt mới (hạn nộp = bắt đầu + thời gian làm bài).
+    Với đề bốc ngẫu nhiên, tập câu của học sinh được ghi vào lượt làm bài ngay khi tạo.
+    """
+    attempt = current_attempt(quiz, student)
+    if attempt:
+        return attempt
+
+    now = timezone.now()
+    deadline = min(now + timedelta(minutes=quiz.duration_minutes), quiz.end_time)
+    number = Attempt.objects.filter(quiz=quiz, student=student).count() + 1
+    try:
+        with transaction.atomic():
+            drawn = draw_questions(quiz, student)
+            return Attempt.objects.create(
+                quiz=quiz, student=student, number=number, deadline=deadline,
+                question_ids=pack_question_ids(drawn) if drawn is not None else None,
+            )
+    except IntegrityError:
+        # Hai tab mở cùng lúc: dùng lượt vừa được tab kia tạo
+        return Attempt.objects.get(quiz=quiz, student=student, number=number)
+
+
+def is_expired(attempt, grace_seconds=0, now=None):
+    now = now or timezone.now()
+    return now > attempt.deadline + timedelta(seconds=grace_seconds)
+
+
+def save_draft(attempt, answers):
+    """
+    Lưu bản nháp vào cache. Bản nháp chỉ được ghi xuống DB tối đa một lần mỗi
+    QUIZ_AUTOSAVE_FLUSH_SECONDS giây cho mỗi lượt làm bài (cache.add làm khoá).
+    Cache riêng từng tiến trình (LocMemCache): tiến trình khác / flush_drafts không thấy bản nháp,
+    nên mỗi lần lưu đều ghi xuống DB.
+    Trả về True nếu lần lưu này đã ghi xuống DB.
+    """
+    cache.set(_draft_key(attempt.pk), answers, DRAFT_TIMEOUT)
+    if is_process_local_cache() or cache.add(_flush_key(attempt.pk), True, settings.QUIZ_AUTOSAVE_FLUSH_SECONDS):
+        flush_draft(attempt.pk, answers)
+        return True
+    return False
+
+
+def flush_draft(attempt_id, answers):
+    """Ghi bản nháp xuống DB (1 UPDATE, bỏ qua nếu lượt làm bài đã nộp)"""
+    Attempt.objects.filter(pk=attempt_id, status=Attempt.Status.IN_PROGRESS).update(
+        draft=answers, draft_saved_at=timezone.now()
+    )
+
+
+def flush_drafts(attempt_ids):
+    """Ghi các bản nháp đang nằm trong cache xuống DB. Trả về số bản nháp đã ghi."""
+    keys = {_draft_key(attempt_id): attempt_id for attempt_id in attempt_ids}
+    drafts = cache.get_many(keys)
+    for key, answers in drafts.items():
+        flush_draft(keys[key], answers)
+    return len(drafts)
+
+
+def load_draft(attempt):
+    """Bản nháp mới nhất: ưu tiên cache, nếu mất cache thì dùng bản đã ghi xuống DB"""
+    draft = cache.get(_draft_key(attempt.pk))
+    return draft if draft is not None else (attempt.draft or {})
+
+
+def discard_draft(attempt):
+    cache.delete_many([_draft_key(attempt.pk), _flush_key(attempt.pk)])
+
+
+def final_answers(draft, data):
+    """
+    Bài làm cuối cùng khi nộp. Form take_quiz luôn chứa toàn bộ trạng thái bài làm
+    (bản nháp được điền lại khi mở lại trang), nên nếu POST có câu trả lời thì dùng POST;
+    nếu POST rỗng (mất kết nối, hết giờ) thì dùng bản nháp đã autosave.
+    """
+    answers = {}
+    for key in data:
+        if key == 'csrfmiddlewaretoken':
+            continue
+        values = [value for value in data.getlist(key) if value != '']
+        if values:
+            answers[key] = values
+    return answers or dict(draft)
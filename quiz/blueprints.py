@@ -0,0 +1,136 @@
+# quiz/blueprints.py
+
+# ===========================================================================
+# BỐC CÂU HỎI THEO KHUNG ĐỀ: LẤY MẪU NGẪU NHIÊN PHÂN TẦNG (KHÔNG DÙNG order_by('?'))
+# ===========================================================================
+#
+# Ngân hàng của mỗi giáo viên được chia thành các "tầng" (môn, độ khó, loại câu hỏi).
+# Danh sách id của mỗi tầng đọc từ index quiz_question_pool_idx (chỉ đọc index, không đọc bảng)
+# và lưu cache dạng mảng int64; mỗi dòng của khung đề bốc ngẫu nhiên đủ số câu từ hợp các tầng
+# của nó. order_by('?') phải sắp xếp toàn bộ ngân hàng mỗi lần bốc, ở đây chỉ tốn O(số câu cần bốc)
+# (khi danh sách id đã có trong cache).
+#
+# Cache bị bỏ khi ngân hàng của giáo viên thay đổi (đổi "phiên bản", xem quiz/signals.py và importer).
+# Truyền seed để bốc lặp lại được, VD: mỗi học sinh một đề riêng nhưng ổn định (student_seed).
+
+import hashlib
+import time
+
+import numpy as np
+from django.core.cache import cache
+
+from .models import Question
+
+# Danh sách id bị bỏ khi ngân hàng thay đổi, TTL chỉ để phòng hờ
+POOL_TIMEOUT = 60 * 60
+
+POOL_DTYPE = np.dtype('<i8')
+
+
+class BlueprintError(Exception):
+    """Ngân hàng không đủ câu hỏi cho khung đề"""
+
+
+def _version_key(created_by_id):
+    return f'quiz:pools:{created_by_id}:version'
+
+
+def _pool_key(created_by_id, version, subject_id, difficulty, question_type):
+    return f'quiz:pools:{created_by_id}:{version}:{subject_id}:{difficulty}:{question_type}'
+
+
+def invalidate_pools(created_by_id):
+    """Bỏ toàn bộ danh sách id đã cache của một giáo viên (câu hỏi được thêm / sửa / xoá)"""
+    cache.delete(_version_key(created_by_id))
+
+
+def rule_strata(rule):
+    """Các tầng (độ khó, loại) mà một dòng khung đề được bốc từ đó"""
+    difficulties = [rule.difficulty] if rule.difficulty else Question.Difficulty.values
+    question_types = [rule.question_type] if rule.question_type else Question.QuestionType.values
+    return [(difficulty, question_type) for difficulty in difficulties for question_type in question_types]
+
+
+def get_pools(created_by_id, subject_id, strata):
+    """{(độ khó, loại): mảng id} của các tầng; tầng chưa có trong cache được đọc từ index, mỗi tầng 1 truy vấn"""
+    version = cache.get_or_set(_version_key(created_by_id), time.time_ns, None)
+    keys = {stratum: _pool_key(created_by_id, version, subject_id, *stratum) for stratum in strata}
+    cached = cache.get_many(keys.values())
+
+    pools = {}
+    for stratum, key in keys.items():
+        if key in cached:
+            pools[stratum] = np.frombuffer(cached[key], dtype=POOL_DTYPE)
+            continue
+        difficulty, question_type = stratum
+        ids = Question.objects.filter(
+            created_by_id=created_by_id, subject_id=subject_id, difficulty=difficulty, question_type=question_type,
+        ).values_list('id', flat=True)
+        pools[stratum] = np.fromiter(ids.iterator(chunk_size=10000), dtype=POOL_DTYPE)
+        cache.set(key, pools[stratum].tobytes(), POOL_TIMEOUT)
+    return pools
+
+
+def student_seed(quiz_id, student_id):
+    """Seed cố định cho cặp (đề, học sinh): bốc lại bao nhiêu lần cũng ra cùng bộ câu"""
+    return int.from_bytes(hashlib.blake2b(f'{quiz_id}:{student_id}'.encode(), digest_size=8).digest(), 'little')
+
+
+def _draw(pools, strata, count, taken, rng):
+    """
+    Bốc count câu chưa bốc từ hợp các tầng mà không nối các mảng id: chọn ngẫu nhiên count + (số câu
+    đã bốc trong các tầng này) vị trí trong [0, tổng số câu), bỏ vị trí đã bốc, lấy count vị trí đầu.
+    taken: {tầng: tập vị trí đã bốc trong mảng id của tầng}. Chỉ tốn O(count), kể cả khi tầng có hàng trăm nghìn câu.
+    """
+    sizes = np.array([len(pools[stratum]) for stratum in strata], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+    used = sum(len(taken.get(stratum, ())) for stratum in strata)
+    if offsets[-1] - used < count:
+        return None
+    picked = []
+    for position in rng.choice(offsets[-1], size=count + used, replace=False).tolist():
+        index = int(np.searchsorted(offsets, position, side='right')) - 1
+        stratum, offset = strata[index], position - int(offsets[index])
+        if offset in taken.setdefault(stratum, set()):
+            continue
+        taken[stratum].add(offset)
+        picked.append(int(pools[stratum][offset]))
+        if len(picked) == count:
+            break
+    return picked
+
+
+def sample_blueprint(blueprint, seed=None, rules=None):
+    """
+    Bốc bộ câu hỏi theo khung đề (list id).
+    Các dòng chồng nhau (VD "10 câu Dễ" và "5 câu Dễ - Một lựa chọn") không bốc trùng câu.
+    Ném BlueprintError nếu một dòng không đủ câu.
+    """
+    rules = list(blueprint.rules.all()) if rules is None else rules
+    rng = np.random.default_rng(seed)
+    strata = {stratum: None for rule in rules for stratum in rule_strata(rule)}
+    pools = get_pools(blueprint.created_by_id, blueprint.subject_id, list(strata))
+
+    chosen = []
+    taken = {}
+    # Dòng hẹp (ít tầng) bốc trước, để dòng rộng không lấy mất câu mà dòng hẹp cần
+    for rule in sorted(rules, key=lambda rule: len(rule_strata(rule))):
+        if not rule.count:
+            continue
+        rule_pools = rule_strata(rule)
+        picked = _draw(pools, rule_pools, rule.count, taken, rng)
+        if picked is None:
+            available = sum(len(pools[stratum]) - len(taken.get(stratum, ())) for stratum in rule_pools)
+            raise BlueprintError(
+                f"Ngân hàng chỉ còn {available} câu phù hợp với dòng \"{rule}\" (cần {rule.count} câu)."
+            )
+        chosen.extend(picked)
+    return chosen
+
+
+def available_counts(blueprint, rules=None):
+    """Số câu hiện có trong ngân hàng cho từng dòng của khung đề (không tính chồng lấn giữa các dòng)"""
+    rules = list(blueprint.rules.all()) if rules is None else rules
+    strata = {stratum: None for rule in rules for stratum in rule_strata(rule)}
+    pools = get_pools(blueprint.created_by_id, blueprint.subject_id, list(strata))
+    return [sum(len(pools[stratum]) for stratum in rule_strata(rule)) for rule in rules]
@@ -0,0 +1,47 @@
+# quiz/checks.py
+
+# ===========================================================================
+# KIỂM TRA CẤU HÌNH (manage.py check, chạy khi khởi động runserver / lệnh quản trị)
+# ===========================================================================
+
+from django.conf import settings
+from django.core.checks import Warning, register
+
+# Cache chỉ nằm trong bộ nhớ của một tiến trình: worker / lệnh quản trị không thấy dữ liệu của web và ngược lại
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_process_local_cache():
+    return settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES
+
+
+def shared_cache_features():
+    """Các tính năng đang bật cần cache dùng chung giữa tiến trình web và worker"""
+    features = []
+    if settings.QUIZ_ASYNC_GRADING:
+        features.append("chấm điểm bất đồng bộ (worker grade_submissions đọc đáp án từ cache)")
+    if settings.QUIZ_AUTOSAVE_FLUSH_SECONDS > 0:
+        features.append(
+            "autosave gộp ghi (bản nháp chỉ nằm trong cache tới QUIZ_AUTOSAVE_FLUSH_SECONDS giây; "
+            "khi cache riêng từng tiến trình, mỗi lần autosave phải ghi thẳng xuống DB)"
+        )
+    if settings.QUIZ_ASYNC_GRADING:
+        features.append("bộ đếm bài chờ chấm (worker grade_submissions cộng / trừ trong cache, quiz/counters.py)")
+    if settings.QUIZ_NOTIFICATION_BROKER == 'quiz.notifications.CacheBroker':
+        features.append("thông báo thời gian thực giữa các tiến trình (CacheBroker)")
+    return features
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    features = shared_cache_features()
+    if not features or not is_process_local_cache():
+        return []
+    return [Warning(
+        "Cache mặc định chỉ nằm trong bộ nhớ của từng tiến trình nhưng đang bật: " + '; '.join(features) + '.',
+        hint="Đặt CACHES['default'] là DatabaseCache hoặc RedisCache để mọi tiến trình dùng chung cache.",
+        id='quiz.W001',
+    )]
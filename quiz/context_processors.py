@@ -0,0 +1,16 @@
+# quiz/context_processors.py
+
+from django.utils.functional import SimpleLazyObject
+
+from .counters import get_counters
+
+
+def counters(request):
+    """
+    {{ counters.unread_tickets }}, {{ counters.open_tickets }}, {{ counters.pending_grading }} (quiz/counters.py).
+    Chỉ đọc cache khi template thực sự dùng tới.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {'counters': SimpleLazyObject(lambda: get_counters(user))}
@@ -0,0 +1,160 @@
+# quiz/counters.py
+
+# ===========================================================================
+# BỘ ĐẾM THEO NGƯỜI DÙNG (YÊU CẦU CHƯA ĐỌC / ĐANG MỞ, BÀI CHỜ CHẤM) GIỮ TRONG CACHE
+# ===========================================================================
+#
+# Mỗi con số là tổng của vài khoá cache dùng chung, VD số yêu cầu chưa đọc trong hộp thư giáo viên
+# = chưa đọc gửi cho GV đó + chưa đọc chưa phân công. Khi SupportTicket / Result được lưu / xoá
+# (quiz/signals.py), các khoá bị ảnh hưởng được cộng / trừ (cache.incr) sau khi commit, so sánh trạng thái
+# lúc nạp từ DB (chụp trong post_init) với trạng thái mới - không truy vấn thêm (trừ khi trường bị defer).
+# Khoá chưa có trong cache (cache nguội, hết hạn) được đếm lại từ DB khi đọc, bằng truy vấn đi theo index.
+#
+# Cache PHẢI dùng chung giữa các tiến trình (CACHES, kiểm tra bởi quiz/checks.py): Result do worker
+# grade_submissions tạo được cộng vào cache của worker; với LocMemCache bộ đếm của tiến trình web
+# không đổi cho tới khi khoá hết hạn. Các nguồn lệch còn lại, tự hết sau tối đa COUNTER_TIMEOUT giây:
+#   - ghi qua QuerySet.update() / bulk_create (không đi qua signal)
+#   - DatabaseCache cộng / trừ bằng đọc rồi ghi (không nguyên tử): hai lần ghi đồng thời có thể mất một
+#     lần cộng. RedisCache cộng / trừ nguyên tử.
+
+from django.core.cache import cache
+from django.db import transaction
+
+from results.models import Result
+from support.models import SupportTicket
+
+from .answer_key import get_answer_key
+from .models import Question, Quiz
+
+# Đếm lại từ DB ít nhất mỗi COUNTER_TIMEOUT giây (phòng ghi không qua signal)
+COUNTER_TIMEOUT = 10 * 60
+
+UNREAD_ALL = 'counters:tickets:unread:all'
+PENDING_GRADING = 'counters:results:pending'
+
+TICKET_FIELDS = ('teacher_id', 'user_id', 'status', 'is_read')
+RESULT_FIELDS = ('quiz_id', 'is_graded')
+
+
+def unread_key(teacher_id):
+    """Yêu cầu chưa đọc gửi cho một giáo viên (None: chưa phân công, hiện trong hộp thư mọi GV)"""
+    return f'counters:tickets:unread:teacher:{teacher_id or "none"}'
+
+
+def open_key(user_id):
+    """Yêu cầu đang chờ xử lý do một người gửi"""
+    return f'counters:tickets:open:user:{user_id}'
+
+
+# ===== ĐẾM LẠI TỪ DB KHI CACHE NGUỘI =====
+
+def _essay_quizzes():
+    return Quiz.objects.filter(questions__question_type=Question.QuestionType.SHORT_ANSWER)
+
+
+def _recount(key):
+    tickets = SupportTicket.objects.order_by()
+    if key == UNREAD_ALL:
+        return tickets.filter(is_read=False).count()
+    if key == PENDING_GRADING:
+        # Cùng phạm vi với trang chấm bài tự luận (grading_dashboard)
+        return Result.objects.filter(is_graded=False, quiz__in=_essay_quizzes()).count()
+    scope, _, owner = key.rpartition(':')
+    owner = None if owner == 'none' else int(owner)
+    if scope == 'counters:tickets:unread:teacher':
+        return tickets.filter(is_read=False, teacher_id=owner).count()
+    if scope == 'counters:tickets:open:user':
+        return tickets.filter(status=SupportTicket.Status.OPEN, user_id=owner).count()
+    raise KeyError(key)
+
+
+def _read(keys):
+    values = cache.get_many(keys)
+    missing = {key: _recount(key) for key in keys if key not in values}
+    if missing:
+        cache.set_many(missing, COUNTER_TIMEOUT)
+        values.update(missing)
+    return {key: max(values[key], 0) for key in keys}
+
+
+def get_counters(user):
+    """
+    Bộ đếm của một người dùng (1 lần đọc cache nếu đã có):
+    open_tickets (mọi người), unread_tickets (GV, admin), pending_grading (GV).
+    """
+    keys = {'open_tickets': [open_key(user.pk)]}
+    if user.role == 'TEACHER':
+        keys['unread_tickets'] = [unread_key(user.pk), unread_key(None)]
+        keys['pending_grading'] = [PENDING_GRADING]
+    elif user.role == 'ADMIN':
+        keys['unread_tickets'] = [UNREAD_ALL]
+    values = _read([key for group in keys.values() for key in group])
+    return {name: sum(values[key] for key in group) for name, group in keys.items()}
+
+
+# ===== CẬP NHẬT TĂNG DẦN KHI GHI =====
+
+def snapshot(instance, fields):
+    """Giá trị hiện tại của các trường; None nếu có trường bị defer (không đọc thêm từ DB)"""
+    if any(field not in instance.__dict__ for field in fields):
+        return None
+    return tuple(instance.__dict__[field] for field in fields)
+
+
+def stored_state(instance, fields):
+    """Trạng thái đã lưu trong DB của một dòng (khi không chụp được lúc nạp, VD trường bị defer)"""
+    return type(instance).objects.filter(pk=instance.pk).values_list(*fields).first()
+
+
+def saved_state(instance, fields, previous):
+    """Trạng thái sau khi lưu: trường bị defer (không được ghi) giữ giá trị cũ"""
+    return tuple(
+        instance.__dict__[field] if field in instance.__dict__ else previous[i]
+        for i, field in enumerate(fields)
+    )
+
+
+def ticket_keys(state):
+    teacher_id, user_id, status, is_read = state
+    keys = []
+    if not is_read:
+        keys += [UNREAD_ALL, unread_key(teacher_id)]
+    if status == SupportTicket.Status.OPEN:
+        keys.append(open_key(user_id))
+    return keys
+
+
+def result_keys(state):
+    quiz_id, is_graded = state
+    if is_graded or not any(
+        entry.type == Question.QuestionType.SHORT_ANSWER for entry in get_answer_key(quiz_id).values()
+    ):
+        return []
+    return [PENDING_GRADING]
+
+
+def _apply(deltas):
+    for key, delta in deltas.items():
+        if not delta:
+            continue
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # Khoá chưa có: lần đọc sau sẽ đếm lại từ DB
+            pass
+
+
+def record_change(old_keys, new_keys):
+    """Cộng / trừ các khoá theo chênh lệch giữa trạng thái cũ và mới, sau khi transaction commit"""
+    deltas = {}
+    for key in old_keys:
+        deltas[key] = deltas.get(key, 0) - 1
+    for key in new_keys:
+        deltas[key] = deltas.get(key, 0) + 1
+    if any(deltas.values()):
+        transaction.on_commit(lambda: _apply(deltas))
+
+
+def invalidate_pending_grading():
+    """Đề thêm / bớt câu tự luận hoặc bị xoá: các bài đã nộp đổi trạng thái chờ chấm -> đếm lại"""
+    transaction.on_commit(lambda: cache.delete(PENDING_GRADING))
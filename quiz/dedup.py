@@ -0,0 +1,215 @@
+# quiz/dedup.py
+
+# ===========================================================================
+# PHÁT HIỆN CÂU HỎI GẦN TRÙNG: MINHASH + LSH (KHÔNG SO SÁNH TỪNG CẶP O(n²))
+# ===========================================================================
+#
+# Mỗi câu hỏi -> "văn bản chuẩn hoá" (bỏ dấu, chữ thường; đáp án sắp xếp để không phụ thuộc thứ tự)
+# -> tập shingle 5 ký tự -> chữ ký MinHash NUM_PERM giá trị (QuestionFingerprint.signature).
+# Chữ ký chia thành BANDS dải x ROWS giá trị; mỗi dải băm thành 1 số (cột band_0..band_7, có index
+# theo created_by). Hai câu là "ứng viên" khi trùng ít nhất 1 dải -> tra bằng index, không quét bảng.
+# Ứng viên được xác nhận bằng độ giống ước lượng (tỉ lệ giá trị chữ ký trùng nhau) >= THRESHOLD.
+# Với 8 dải x 8 giá trị: cặp giống 80% bị bỏ sót ~3%, cặp giống 50% thành ứng viên ~3%.
+
+import hashlib
+import zlib
+
+import numpy as np
+from django.db.models import Count, Q
+
+from .models import Answer, Question, QuestionFingerprint
+from .search import fold_text
+
+NUM_PERM = 64
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+THRESHOLD = 0.8
+BAND_FIELDS = [f'band_{i}' for i in range(BANDS)]
+
+SIGNATURE_DTYPE = np.dtype('<u4')
+
+# Hoán vị băm h(x) = (a*x + b) mod p, p = 2^31 - 1 (a*x < 2^62, không tràn uint64)
+_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, int(_PRIME), NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, int(_PRIME), NUM_PERM, dtype=np.uint64)
+
+# Số câu mới tra ứng viên trong 1 truy vấn (mỗi câu BANDS tham số)
+LOOKUP_CHUNK_SIZE = 100
+# Số nhóm trùng hiển thị trên trang báo cáo
+REPORT_MAX_GROUPS = 200
+
+
+def question_document(text, answer_texts=()):
+    """Văn bản chuẩn hoá của câu hỏi: nội dung + các đáp án (đã sắp xếp)"""
+    parts = [fold_text(text)] + sorted(fold_text(answer) for answer in answer_texts)
+    return ' '.join(' '.join(part.split()) for part in parts if part)
+
+
+def shingles(document):
+    """Tập hash (crc32) của các đoạn SHINGLE_SIZE ký tự liên tiếp"""
+    if len(document) <= SHINGLE_SIZE:
+        return {zlib.crc32(document.encode())}
+    return {
+        zlib.crc32(document[i:i + SHINGLE_SIZE].encode())
+        for i in range(len(document) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(document):
+    """Chữ ký MinHash (mảng NUM_PERM số uint32)"""
+    values = np.fromiter(shingles(document), dtype=np.uint64) % _PRIME
+    hashed = (values[:, None] * _A + _B) % _PRIME
+    return hashed.min(axis=0).astype(SIGNATURE_DTYPE)
+
+
+def band_keys(signature):
+    """Băm từng dải của chữ ký thành số nguyên 64 bit có dấu (vừa BigIntegerField)"""
+    data = signature.astype(SIGNATURE_DTYPE).tobytes()
+    size = ROWS * SIGNATURE_DTYPE.itemsize
+    return [
+        int.from_bytes(hashlib.blake2b(data[i * size:(i + 1) * size], digest_size=8).digest(), 'little', signed=True)
+        for i in range(BANDS)
+    ]
+
+
+def load_signature(blob):
+    return np.frombuffer(bytes(blob), dtype=SIGNATURE_DTYPE)
+
+
+def similarity(signature_a, signature_b):
+    """Độ giống Jaccard ước lượng (0..1)"""
+    return float(np.count_nonzero(signature_a == signature_b)) / NUM_PERM
+
+
+def make_fingerprint(question_id, created_by_id, text, answer_texts=()):
+    signature = minhash(question_document(text, answer_texts))
+    return QuestionFingerprint(
+        question_id=question_id,
+        created_by_id=created_by_id,
+        signature=signature.tobytes(),
+        **dict(zip(BAND_FIELDS, band_keys(signature))),
+    )
+
+
+def refresh_fingerprints(question_ids):
+    """Tính lại chữ ký cho các câu hỏi (sau khi câu hỏi / đáp án thay đổi)"""
+    answers = {}
+    for question_id, text in Answer.objects.filter(question_id__in=question_ids).values_list('question_id', 'text'):
+        answers.setdefault(question_id, []).append(text)
+    fingerprints = [
+        make_fingerprint(question_id, created_by_id, text, answers.get(question_id, ()))
+        for question_id, created_by_id, text in Question.objects.filter(pk__in=question_ids).values_list('id', 'created_by_id', 'text')
+    ]
+    QuestionFingerprint.objects.bulk_create(
+        fingerprints, update_conflicts=True, unique_fields=['question'],
+        update_fields=['created_by', 'signature', *BAND_FIELDS],
+    )
+
+
+# ===== TRA CỨU ỨNG VIÊN =====
+
+def find_similar(fingerprints, created_by_id, threshold=THRESHOLD):
+    """
+    Câu hỏi đã lưu (của created_by_id) gần trùng với từng chữ ký trong fingerprints.
+    Trả về {question_id của fingerprint: [(id câu giống, độ giống), ...]} (giống nhất trước,
+    bỏ qua chính nó). Mỗi lô LOOKUP_CHUNK_SIZE chữ ký = 1 truy vấn qua index các dải.
+    """
+    matches = {}
+    for start in range(0, len(fingerprints), LOOKUP_CHUNK_SIZE):
+        chunk = fingerprints[start:start + LOOKUP_CHUNK_SIZE]
+        # created_by nằm trong từng vế OR để SQLite/PostgreSQL dùng index (created_by, band_i) của mỗi dải
+        condition = Q()
+        for field in BAND_FIELDS:
+            condition |= Q(created_by_id=created_by_id, **{f'{field}__in': {getattr(fp, field) for fp in chunk}})
+
+        # Chỉ mục ngược (dải, giá trị) -> các chữ ký trong lô
+        wanted = {}
+        for fp in chunk:
+            for field in BAND_FIELDS:
+                wanted.setdefault((field, getattr(fp, field)), []).append(fp)
+
+        signatures = {fp.question_id: load_signature(fp.signature) for fp in chunk}
+        candidates = QuestionFingerprint.objects.filter(condition).values_list(
+            'question_id', 'signature', *BAND_FIELDS
+        )
+        for question_id, blob, *bands in candidates:
+            targets = {fp.question_id for field, key in zip(BAND_FIELDS, bands) for fp in wanted.get((field, key), ())}
+            targets.discard(question_id)
+            if not targets:
+                continue
+            signature = load_signature(blob)
+            for target in targets:
+                score = similarity(signatures[target], signature)
+                if score >= threshold:
+                    matches.setdefault(target, []).append((question_id, score))
+
+    for found in matches.values():
+        found.sort(key=lambda item: (-item[1], item[0]))
+    return matches
+
+
+def similar_questions(question, threshold=THRESHOLD):
+    """[(id câu giống, độ giống)] của một câu hỏi đã lưu"""
+    fingerprint = QuestionFingerprint.objects.filter(question=question).first()
+    if fingerprint is None:
+        return []
+    return find_similar([fingerprint], question.created_by_id, threshold).get(question.pk, [])
+
+
+def duplicate_groups(created_by_id, threshold=THRESHOLD):
+    """
+    Các nhóm câu hỏi gần trùng trong ngân hàng của một giáo viên.
+    Ứng viên lấy bằng GROUP BY từng dải (chỉ các giá trị xuất hiện >= 2 lần), rồi xác nhận
+    bằng độ giống chữ ký và gộp nhóm (union-find). Trả về [(độ giống lớn nhất, [question_id])].
+    """
+    own = QuestionFingerprint.objects.filter(created_by_id=created_by_id)
+    buckets = {}
+    for field in BAND_FIELDS:
+        # COUNT(*) chỉ đọc index (created_by, band_i), không phải đọc bảng
+        keys = own.values(field).annotate(total=Count('*')).filter(total__gt=1).values_list(field, flat=True)
+        for question_id, key in own.filter(**{f'{field}__in': keys}).values_list('question_id', field).iterator():
+            buckets.setdefault((field, key), []).append(question_id)
+    if not buckets:
+        return []
+
+    candidate_ids = {question_id for members in buckets.values() for question_id in members}
+    signatures = {
+        question_id: load_signature(blob)
+        for question_id, blob in own.filter(question_id__in=candidate_ids).values_list('question_id', 'signature').iterator()
+    }
+
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    best = {}
+    checked = set()
+    for members in buckets.values():
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                pair = (min(a, b), max(a, b))
+                if pair in checked or find(a) == find(b):
+                    continue
+                checked.add(pair)
+                score = similarity(signatures[a], signatures[b])
+                if score >= threshold:
+                    root_a, root_b = find(a), find(b)
+                    parent[root_a] = root_b
+                    best[root_b] = max(best.get(root_a, 0), best.get(root_b, 0), score)
+
+    groups = {}
+    for question_id in parent:
+        groups.setdefault(find(question_id), []).append(question_id)
+    result = [
+        (max(best.get(member, 0) for member in members), sorted(members))
+        for members in groups.values() if len(members) > 1
+    ]
+    result.sort(key=lambda group: (-len(group[1]), -group[0], group[1][0]))
+    return result
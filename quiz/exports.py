@@ -0,0 +1,162 @@
+# quiz/exports.py
+
+# ===========================================================================
+# XUẤT KẾT QUẢ ĐỀ THI (CSV / XLSX) - ĐỌC THEO LÔ, BỘ NHỚ KHÔNG TĂNG THEO SỐ BÀI NỘP
+# ===========================================================================
+
+import csv
+import tempfile
+
+from django.utils import timezone
+from openpyxl import Workbook
+
+from .answer_key import get_answer_key
+from .models import Question
+from .paper import get_quiz_payload
+from .responses import load_responses
+from .review import build_review_from_answers
+from results.models import Result
+
+# Số Result đọc mỗi lô (1 truy vấn select_related student / lô)
+EXPORT_CHUNK_SIZE = 1000
+
+# Số dòng tối đa của một sheet Excel. Sheet "Câu trả lời" có (số bài nộp x số câu) dòng: vượt quá thì chỉ xuất CSV
+XLSX_MAX_ROWS = 1_048_576
+
+RESULT_HEADER = ['Tên đăng nhập', 'Họ tên', 'Điểm', 'Điểm tự luận', 'Đã chấm tự luận', 'Nộp lúc']
+ANSWER_HEADER = [
+    'Tên đăng nhập', 'Họ tên', 'Mã kết quả', 'Câu', 'Nội dung câu hỏi', 'Loại câu hỏi',
+    'Câu trả lời', 'Đáp án đúng', 'Kết quả', 'Điểm tự luận', 'Nhận xét',
+]
+
+
+def iter_results(quiz):
+    """
+    Duyệt Result của đề theo lô (keyset theo id, select_related student), kèm bản chụp bài làm.
+    Kết quả cũ chưa có bản chụp được dựng tạm từ StudentAnswer của cả lô (1 truy vấn / lô).
+    """
+    last_id = 0
+    while True:
+        chunk = list(
+            Result.objects.filter(quiz=quiz, id__gt=last_id).select_related('student').order_by('id')[:EXPORT_CHUNK_SIZE]
+        )
+        if not chunk:
+            return
+        last_id = chunk[-1].id
+
+        missing = [result for result in chunk if result.review is None]
+        if missing:
+            answer_key = get_answer_key(quiz)
+            responses = load_responses(missing)
+            for result in missing:
+                result.review = build_review_from_answers(answer_key, responses[result.id])
+        yield from chunk
+
+
+class _ExportContext:
+    """Nội dung đề (từ cache) dùng để đổi id đáp án thành chữ"""
+
+    def __init__(self, quiz):
+        self.questions = list(get_quiz_payload(quiz))
+        self.answer_texts = {answer.id: answer.text for q in self.questions for answer in q.answers}
+
+    def texts(self, answer_ids):
+        return '; '.join(self.answer_texts.get(answer_id, f'#{answer_id}') for answer_id in answer_ids)
+
+
+def _student_columns(result):
+    return [result.student.username, result.student.get_full_name()]
+
+
+def _submitted_at(result):
+    return timezone.localtime(result.completed_at).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def result_rows(quiz, context=None):
+    """Bảng kết quả: 1 dòng / bài nộp, mỗi câu hỏi một cột (câu trả lời của học sinh)"""
+    context = context or _ExportContext(quiz)
+    yield RESULT_HEADER + [f'Câu {i}' for i in range(1, len(context.questions) + 1)]
+    for result in iter_results(quiz):
+        answers = result.review['q']
+        row = _student_columns(result) + [
+            result.score, result.short_answer_score, 'Có' if result.is_graded else 'Chưa', _submitted_at(result),
+        ]
+        for question in context.questions:
+            data = answers.get(str(question.id))
+            if data is None:
+                row.append('')
+            elif 't' in data:
+                row.append(data['t'])
+            else:
+                row.append(context.texts(data['s']))
+        yield row
+
+
+def answer_rows(quiz, context=None):
+    """Bảng câu trả lời dạng dài: 1 dòng / (bài nộp, câu hỏi)"""
+    context = context or _ExportContext(quiz)
+    yield ANSWER_HEADER
+    for result in iter_results(quiz):
+        answers = result.review['q']
+        student = _student_columns(result)
+        for number, question in enumerate(context.questions, 1):
+            data = answers.get(str(question.id))
+            if data is None:
+                continue
+            base = student + [result.id, number, question.text, question.get_question_type_display()]
+            if question.question_type == Question.QuestionType.SHORT_ANSWER:
+                yield base + [data.get('t', ''), question.correct_answer_text, '', data.get('p', 0), data.get('m', '')]
+            else:
+                yield base + [
+                    context.texts(data['s']), context.texts(data['c']),
+                    'Đúng' if data['ok'] else 'Sai', '', '',
+                ]
+
+
+def safe_cell(value):
+    """Chặn chèn công thức (CSV/Excel injection) từ nội dung học sinh nhập"""
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """Đối tượng giả file cho csv.writer: trả lại dòng vừa ghi thay vì lưu lại"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """Sinh từng dòng CSV (có BOM để Excel đọc đúng tiếng Việt)"""
+    writer = csv.writer(_Echo())
+    yield '\ufeff'
+    for row in rows:
+        yield writer.writerow([safe_cell(value) for value in row])
+
+
+def xlsx_row_count(quiz):
+    """Số dòng của sheet lớn nhất (Câu trả lời, kể cả dòng tiêu đề) nếu xuất XLSX"""
+    return Result.objects.filter(quiz=quiz).count() * quiz.questions.count() + 1
+
+
+def write_xlsx(quiz):
+    """
+    Ghi workbook 2 sheet bằng chế độ write-only của openpyxl: mỗi dòng được ghi ra file XML tạm của sheet
+    ngay khi append, chuỗi ghi dạng inline string (t="inlineStr", openpyxl >= 3.1 - xem requirements.txt),
+    không dựng bảng sharedStrings trong bộ nhớ. Bộ nhớ chỉ giữ nội dung đề và một lô Result.
+    Giới hạn: mỗi sheet tối đa XLSX_MAX_ROWS dòng (view chuyển sang CSV khi vượt, xem xlsx_row_count),
+    và file được dựng xong trên đĩa rồi mới gửi - đề rất lớn nên xuất CSV (gửi dần từng dòng).
+    Trả về file tạm đã tua về đầu, để trả về bằng FileResponse.
+    """
+    context = _ExportContext(quiz)
+    workbook = Workbook(write_only=True)
+    for title, rows in (('Kết quả', result_rows(quiz, context)), ('Câu trả lời', answer_rows(quiz, context))):
+        sheet = workbook.create_sheet(title)
+        for row in rows:
+            sheet.append([safe_cell(value) for value in row])
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
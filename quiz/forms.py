@@ -2,7 +2,7 @@
 
 from django import forms
 from django.forms import inlineformset_factory
-from .models import Question, Answer, Subject, Quiz
+from .models import Question, Answer, Subject, Quiz, QuizBlueprint, BlueprintRule
 
 # ===========================================================================
 # FORMSET CHO CÂU HỎI VÀ ĐÁP ÁN (Question & Answer) - ĐÃ CẬP NHẬT
@@ -105,14 +105,60 @@ AnswerFormSet = inlineformset_factory(
 # FORM CHO ĐỀ THI (QUIZ) - ĐÃ ĐƯỢC THIẾT KẾ LẠI VÀ THÊM allow_multiple_attempts
 # ===========================================================================
 
+class QuestionIdsField(forms.Field):
+    """
+    Danh sách id câu hỏi (input ẩn name="questions", do bộ chọn câu hỏi trên trang soạn đề tạo ra).
+    Không nạp cả ngân hàng câu hỏi như ModelMultipleChoiceField: kiểm tra id bằng 1 truy vấn id__in.
+    """
+    widget = forms.MultipleHiddenInput
+    default_error_messages = {
+        'required': 'Vui lòng chọn ít nhất một câu hỏi.',
+        'invalid': 'Danh sách câu hỏi không hợp lệ.',
+        'invalid_choice': 'Có %(count)s câu hỏi không tồn tại hoặc không thuộc ngân hàng của bạn.',
+    }
+
+    def __init__(self, *args, **kwargs):
+        self.queryset = kwargs.pop('queryset', Question.objects.none())
+        super().__init__(*args, **kwargs)
+
+    def to_python(self, value):
+        if not value:
+            return []
+        if not isinstance(value, (list, tuple)):
+            value = [value]
+        try:
+            # Giữ thứ tự chọn, bỏ id lặp
+            return list(dict.fromkeys(int(item) for item in value))
+        except (TypeError, ValueError):
+            raise forms.ValidationError(self.error_messages['invalid'], code='invalid')
+
+    def validate(self, value):
+        super().validate(value)
+        if not value:
+            return
+        found = set(self.queryset.filter(id__in=value).values_list('id', flat=True))
+        if len(found) != len(value):
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice',
+                params={'count': len(value) - len(found)},
+            )
+
+
 class QuizForm(forms.ModelForm):
+    # Không nằm trong Meta.fields: liên kết M2M được cập nhật theo chênh lệch (save_questions)
+    questions = QuestionIdsField(label='Chọn câu hỏi từ ngân hàng')
+
     def __init__(self, *args, **kwargs):
         # Lấy 'user' được truyền từ view
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
         if user:
-            # Lọc danh sách câu hỏi để giáo viên chỉ thấy câu hỏi của mình
+            # Giáo viên chỉ được chọn câu hỏi của mình
             self.fields['questions'].queryset = Question.objects.filter(created_by=user)
+        if self.instance.pk and not self.is_bound and 'questions' not in self.initial:
+            self.initial['questions'] = list(
+                self.instance.questions.order_by('id').values_list('id', flat=True)
+            )
 
     # Lựa chọn chế độ Công khai / Riêng tư
     PRIVACY_CHOICES = [
@@ -149,20 +195,106 @@ class QuizForm(forms.ModelForm):
     class Meta:
         model = Quiz
         # THÊM 'allow_multiple_attempts' vào fields
-        fields = ['title', 'subject', 'duration_minutes', 'start_time', 'end_time', 'is_public', 'allow_multiple_attempts', 'questions']
+        fields = ['title', 'subject', 'duration_minutes', 'start_time', 'end_time', 'is_public', 'allow_multiple_attempts', 'pool_size']
         labels = {
             'title': 'Tiêu đề đề thi',
             'subject': 'Môn học',
             'duration_minutes': 'Thời gian làm bài (phút)',
-            'questions': 'Chọn câu hỏi từ ngân hàng'
+            'pool_size': 'Số câu mỗi học sinh',
         }
         widgets = {
             'title': forms.TextInput(attrs={'class': 'form-control'}),
             'subject': forms.Select(attrs={'class': 'form-select'}),
             'duration_minutes': forms.NumberInput(attrs={'class': 'form-control'}),
-            'questions': forms.CheckboxSelectMultiple, # Hiển thị câu hỏi dưới dạng checkbox
+            'pool_size': forms.NumberInput(attrs={'class': 'form-control', 'min': 1, 'placeholder': 'Tất cả'}),
         }
         
     def clean_is_public(self):
         # Chuyển đổi giá trị chuỗi ('True'/'False') từ radio button thành boolean
-        return self.cleaned_data['is_public'] == 'True'
\ No newline at end of file
+        return self.cleaned_data['is_public'] == 'True'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        pool_size = cleaned_data.get('pool_size')
+        questions = cleaned_data.get('questions')
+        if pool_size == 0:
+            cleaned_data['pool_size'] = None
+        elif pool_size and questions and pool_size > len(questions):
+            self.add_error('pool_size', f"Số câu mỗi học sinh không được lớn hơn số câu của đề ({len(questions)} câu).")
+        return cleaned_data
+
+    def selected_questions(self):
+        """Các câu đang được chọn (dữ liệu gửi lên, hoặc câu hiện có của đề) để hiển thị lại trên trang"""
+        if self.is_bound:
+            ids = [value for value in self.data.getlist(self.add_prefix('questions')) if value.isdigit()]
+        else:
+            ids = self.initial.get('questions') or []
+        return self.fields['questions'].queryset.filter(id__in=ids).select_related('subject').order_by('-created_at', '-id')
+
+    def save_questions(self, quiz):
+        """
+        Cập nhật liên kết đề - câu hỏi theo chênh lệch: chỉ xoá câu bỏ chọn, chỉ thêm câu mới chọn
+        (sửa đề 300 câu không xoá rồi thêm lại 300 liên kết). remove/add vẫn phát m2m_changed để xoá cache.
+        """
+        selected = set(self.cleaned_data['questions'])
+        current = set(quiz.questions.values_list('id', flat=True))
+        if current - selected:
+            quiz.questions.remove(*(current - selected))
+        if selected - current:
+            quiz.questions.add(*(selected - current))
+
+    def _save_m2m(self):
+        super()._save_m2m()
+        self.save_questions(self.instance)
+
+
+# ===========================================================================
+# FORM CHO KHUNG ĐỀ (QuizBlueprint) - BỐC CÂU HỎI NGẪU NHIÊN THEO ĐỘ KHÓ / LOẠI
+# ===========================================================================
+
+class QuizBlueprintForm(forms.ModelForm):
+    class Meta:
+        model = QuizBlueprint
+        fields = ['name', 'subject']
+        labels = {
+            'name': 'Tên khung đề',
+            'subject': 'Môn học',
+        }
+        widgets = {
+            'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'VD: Toán giữa kỳ - 30 câu'}),
+            'subject': forms.Select(attrs={'class': 'form-select'}),
+        }
+
+
+class BlueprintRuleForm(forms.ModelForm):
+    class Meta:
+        model = BlueprintRule
+        fields = ['count', 'difficulty', 'question_type']
+        widgets = {
+            'count': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
+            'difficulty': forms.Select(attrs={'class': 'form-select'}),
+            'question_type': forms.Select(attrs={'class': 'form-select'}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Để trống = không giới hạn
+        self.fields['difficulty'].choices = [('', 'Mọi độ khó'), *Question.Difficulty.choices]
+        self.fields['question_type'].choices = [('', 'Mọi loại câu hỏi'), *Question.QuestionType.choices]
+
+    def clean_count(self):
+        count = self.cleaned_data['count']
+        if count < 1:
+            raise forms.ValidationError("Số câu phải lớn hơn 0")
+        return count
+
+
+BlueprintRuleFormSet = inlineformset_factory(
+    QuizBlueprint,
+    BlueprintRule,
+    form=BlueprintRuleForm,
+    extra=3,
+    can_delete=True,
+    validate_min=True,
+    min_num=1,
+)
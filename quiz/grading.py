@@ -0,0 +1,326 @@
+# quiz/grading.py
+
+# ===========================================================================
+# BỘ CHẤM ĐIỂM - SỐ TRUY VẤN CỐ ĐỊNH, KHÔNG PHỤ THUỘC SỐ CÂU HỎI
+# ===========================================================================
+
+from datetime import timedelta
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+
+from .answer_key import get_answer_key
+from .attempts import attempt_question_ids, discard_draft, load_draft
+from .models import Question
+from .paper import get_quiz_payload
+from .responses import pack_selections
+from .stats import record_result
+from results.models import Attempt, Result, StudentAnswer, Submission
+
+# Các loại câu hỏi được chấm tự động
+AUTO_GRADED_TYPES = (
+    Question.QuestionType.SINGLE_CHOICE,
+    Question.QuestionType.MULTIPLE_CHOICE,
+    Question.QuestionType.TRUE_FALSE,
+)
+
+# Giá trị form take_quiz gửi lên cho câu Đúng/Sai -> nội dung đáp án
+TRUE_FALSE_VALUES = {'true': 'Đúng', 'false': 'Sai'}
+
+
+def parse_selected_ids(entry, data, question_id):
+    """
+    Đọc các đáp án học sinh đã chọn cho một câu hỏi và kiểm tra chúng
+    với đáp án của câu hỏi ngay trong bộ nhớ (id lạ hoặc sai định dạng bị bỏ qua).
+    """
+    field = f'question_{question_id}'
+    if entry.type == Question.QuestionType.MULTIPLE_CHOICE:
+        values = data.getlist(field)
+    else:
+        value = data.get(field)
+        if not value:
+            return set()
+        # take_quiz gửi 'true'/'false', practice_session gửi id đáp án
+        if entry.type == Question.QuestionType.TRUE_FALSE and value.lower() in TRUE_FALSE_VALUES:
+            value = entry.true_false_id(TRUE_FALSE_VALUES[value.lower()])
+        values = [value]
+
+    selected = set()
+    for value in values:
+        try:
+            answer_id = int(value)
+        except (TypeError, ValueError):
+            continue
+        if answer_id in entry.answer_ids:
+            selected.add(answer_id)
+    return selected
+
+
+def is_selection_correct(entry, selected):
+    """Nhiều lựa chọn: phải chọn đúng và đủ. Một lựa chọn / Đúng-Sai: đáp án chọn là đáp án đúng."""
+    if not selected:
+        return False
+    if entry.type == Question.QuestionType.MULTIPLE_CHOICE:
+        return selected == entry.correct_ids
+    return bool(selected & entry.correct_ids)
+
+
+# Bản chụp bài làm lưu vào Result.review để hiển thị kết quả (xem quiz/review.py):
+# {"v": 1, "q": {"<question_id>": {"s": [id đã chọn], "c": [id đáp án đúng], "ok": true/false}   # câu có lựa chọn
+#                "<question_id>": {"t": "bài làm", "p": điểm, "m": "nhận xét"}}}                # câu tự luận
+REVIEW_VERSION = 1
+
+
+def choice_entry(entry, selected):
+    """Bản chụp câu có lựa chọn"""
+    return {'s': sorted(selected), 'c': sorted(entry.correct_ids), 'ok': is_selection_correct(entry, selected)}
+
+
+def short_answer_entry(text, points=0, comment=''):
+    """Bản chụp câu tự luận (điểm / nhận xét được cập nhật khi giáo viên chấm)"""
+    return {'t': text, 'p': points, 'm': comment or ''}
+
+
+def make_review(questions):
+    return {'v': REVIEW_VERSION, 'q': {str(question_id): data for question_id, data in questions.items()}}
+
+
+def grade_submission(quiz, student, data, attempt=None):
+    """
+    Chấm bài thi và lưu kết quả (gắn kết quả vào lượt làm bài nếu có).
+    Số truy vấn cố định: đáp án đọc từ cache (tối đa 1 truy vấn khi cache trống)
+    + 1 INSERT Result + 1 bulk_create StudentAnswer + 1 UPDATE QuizStats
+    (backend có thể chia bulk_create thành nhiều lô nếu vượt giới hạn tham số).
+    Với QUIZ_PACKED_ANSWERS, lựa chọn trắc nghiệm được nén vào Result.packed_answers
+    và chỉ câu tự luận tạo dòng StudentAnswer.
+    Đề bốc ngẫu nhiên: chỉ chấm các câu đã ghi nhận trong lượt làm bài (Attempt.question_ids).
+    """
+    key = get_answer_key(quiz)
+    drawn = attempt_question_ids(attempt)
+    packed = settings.QUIZ_PACKED_ANSWERS
+
+    student_answers = []
+    selections = []
+    correct_answers_count = 0
+    total_scorable = 0
+    # Số lựa chọn đúng (cho QuizStats)
+    correct_rows = 0
+    review = {}
+
+    for question_id, entry in key.items():
+        if drawn is not None and question_id not in drawn:
+            continue
+        if entry.type == Question.QuestionType.SHORT_ANSWER:
+            # Câu tự luận không tính điểm tự động
+            student_answer_text = data.get(f'short_answer_{question_id}', '').strip()
+            if student_answer_text:
+                student_answers.append(StudentAnswer(
+                    question_id=question_id,
+                    selected_answer=None,
+                    custom_answer=student_answer_text,
+                ))
+                review[question_id] = short_answer_entry(student_answer_text)
+            continue
+
+        total_scorable += 1
+        selected = parse_selected_ids(entry, data, question_id)
+        for answer_id in sorted(selected):
+            if packed:
+                selections.append((question_id, answer_id))
+            else:
+                student_answers.append(StudentAnswer(question_id=question_id, selected_answer_id=answer_id))
+        correct_rows += len(selected & entry.correct_ids)
+        review[question_id] = choice_entry(entry, selected)
+        if review[question_id]['ok']:
+            correct_answers_count += 1
+
+    score = (correct_answers_count / total_scorable) * 100 if total_scorable > 0 else 0
+
+    result = Result.objects.create(
+        student=student, quiz=quiz, score=round(score, 2), review=make_review(review),
+        packed_answers=pack_selections(selections) if packed else None,
+    )
+    for student_answer in student_answers:
+        student_answer.result = result
+    StudentAnswer.objects.bulk_create(student_answers)
+    record_result(quiz.pk, result.score, correct_rows, len(student_answers) + len(selections))
+    if attempt is not None:
+        Attempt.objects.filter(pk=attempt.pk).update(result=result)
+    return result
+
+
+# ===========================================================================
+# CHẤM BÀI LUYỆN TẬP - MỘT LƯỢT DUYỆT, KHÔNG LƯU StudentAnswer
+# ===========================================================================
+
+class PracticeAnswer(NamedTuple):
+    """Đáp án hiển thị trên trang kết quả luyện tập"""
+    id: int
+    text: str
+    is_correct: bool
+
+
+def grade_practice(quiz, data):
+    """
+    Chấm bài luyện tập trong một lượt duyệt: đáp án và nội dung đề đọc từ cache
+    (tối đa 3 truy vấn khi cache trống). Câu tự luận luôn được tính là đúng trong luyện tập.
+    Trả về (điểm, số câu đúng, tổng số câu, danh sách chi tiết từng câu).
+    """
+    answer_key = get_answer_key(quiz)
+    detailed_answers = []
+    correct_count = 0
+
+    for question in get_quiz_payload(quiz):
+        entry = answer_key.get(question.id)
+        if entry is None:
+            continue
+        is_short_answer = entry.type == Question.QuestionType.SHORT_ANSWER
+        all_answers = [] if is_short_answer else [
+            PracticeAnswer(answer.id, answer.text, answer.id in entry.correct_ids) for answer in question.answers
+        ]
+
+        if is_short_answer:
+            selected = set()
+            is_correct = True
+        else:
+            selected = parse_selected_ids(entry, data, question.id)
+            is_correct = is_selection_correct(entry, selected)
+        if is_correct:
+            correct_count += 1
+
+        detailed_answers.append({
+            'question': question,
+            'question_type': entry.type,
+            'is_correct': is_correct,
+            'is_short_answer': is_short_answer,
+            'student_answer_text': data.get(f'question_{question.id}', '') if is_short_answer else '',
+            'correct_answer_text': question.correct_answer_text if is_short_answer else '',
+            # Tất cả lựa chọn của học sinh / tất cả đáp án đúng (câu nhiều lựa chọn có thể có nhiều)
+            'student_answers': [answer for answer in all_answers if answer.id in selected],
+            'student_selected_answers': selected,
+            'correct_answers': [answer for answer in all_answers if answer.is_correct],
+            'all_answers': all_answers,
+        })
+
+    total_questions = len(detailed_answers)
+    score = round((correct_count / total_questions) * 100, 2) if total_questions else 0
+    return score, correct_count, total_questions, detailed_answers
+
+
+# ===========================================================================
+# HỘP THƯ BÀI NỘP - CHẤM ĐIỂM BẤT ĐỒNG BỘ
+# ===========================================================================
+
+def payload_from_post(data):
+    """Chuyển request.POST thành dict có thể lưu JSON (giữ nguyên các giá trị nhiều lựa chọn)"""
+    return {key: data.getlist(key) for key in data if key != 'csrfmiddlewaretoken'}
+
+
+def _claimable():
+    """Bài đang chờ, hoặc đang chấm nhưng đã nhận quá QUIZ_GRADING_LEASE_SECONDS (tiến trình chấm đã chết)"""
+    expired = timezone.now() - timedelta(seconds=settings.QUIZ_GRADING_LEASE_SECONDS)
+    return Q(status=Submission.Status.PENDING) | Q(status=Submission.Status.PROCESSING) & (
+        Q(claimed_at__lt=expired) | Q(claimed_at__isnull=True)
+    )
+
+
+def is_claimable(submission):
+    if submission.status == Submission.Status.PENDING:
+        return True
+    if submission.status != Submission.Status.PROCESSING:
+        return False
+    expired = timezone.now() - timedelta(seconds=settings.QUIZ_GRADING_LEASE_SECONDS)
+    return submission.claimed_at is None or submission.claimed_at < expired
+
+
+def process_submission(submission):
+    """
+    Chấm một bài nộp trong hộp thư. Nhận bài (UPDATE có điều kiện), chấm và ghi trạng thái trong cùng
+    một transaction: tiến trình chết giữa chừng thì rollback, bài vẫn chờ chấm. Bài PROCESSING còn sót
+    (claimed_at quá QUIZ_GRADING_LEASE_SECONDS) được nhận lại.
+    Trả về False nếu bài đã được tiến trình khác nhận.
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            claimed = Submission.objects.filter(_claimable(), pk=submission.pk).update(
+                status=Submission.Status.PROCESSING, claimed_at=now
+            )
+            if not claimed:
+                return False
+
+            try:
+                with transaction.atomic():
+                    result = grade_submission(
+                        submission.quiz, submission.student, MultiValueDict(submission.payload), submission.attempt
+                    )
+                    # Thời gian hoàn thành là lúc học sinh nộp bài, không phải lúc worker chấm
+                    Result.objects.filter(pk=result.pk).update(completed_at=submission.created_at)
+            except OperationalError:
+                raise
+            except Exception as e:
+                outcome = {'status': Submission.Status.FAILED, 'error': str(e)}
+            else:
+                outcome = {'status': Submission.Status.DONE, 'result': result}
+            outcome.update(claimed_at=now, processed_at=timezone.now())
+            Submission.objects.filter(pk=submission.pk).update(**outcome)
+    except OperationalError:
+        # SQLite: tiến trình khác đang giữ khoá ghi quá thời gian chờ -> để lần sau
+        return False
+    for field, value in outcome.items():
+        setattr(submission, field, value)
+    return True
+
+
+def drain_submissions(batch_size=50):
+    """
+    Chấm một lô bài nộp đang chờ, mỗi bài một transaction (không giữ khoá ghi của cả lô:
+    submit_quiz vẫn ghi được vào hộp thư trong lúc worker chấm). Trả về số bài đã xử lý.
+    """
+    pending = list(
+        Submission.objects.filter(_claimable())
+        .select_related('quiz', 'student', 'attempt')
+        .order_by('id')[:batch_size]
+    )
+    processed = 0
+    for submission in pending:
+        if process_submission(submission):
+            processed += 1
+    return processed
+
+
+def submit_expired_attempts(batch_size=100):
+    """
+    Nộp các lượt làm bài bị bỏ dở: quá hạn nộp + QUIZ_SUBMIT_GRACE_SECONDS mà vẫn IN_PROGRESS
+    (học sinh đóng trình duyệt, không quay lại). Chuyển sang SUBMITTED bằng cùng UPDATE có điều kiện
+    như khi học sinh nộp, rồi đưa bản nháp đã autosave vào hộp thư (chấm luôn nếu không bật QUIZ_ASYNC_GRADING).
+    Trả về số lượt đã nộp.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.QUIZ_SUBMIT_GRACE_SECONDS)
+    expired = list(
+        Attempt.objects.filter(status=Attempt.Status.IN_PROGRESS, deadline__lt=cutoff)
+        .select_related('quiz', 'student')
+        .order_by('deadline')[:batch_size]
+    )
+    submitted = 0
+    for attempt in expired:
+        answers = load_draft(attempt)
+        with transaction.atomic():
+            if not Attempt.objects.filter(pk=attempt.pk, status=Attempt.Status.IN_PROGRESS).update(
+                status=Attempt.Status.SUBMITTED, submitted_at=now, draft=answers
+            ):
+                # Học sinh vừa nộp / vừa được nộp tự động ở tiến trình khác
+                continue
+            submission = Submission.objects.create(
+                student=attempt.student, quiz=attempt.quiz, attempt=attempt, payload=answers
+            )
+        discard_draft(attempt)
+        if not settings.QUIZ_ASYNC_GRADING:
+            process_submission(submission)
+        submitted += 1
+    return submitted
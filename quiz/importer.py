@@ -0,0 +1,370 @@
+# quiz/importer.py
+
+# ===========================================================================
+# IMPORT CÂU HỎI TỪ EXCEL: ĐỌC STREAMING + bulk_create THEO LÔ, CHẠY NỀN
+# ===========================================================================
+#
+# Định dạng file (dòng 1 là tiêu đề):
+#   A: Môn học | B: Nội dung câu hỏi | C: Độ khó (EASY/MEDIUM/HARD)
+#   D-G: Đáp án 1-4 | H: Đáp án đúng | I: Loại câu hỏi (mặc định SINGLE_CHOICE) | J: Giải thích
+#   - SINGLE_CHOICE: H là vị trí đáp án đúng (1-4)
+#   - MULTIPLE_CHOICE: H là các vị trí đáp án đúng, cách nhau bởi dấu phẩy (VD: 1,3)
+#   - TRUE_FALSE: H là "Đúng"/"Sai" (hoặc 1/2), không cần cột D-G
+#   - SHORT_ANSWER: D là đáp án mẫu, không cần cột H
+
+import threading
+from datetime import timedelta
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from .blueprints import invalidate_pools
+from .dedup import find_similar, make_fingerprint
+from .models import Answer, ImportJob, Question, QuestionFingerprint, Subject
+from .search import build_search_text
+
+# Số câu hỏi mỗi lô bulk_create (đồng thời là chu kỳ cập nhật tiến độ)
+CHUNK_SIZE = 500
+# Số lỗi / câu nghi trùng được lưu chi tiết (phần sau chỉ được đếm)
+MAX_STORED_ERRORS = 1000
+
+TRUE_FALSE_VALUES = {'đúng': True, 'true': True, '1': True, 'sai': False, 'false': False, '2': False}
+
+
+class ImportRowError(Exception):
+    pass
+
+
+class ImportLeaseLost(Exception):
+    """Lease hết hạn và job đã được tiến trình khác nhận lại: dừng, không ghi gì thêm"""
+
+
+class ParsedQuestion(NamedTuple):
+    subject_name: str
+    text: str
+    difficulty: str
+    question_type: str
+    answers: tuple  # ((text, is_correct), ...)
+    correct_answer_text: str
+    explanation: str
+
+
+def _text(value):
+    return str(value).strip() if value is not None else ''
+
+
+def iter_rows(path):
+    """Đọc file ở chế độ read-only (không nạp cả workbook vào bộ nhớ): yield (số dòng, giá trị các ô)"""
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        for row_number, row in enumerate(sheet.iter_rows(min_row=2, max_col=10, values_only=True), start=2):
+            if any(value not in (None, '') for value in row):
+                yield row_number, tuple(row) + (None,) * (10 - len(row))
+    finally:
+        workbook.close()
+
+
+def count_rows(path):
+    """Số dòng dữ liệu theo kích thước sheet ghi trong file (None nếu file không ghi)"""
+    workbook = load_workbook(path, read_only=True)
+    try:
+        max_row = workbook.active.max_row
+        return max(max_row - 1, 0) if max_row else None
+    finally:
+        workbook.close()
+
+
+def _correct_positions(value, answer_count):
+    positions = set()
+    for part in _text(value).replace(';', ',').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            position = int(float(part))
+        except ValueError:
+            raise ImportRowError(f'Đáp án đúng "{part}" không phải là số')
+        if not 1 <= position <= 4:
+            raise ImportRowError(f'Vị trí đáp án đúng {position} phải từ 1 đến 4')
+        if position > answer_count:
+            raise ImportRowError(f'Đáp án {position} đang để trống')
+        positions.add(position)
+    return positions
+
+
+def parse_row(values):
+    """Kiểm tra và chuyển một dòng Excel thành ParsedQuestion (lỗi -> ImportRowError)"""
+    subject_name, text, difficulty = _text(values[0]), _text(values[1]), _text(values[2]).upper()
+    answer_texts = [_text(value) for value in values[3:7]]
+    correct, question_type, explanation = values[7], _text(values[8]).upper(), _text(values[9])
+    question_type = question_type or Question.QuestionType.SINGLE_CHOICE
+
+    if not subject_name:
+        raise ImportRowError('Thiếu tên môn học')
+    if not text:
+        raise ImportRowError('Thiếu nội dung câu hỏi')
+    if difficulty not in Question.Difficulty.values:
+        raise ImportRowError(f'Độ khó "{values[2]}" không hợp lệ (EASY/MEDIUM/HARD)')
+    if question_type not in Question.QuestionType.values:
+        raise ImportRowError(f'Loại câu hỏi "{values[8]}" không hợp lệ')
+
+    answers = ()
+    correct_answer_text = ''
+    if question_type == Question.QuestionType.SHORT_ANSWER:
+        correct_answer_text = answer_texts[0]
+    elif question_type == Question.QuestionType.TRUE_FALSE:
+        is_true = TRUE_FALSE_VALUES.get(_text(correct).lower().removesuffix('.0'))
+        if is_true is None:
+            raise ImportRowError('Câu Đúng/Sai cần cột H là "Đúng" hoặc "Sai"')
+        answers = (('Đúng', is_true), ('Sai', not is_true))
+    else:
+        # Đáp án phải điền liên tục từ cột D
+        filled = [answer for answer in answer_texts if answer]
+        if answer_texts[:len(filled)] != filled:
+            raise ImportRowError('Các đáp án phải điền liên tục từ cột D')
+        if len(filled) < 2:
+            raise ImportRowError('Cần ít nhất 2 đáp án')
+        if any(len(answer) > Answer._meta.get_field('text').max_length for answer in filled):
+            raise ImportRowError('Đáp án dài quá 255 ký tự')
+        positions = _correct_positions(correct, len(filled))
+        if not positions:
+            raise ImportRowError('Thiếu đáp án đúng (cột H)')
+        if question_type == Question.QuestionType.SINGLE_CHOICE and len(positions) > 1:
+            raise ImportRowError('Câu một lựa chọn chỉ có 1 đáp án đúng')
+        answers = tuple((answer, i in positions) for i, answer in enumerate(filled, 1))
+
+    return ParsedQuestion(subject_name, text, difficulty, question_type, answers, correct_answer_text, explanation)
+
+
+class SubjectCache:
+    """Map tên môn học -> id trong bộ nhớ; môn mới được tạo một lần"""
+
+    def __init__(self):
+        self._ids = dict(Subject.objects.values_list('name', 'id'))
+
+    def get_id(self, name):
+        if name not in self._ids:
+            self._ids[name] = Subject.objects.get_or_create(name=name)[0].id
+        return self._ids[name]
+
+
+def _save_chunk(parsed, row_numbers, subjects, user):
+    """
+    Lưu một lô câu hỏi + đáp án + chữ ký MinHash (3 bulk_create) trong một transaction.
+    Trả về (số câu đã lưu, các câu nghi trùng với câu có sẵn hoặc câu ở dòng trước trong file).
+    """
+    with transaction.atomic():
+        questions = Question.objects.bulk_create([
+            Question(
+                subject_id=subjects.get_id(item.subject_name),
+                text=item.text,
+                difficulty=item.difficulty,
+                question_type=item.question_type,
+                correct_answer_text=item.correct_answer_text or None,
+                explanation=item.explanation or None,
+                created_by=user,
+                # bulk_create không gọi signal -> tự tính nội dung tìm kiếm
+                search_text=build_search_text(item.text, item.explanation, [text for text, _ in item.answers]),
+            )
+            for item in parsed
+        ])
+        Answer.objects.bulk_create([
+            Answer(question=question, text=text, is_correct=is_correct)
+            for question, item in zip(questions, parsed)
+            for text, is_correct in item.answers
+        ], batch_size=CHUNK_SIZE)
+        fingerprints = [
+            make_fingerprint(question.id, user.id, item.text, [text for text, _ in item.answers])
+            for question, item in zip(questions, parsed)
+        ]
+        QuestionFingerprint.objects.bulk_create(fingerprints, batch_size=CHUNK_SIZE)
+    # bulk_create không gọi signal -> tự bỏ cache danh sách id dùng khi bốc câu theo khung đề
+    invalidate_pools(user.id)
+
+    # Chỉ báo trùng với câu cũ hơn: mỗi cặp trùng trong file chỉ bị đánh dấu ở dòng sau
+    similar = find_similar(fingerprints, user.id)
+    duplicates = []
+    for question, item, row_number in zip(questions, parsed, row_numbers):
+        earlier = [(question_id, score) for question_id, score in similar.get(question.id, ()) if question_id < question.id]
+        if earlier:
+            duplicates.append({
+                'row': row_number,
+                'question_id': question.id,
+                'text': item.text[:200],
+                'duplicate_of': earlier[0][0],
+                'similarity': round(earlier[0][1], 2),
+            })
+    return len(questions), duplicates
+
+
+# ===== LEASE: MỖI JOB CHỈ MỘT TIẾN TRÌNH CHẠY, WORKER CHẾT THÌ JOB ĐƯỢC NHẬN LẠI =====
+
+def _claimable():
+    """Job đang chờ, hoặc đang chạy nhưng lease không được gia hạn quá QUIZ_IMPORT_LEASE_SECONDS"""
+    expired = timezone.now() - timedelta(seconds=settings.QUIZ_IMPORT_LEASE_SECONDS)
+    return Q(status=ImportJob.Status.PENDING) | Q(status=ImportJob.Status.RUNNING) & (
+        Q(heartbeat_at__lt=expired) | Q(heartbeat_at__isnull=True)
+    )
+
+
+def lease_expired(job):
+    if job.status != ImportJob.Status.RUNNING:
+        return False
+    expired = timezone.now() - timedelta(seconds=settings.QUIZ_IMPORT_LEASE_SECONDS)
+    return job.heartbeat_at is None or job.heartbeat_at < expired
+
+
+def claim_job(job):
+    """Nhận job (UPDATE có điều kiện) và nạp lại tiến độ đã lưu. False nếu tiến trình khác đang giữ lease."""
+    now = timezone.now()
+    claimed = ImportJob.objects.filter(_claimable(), pk=job.pk).update(
+        status=ImportJob.Status.RUNNING, started_at=Coalesce(F('started_at'), Value(now)), heartbeat_at=now
+    )
+    if claimed:
+        job.refresh_from_db()
+    return bool(claimed)
+
+
+def renew_lease(job, **fields):
+    """
+    Gia hạn lease và ghi các trường của job trong cùng 1 UPDATE; chỉ thành công khi lease vẫn của
+    tiến trình này (heartbeat_at chưa bị ai đổi), ngược lại ImportLeaseLost.
+    """
+    now = timezone.now()
+    renewed = ImportJob.objects.filter(pk=job.pk, heartbeat_at=job.heartbeat_at).update(heartbeat_at=now, **fields)
+    if not renewed:
+        raise ImportLeaseLost(job.pk)
+    job.heartbeat_at = now
+
+
+# ===== CHẠY JOB =====
+
+def run_import(job):
+    """
+    Chạy một job import: đọc streaming, lưu theo lô, cập nhật tiến độ sau mỗi lô.
+    Job nhận lại từ worker đã chết chạy tiếp sau dòng cuối đã lưu (lô câu hỏi và tiến độ commit cùng nhau).
+    """
+    path = job.file.path
+    if job.total_rows is None:
+        job.total_rows = count_rows(path)
+        renew_lease(job, total_rows=job.total_rows)
+
+    subjects = SubjectCache()
+    parsed = []
+    row_numbers = []
+    errors = list(job.errors)
+    duplicates = list(job.duplicates)
+    error_count, imported, duplicate_count = job.error_count, job.imported_count, job.duplicate_count
+    done = processed = job.processed_rows
+
+    def flush():
+        nonlocal imported, duplicate_count
+        with transaction.atomic():
+            if parsed:
+                saved, flagged = _save_chunk(parsed, row_numbers, subjects, job.created_by)
+                imported += saved
+                duplicate_count += len(flagged)
+                duplicates.extend(flagged[:MAX_STORED_ERRORS - len(duplicates)])
+                parsed.clear()
+                row_numbers.clear()
+            # Mất lease -> rollback cả lô vừa lưu (tiến trình nhận lại job sẽ lưu lại từ đầu lô)
+            renew_lease(
+                job, processed_rows=processed, imported_count=imported, error_count=error_count, errors=errors,
+                duplicate_count=duplicate_count, duplicates=duplicates,
+            )
+
+    for index, (row_number, values) in enumerate(iter_rows(path), 1):
+        if index <= done:
+            continue
+        processed += 1
+        try:
+            parsed.append(parse_row(values))
+            row_numbers.append(row_number)
+        except ImportRowError as e:
+            error_count += 1
+            if len(errors) < MAX_STORED_ERRORS:
+                errors.append({'row': row_number, 'message': str(e)})
+        if len(parsed) >= CHUNK_SIZE:
+            flush()
+    flush()
+
+    job.processed_rows, job.imported_count, job.error_count, job.errors = processed, imported, error_count, errors
+    job.duplicate_count, job.duplicates = duplicate_count, duplicates
+
+
+def process_job(job):
+    """
+    Xử lý một job import. Trả về False nếu job đang do tiến trình khác giữ lease
+    (claim bằng UPDATE có điều kiện, giống hộp thư bài nộp) hoặc bị nhận lại giữa chừng.
+    """
+    if not claim_job(job):
+        return False
+
+    try:
+        run_import(job)
+    except ImportLeaseLost:
+        return False
+    except Exception as e:
+        job.status = ImportJob.Status.FAILED
+        job.message = f'Lỗi xử lý file Excel: {e}'
+    else:
+        job.status = ImportJob.Status.DONE
+        job.message = f'Import thành công {job.imported_count} câu hỏi.'
+        if job.duplicate_count:
+            job.message += f' {job.duplicate_count} câu có thể trùng với câu đã có, vui lòng kiểm tra lại.'
+    job.finished_at = timezone.now()
+    try:
+        renew_lease(job, status=job.status, message=job.message, finished_at=job.finished_at)
+    except ImportLeaseLost:
+        return False
+    job.file.delete(save=False)
+    return True
+
+
+def drain_jobs():
+    """Xử lý lần lượt các job đang chờ (và job có lease hết hạn). Trả về số job đã xử lý."""
+    processed = 0
+    for job in ImportJob.objects.filter(_claimable()).select_related('created_by').order_by('id'):
+        if process_job(job):
+            processed += 1
+    return processed
+
+
+# Thread import đang chạy trong tiến trình web này (job_id -> Thread)
+_threads = {}
+_threads_lock = threading.Lock()
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        job = ImportJob.objects.select_related('created_by').get(pk=job_id)
+        process_job(job)
+    finally:
+        connection.close()
+        with _threads_lock:
+            if _threads.get(job_id) is threading.current_thread():
+                del _threads[job_id]
+
+
+def ensure_progress(job):
+    """
+    Job chờ quá lâu mà chưa có worker nhận, hoặc worker đang chạy đã chết (lease hết hạn)
+    -> chạy trong thread nền (không chặn request). Mỗi job tối đa một thread trong tiến trình.
+    """
+    waited = (timezone.now() - job.created_at).total_seconds()
+    pending = job.status == ImportJob.Status.PENDING and waited > settings.QUIZ_IMPORT_FALLBACK_SECONDS
+    if not pending and not lease_expired(job):
+        return
+    with _threads_lock:
+        thread = _threads.get(job.pk)
+        if thread is not None and thread.is_alive():
+            return
+        thread = _threads[job.pk] = threading.Thread(target=_run_in_thread, args=(job.pk,), daemon=True)
+        thread.start()
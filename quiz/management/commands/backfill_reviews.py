@@ -0,0 +1,16 @@
+# quiz/management/commands/backfill_reviews.py
+
+from django.core.management.base import BaseCommand
+
+from quiz.review import backfill_reviews
+
+
+class Command(BaseCommand):
+    help = "Tạo bản chụp bài làm (Result.review) cho các kết quả được chấm trước khi có bản chụp."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Số kết quả xử lý mỗi lô")
+
+    def handle(self, *args, **options):
+        count = backfill_reviews(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Đã tạo bản chụp cho {count} kết quả."))
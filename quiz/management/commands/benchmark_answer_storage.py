@@ -0,0 +1,100 @@
+# quiz/management/commands/benchmark_answer_storage.py
+
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.test.utils import override_settings
+
+from quiz.grading import grade_submission
+from quiz.management.commands.benchmark_grading import Command as GradingBenchmark
+from quiz.models import Question, Subject
+from results.models import Result, StudentAnswer
+from users.models import User
+
+
+class _Rollback(Exception):
+    pass
+
+
+def table_bytes(table):
+    """Dung lượng bảng + index (SQLite: số byte dữ liệu theo dbstat, PostgreSQL: pg_total_relation_size)"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'PRAGMA index_list("{table}")')
+            names = [table] + [row[1] for row in cursor.fetchall()]
+            cursor.execute(
+                f"SELECT SUM(payload) FROM dbstat WHERE name IN ({', '.join(['%s'] * len(names))})", names
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_total_relation_size(%s)', [table])
+        else:
+            raise CommandError(f"Chưa hỗ trợ đo dung lượng trên {connection.vendor}")
+        return cursor.fetchone()[0] or 0
+
+
+class Command(BaseCommand):
+    help = "So sánh dung lượng lưu bài làm: mỗi lựa chọn một dòng StudentAnswer vs Result.packed_answers (dữ liệu giả, tự rollback)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--results', type=int, default=2000, help="Số bài nộp giả")
+        parser.add_argument('--questions', type=int, default=40, help="Số câu hỏi của đề")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        tables = [StudentAnswer._meta.db_table, Result._meta.db_table]
+        try:
+            with transaction.atomic():
+                teacher = User.objects.create(username='bench_teacher', email='bench_teacher@example.com', role='TEACHER')
+                student = User.objects.create(username='bench_student', email='bench_student@example.com', role='STUDENT')
+                subject = Subject.objects.create(name='__benchmark_storage__')
+                quiz, _ = GradingBenchmark()._build_quiz(teacher, subject, options['questions'])
+                choices = {
+                    question.id: (question.question_type, [answer.id for answer in question.answers.all()])
+                    for question in quiz.questions.prefetch_related('answers')
+                }
+                baseline = {table: table_bytes(table) for table in tables}
+
+                # Chấm cùng một bộ bài làm với hai cách lưu (mỗi lần trong một savepoint riêng)
+                sizes = {}
+                for packed in (False, True):
+                    rng = random.Random(options['seed'])
+                    try:
+                        with transaction.atomic(), override_settings(QUIZ_PACKED_ANSWERS=packed):
+                            for _ in range(options['results']):
+                                grade_submission(quiz, student, self._random_submission(rng, choices))
+                            rows = StudentAnswer.objects.filter(result__quiz=quiz).count()
+                            sizes[packed] = (rows, {table: table_bytes(table) - baseline[table] for table in tables})
+                            raise _Rollback
+                    except _Rollback:
+                        pass
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        (legacy_rows, legacy), (packed_rows, packed) = sizes[False], sizes[True]
+        self.stdout.write(
+            f"{options['results']} bài nộp x {options['questions']} câu: "
+            f"{legacy_rows} dòng StudentAnswer (cũ) -> {packed_rows} dòng (nén)"
+        )
+        self.stdout.write(f"{'Bảng':<28} {'Cũ (KB)':>10} {'Nén (KB)':>10}")
+        for table in tables:
+            self.stdout.write(f"{table:<28} {legacy[table] / 1024:>10.1f} {packed[table] / 1024:>10.1f}")
+        before, after = sum(legacy.values()), sum(packed.values())
+        saved = (1 - after / before) * 100 if before else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Tổng: {before / 1024:.1f} KB -> {after / 1024:.1f} KB (tiết kiệm {saved:.1f}%)"
+        ))
+
+    def _random_submission(self, rng, choices):
+        data = QueryDict(mutable=True)
+        for question_id, (question_type, answer_ids) in choices.items():
+            if question_type == Question.QuestionType.SHORT_ANSWER:
+                if rng.random() < 0.8:
+                    data[f'short_answer_{question_id}'] = 'Trả lời'
+            elif question_type == Question.QuestionType.MULTIPLE_CHOICE:
+                data.setlist(f'question_{question_id}', [str(a) for a in rng.sample(answer_ids, rng.randint(1, 3))])
+            elif rng.random() < 0.95:
+                data[f'question_{question_id}'] = str(rng.choice(answer_ids))
+        return data
@@ -0,0 +1,105 @@
+# quiz/management/commands/benchmark_grading.py
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from quiz.grading import grade_submission
+from quiz.models import Answer, Question, Quiz, Subject
+from results.models import StudentAnswer
+from users.models import User
+
+QUESTION_TYPES = [
+    Question.QuestionType.SINGLE_CHOICE,
+    Question.QuestionType.MULTIPLE_CHOICE,
+    Question.QuestionType.TRUE_FALSE,
+    Question.QuestionType.SHORT_ANSWER,
+]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Đo số truy vấn của grade_submission theo số câu hỏi (dữ liệu giả, tự rollback)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10, 25, 50, 100])
+
+    def handle(self, *args, **options):
+        rows = []
+        try:
+            with transaction.atomic():
+                teacher = User.objects.create(username='bench_teacher', email='bench_teacher@example.com', role='TEACHER')
+                subject = Subject.objects.create(name='__benchmark_grading__')
+                for index, size in enumerate(options['sizes']):
+                    student = User.objects.create(
+                        username=f'bench_student_{index}', email=f'bench_student_{index}@example.com', role='STUDENT'
+                    )
+                    quiz, data = self._build_quiz(teacher, subject, size)
+                    with CaptureQueriesContext(connection) as ctx:
+                        result = grade_submission(quiz, student, data)
+                    if result.score != 100:
+                        raise CommandError(f"Chấm sai: bài làm đúng hết nhưng được {result.score} điểm")
+                    insert_batches = sum(
+                        1 for q in ctx.captured_queries
+                        if q['sql'].startswith('INSERT') and StudentAnswer._meta.db_table in q['sql']
+                    )
+                    rows.append((size, len(ctx.captured_queries), insert_batches))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"{'Số câu':>8} {'Truy vấn':>10} {'Lô INSERT':>10} {'Còn lại':>8}")
+        for size, total, batches in rows:
+            self.stdout.write(f"{size:>8} {total:>10} {batches:>10} {total - batches:>8}")
+
+        # Ngoài số lô bulk_create do backend chia, số truy vấn phải không đổi
+        if len({total - batches for _, total, batches in rows}) > 1:
+            raise CommandError("Số truy vấn thay đổi theo số câu hỏi!")
+        self.stdout.write(self.style.SUCCESS("Số truy vấn cố định, không phụ thuộc số câu hỏi."))
+
+    def _build_quiz(self, teacher, subject, size):
+        now = timezone.now()
+        quiz = Quiz.objects.create(
+            title=f'Benchmark {size}', subject=subject, created_by=teacher,
+            duration_minutes=60, start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1),
+        )
+        questions = Question.objects.bulk_create([
+            Question(
+                subject=subject, text=f'Câu {i}', difficulty=Question.Difficulty.MEDIUM,
+                question_type=QUESTION_TYPES[i % len(QUESTION_TYPES)], created_by=teacher,
+                correct_answer_text='Mẫu' if QUESTION_TYPES[i % len(QUESTION_TYPES)] == Question.QuestionType.SHORT_ANSWER else None,
+            )
+            for i in range(size)
+        ])
+        quiz.questions.add(*questions)
+
+        answers = []
+        for question in questions:
+            if question.question_type == Question.QuestionType.TRUE_FALSE:
+                answers += [Answer(question=question, text='Đúng', is_correct=True),
+                            Answer(question=question, text='Sai', is_correct=False)]
+            elif question.question_type != Question.QuestionType.SHORT_ANSWER:
+                correct_count = 2 if question.question_type == Question.QuestionType.MULTIPLE_CHOICE else 1
+                answers += [Answer(question=question, text=f'Đáp án {j}', is_correct=j < correct_count) for j in range(4)]
+        Answer.objects.bulk_create(answers)
+
+        data = QueryDict(mutable=True)
+        for answer in answers:
+            question = answer.question
+            if question.question_type == Question.QuestionType.MULTIPLE_CHOICE and answer.is_correct:
+                data.appendlist(f'question_{question.id}', str(answer.id))
+            elif question.question_type == Question.QuestionType.SINGLE_CHOICE and answer.is_correct:
+                data.setlist(f'question_{question.id}', [str(answer.id)])
+        for question in questions:
+            if question.question_type == Question.QuestionType.TRUE_FALSE:
+                data[f'question_{question.id}'] = 'true'
+            elif question.question_type == Question.QuestionType.SHORT_ANSWER:
+                data[f'short_answer_{question.id}'] = 'Trả lời'
+        return quiz, data
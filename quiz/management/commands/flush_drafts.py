@@ -0,0 +1,45 @@
+# quiz/management/commands/flush_drafts.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.attempts import flush_drafts
+from quiz.checks import is_process_local_cache
+from quiz.grading import submit_expired_attempts
+from results.models import Attempt
+
+
+class Command(BaseCommand):
+    help = (
+        "Ghi các bản nháp autosave đang nằm trong cache xuống DB (chạy định kỳ hoặc trước khi khởi động lại cache) "
+        "và nộp tự động các lượt làm bài bị bỏ dở quá hạn."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=30.0, help="Số giây giữa hai lần ghi")
+        parser.add_argument('--once', action='store_true', help="Ghi một lần rồi thoát")
+
+    def handle(self, *args, **options):
+        if is_process_local_cache():
+            # Không thấy bản nháp trong cache của tiến trình web (save_draft đã ghi thẳng xuống DB)
+            raise CommandError(
+                "Cache mặc định chỉ nằm trong bộ nhớ của tiến trình này: không đọc được bản nháp của web. "
+                "Cấu hình CACHES dùng chung (DatabaseCache / RedisCache)."
+            )
+        try:
+            while True:
+                expired = submit_expired_attempts()
+                if expired:
+                    self.stdout.write(f"Đã nộp tự động {expired} lượt làm bài quá hạn.")
+                attempt_ids = list(
+                    Attempt.objects.filter(status=Attempt.Status.IN_PROGRESS).values_list('id', flat=True)
+                )
+                flushed = flush_drafts(attempt_ids)
+                if flushed:
+                    self.stdout.write(f"Đã ghi {flushed} bản nháp xuống DB.")
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
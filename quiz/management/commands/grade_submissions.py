@@ -0,0 +1,37 @@
+# quiz/management/commands/grade_submissions.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from quiz.grading import drain_submissions, submit_expired_attempts
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker chấm điểm: lấy bài nộp từ hộp thư theo lô và tạo Result/StudentAnswer; "
+        "nộp tự động các lượt làm bài bị bỏ dở quá hạn."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help="Số bài nộp mỗi lô")
+        parser.add_argument('--sleep', type=float, default=1.0, help="Số giây chờ khi hộp thư trống")
+        parser.add_argument('--once', action='store_true', help="Chấm hết hộp thư rồi thoát")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Worker chấm điểm đang chạy...")
+        try:
+            while True:
+                expired = submit_expired_attempts(options['batch_size'])
+                if expired:
+                    self.stdout.write(f"Đã nộp tự động {expired} lượt làm bài quá hạn.")
+                processed = drain_submissions(options['batch_size'])
+                if processed:
+                    self.stdout.write(f"Đã chấm {processed} bài nộp.")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS("Worker chấm điểm đã dừng."))
@@ -0,0 +1,18 @@
+# quiz/management/commands/pack_student_answers.py
+
+from django.core.management.base import BaseCommand
+
+from quiz.responses import pack_results
+
+
+class Command(BaseCommand):
+    help = "Chuyển lựa chọn trắc nghiệm của các kết quả cũ từ StudentAnswer sang Result.packed_answers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Số kết quả xử lý mỗi lô")
+
+    def handle(self, *args, **options):
+        results, rows = pack_results(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã nén bài làm của {results} kết quả, xoá {rows} dòng StudentAnswer."
+        ))
@@ -0,0 +1,47 @@
+# quiz/management/commands/prewarm_quizzes.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from quiz.checks import is_process_local_cache
+from quiz.prewarm import prewarm_upcoming
+
+
+class Command(BaseCommand):
+    help = "Làm nóng cache (dữ liệu đề, đáp án, học sinh được phép, lịch dashboard) cho các đề sắp mở."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lead', type=int, default=10, help="Làm nóng các đề mở trong N phút tới")
+        parser.add_argument('--interval', type=float, default=30.0, help="Số giây giữa hai lần quét")
+        parser.add_argument('--once', action='store_true', help="Quét một lần rồi thoát")
+
+    def handle(self, *args, **options):
+        if is_process_local_cache():
+            raise CommandError(
+                "Cache mặc định chỉ nằm trong bộ nhớ của tiến trình này: làm nóng không có tác dụng với web. "
+                "Cấu hình CACHES dùng chung (DatabaseCache / RedisCache)."
+            )
+        # Mỗi đề chỉ làm nóng một lần cho mỗi giờ bắt đầu (đổi start_time sẽ làm nóng lại)
+        warmed = set()
+        try:
+            while True:
+                schedule_size, reports = prewarm_upcoming(options['lead'], skip=warmed)
+                for report in reports:
+                    warmed.add((report['quiz_id'], report['start_time']))
+                    start = timezone.localtime(report['start_time']).strftime('%H:%M %d/%m/%Y')
+                    self.stdout.write(
+                        f"[{start}] #{report['quiz_id']} {report['title']}: "
+                        f"{report['questions']} câu hỏi, {report['answer_key_entries']} đáp án, "
+                        f"{report['allowed_students']} học sinh được phép"
+                    )
+                if reports:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Đã làm nóng {len(reports)} đề; lịch dashboard có {schedule_size} đề."
+                    ))
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
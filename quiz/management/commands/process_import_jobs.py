@@ -0,0 +1,30 @@
+# quiz/management/commands/process_import_jobs.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from quiz.importer import drain_jobs
+
+
+class Command(BaseCommand):
+    help = "Worker import câu hỏi: xử lý các file Excel đang chờ import."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sleep', type=float, default=2.0, help="Số giây chờ khi không có job")
+        parser.add_argument('--once', action='store_true', help="Xử lý hết các job đang chờ rồi thoát")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Worker import đang chạy...")
+        try:
+            while True:
+                processed = drain_jobs()
+                if processed:
+                    self.stdout.write(f"Đã xử lý {processed} job import.")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS("Worker import đã dừng."))
@@ -0,0 +1,17 @@
+# quiz/management/commands/rebuild_quiz_stats.py
+
+from django.core.management.base import BaseCommand
+
+from quiz.stats import rebuild_quiz_stats
+
+
+class Command(BaseCommand):
+    help = "Dựng lại bảng thống kê QuizStats từ Result / StudentAnswer (sau khi nhập dữ liệu, xoá bài nộp, sửa đáp án...)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='*', type=int, help="Chỉ dựng lại các đề này (mặc định: tất cả)")
+
+    def handle(self, *args, **options):
+        quiz_ids = options['quiz_ids'] or None
+        count = rebuild_quiz_stats(quiz_ids)
+        self.stdout.write(self.style.SUCCESS(f"Đã dựng lại thống kê cho {count} đề có bài nộp."))
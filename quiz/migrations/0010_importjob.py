@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:34
+
+import django.db.models.deletion
+import quiz.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0009_question_explanation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(storage=quiz.models.import_storage, upload_to='%Y/%m/', verbose_name='File Excel')),
+                ('file_name', models.CharField(max_length=255, verbose_name='Tên file')),
+                ('status', models.CharField(choices=[('PENDING', 'Đang chờ'), ('RUNNING', 'Đang import'), ('DONE', 'Hoàn thành'), ('FAILED', 'Lỗi')], default='PENDING', max_length=20, verbose_name='Trạng thái')),
+                ('total_rows', models.PositiveIntegerField(blank=True, null=True, verbose_name='Tổng số dòng')),
+                ('processed_rows', models.PositiveIntegerField(default=0, verbose_name='Số dòng đã xử lý')),
+                ('imported_count', models.PositiveIntegerField(default=0, verbose_name='Số câu hỏi đã import')),
+                ('error_count', models.PositiveIntegerField(default=0, verbose_name='Số dòng lỗi')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Chi tiết lỗi')),
+                ('message', models.TextField(blank=True, default='', verbose_name='Thông báo')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'id'], name='quiz_import_status_64cfc5_idx')],
+            },
+        ),
+    ]
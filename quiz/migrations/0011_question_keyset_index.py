@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0010_importjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['created_by', '-created_at', '-id'], name='quiz_questi_created_efcd4f_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:43
+
+from django.db import migrations, models
+
+from quiz.search import build_search_text, drop_search_index, ensure_search_index
+
+
+def backfill_search_text(apps, schema_editor):
+    """Tính search_text cho các câu hỏi đã có (theo lô)"""
+    Question = apps.get_model('quiz', 'Question')
+    Answer = apps.get_model('quiz', 'Answer')
+
+    last_id = 0
+    while True:
+        questions = list(Question.objects.filter(id__gt=last_id).order_by('id').only('id', 'text', 'explanation')[:1000])
+        if not questions:
+            return
+        last_id = questions[-1].id
+        answers = {}
+        for question_id, text in Answer.objects.filter(question__in=questions).order_by('id').values_list('question_id', 'text'):
+            answers.setdefault(question_id, []).append(text)
+        for question in questions:
+            question.search_text = build_search_text(question.text, question.explanation, answers.get(question.id, ()))
+        Question.objects.bulk_update(questions, ['search_text'])
+
+
+def create_search_index(apps, schema_editor):
+    ensure_search_index(schema_editor.connection)
+
+
+def remove_search_index(apps, schema_editor):
+    drop_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0011_question_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, remove_search_index),
+    ]
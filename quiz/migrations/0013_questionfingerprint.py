@@ -0,0 +1,73 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from quiz.dedup import BAND_FIELDS, band_keys, minhash, question_document
+
+
+def backfill_fingerprints(apps, schema_editor):
+    """Tính chữ ký MinHash cho các câu hỏi đã có (theo lô)"""
+    Question = apps.get_model('quiz', 'Question')
+    Answer = apps.get_model('quiz', 'Answer')
+    QuestionFingerprint = apps.get_model('quiz', 'QuestionFingerprint')
+
+    last_id = 0
+    while True:
+        questions = list(Question.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'created_by_id', 'text')[:1000])
+        if not questions:
+            return
+        last_id = questions[-1][0]
+        answers = {}
+        for question_id, text in Answer.objects.filter(question_id__in=[q[0] for q in questions]).values_list('question_id', 'text'):
+            answers.setdefault(question_id, []).append(text)
+        fingerprints = []
+        for question_id, created_by_id, text in questions:
+            signature = minhash(question_document(text, answers.get(question_id, ())))
+            fingerprints.append(QuestionFingerprint(
+                question_id=question_id, created_by_id=created_by_id, signature=signature.tobytes(),
+                **dict(zip(BAND_FIELDS, band_keys(signature))),
+            ))
+        QuestionFingerprint.objects.bulk_create(fingerprints)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0012_question_search_text'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='duplicate_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Số câu nghi trùng'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='duplicates',
+            field=models.JSONField(blank=True, default=list, verbose_name='Câu hỏi nghi trùng'),
+        ),
+        migrations.CreateModel(
+            name='QuestionFingerprint',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fingerprint', serialize=False, to='quiz.question')),
+                ('signature', models.BinaryField()),
+                ('band_0', models.BigIntegerField()),
+                ('band_1', models.BigIntegerField()),
+                ('band_2', models.BigIntegerField()),
+                ('band_3', models.BigIntegerField()),
+                ('band_4', models.BigIntegerField()),
+                ('band_5', models.BigIntegerField()),
+                ('band_6', models.BigIntegerField()),
+                ('band_7', models.BigIntegerField()),
+                ('created_by', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_by', 'band_0'], name='quiz_qfp_band_0_idx'), models.Index(fields=['created_by', 'band_1'], name='quiz_qfp_band_1_idx'), models.Index(fields=['created_by', 'band_2'], name='quiz_qfp_band_2_idx'), models.Index(fields=['created_by', 'band_3'], name='quiz_qfp_band_3_idx'), models.Index(fields=['created_by', 'band_4'], name='quiz_qfp_band_4_idx'), models.Index(fields=['created_by', 'band_5'], name='quiz_qfp_band_5_idx'), models.Index(fields=['created_by', 'band_6'], name='quiz_qfp_band_6_idx'), models.Index(fields=['created_by', 'band_7'], name='quiz_qfp_band_7_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0013_questionfingerprint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlueprintRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('difficulty', models.CharField(blank=True, choices=[('EASY', 'Dễ'), ('MEDIUM', 'Trung bình'), ('HARD', 'Khó')], max_length=10, verbose_name='Độ khó')),
+                ('question_type', models.CharField(blank=True, choices=[('MULTIPLE_CHOICE', 'Câu hỏi nhiều lựa chọn'), ('TRUE_FALSE', 'Câu hỏi Đúng/Sai'), ('SHORT_ANSWER', 'Câu tự luận ngắn'), ('SINGLE_CHOICE', 'Câu hỏi một lựa chọn')], max_length=20, verbose_name='Loại câu hỏi')),
+                ('count', models.PositiveIntegerField(verbose_name='Số câu')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuizBlueprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='Tên khung đề')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Ngày tạo')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['created_by', 'subject', 'difficulty', 'question_type'], name='quiz_question_pool_idx'),
+        ),
+        migrations.AddField(
+            model_name='quizblueprint',
+            name='created_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_blueprints', to=settings.AUTH_USER_MODEL, verbose_name='Người tạo'),
+        ),
+        migrations.AddField(
+            model_name='quizblueprint',
+            name='subject',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quiz.subject', verbose_name='Môn học'),
+        ),
+        migrations.AddField(
+            model_name='blueprintrule',
+            name='blueprint',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rules', to='quiz.quizblueprint', verbose_name='Khung đề'),
+        ),
+    ]
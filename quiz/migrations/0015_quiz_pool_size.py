@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0014_quizblueprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='pool_size',
+            field=models.PositiveIntegerField(blank=True, help_text='Để trống: học sinh làm tất cả câu hỏi của đề. Nếu nhập N, mỗi học sinh nhận N câu ngẫu nhiên trong bộ câu của đề.', null=True, verbose_name='Số câu mỗi học sinh'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 22:05
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    """Bảng của DatabaseCache (CACHES trong settings); bỏ qua nếu đã có hoặc cache không dùng DB"""
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0015_quiz_pool_size'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0017_importjob_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionSearchIndex',
+            fields=[
+                ('question', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='quiz.question')),
+            ],
+            options={
+                'db_table': 'quiz_question_fts',
+                'managed': False,
+            },
+        ),
+    ]
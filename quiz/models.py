@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.core.files.storage import FileSystemStorage
 import uuid
 
 class Subject(models.Model):
@@ -34,6 +35,16 @@ class Question(models.Model):
     # Thêm trường cho câu hỏi tự luận
     correct_answer_text = models.TextField(blank=True, null=True, verbose_name="Đáp án đúng (cho tự luận)")
     explanation = models.TextField(blank=True, null=True, verbose_name="Giải thích đáp án", help_text="Giải thích này sẽ hiển thị sau khi học sinh hoàn thành bài thi.")
+    # Nội dung + giải thích + đáp án đã bỏ dấu, dùng cho chỉ mục tìm kiếm (quiz/search.py)
+    search_text = models.TextField(blank=True, default='', editable=False)
+
+    class Meta:
+        indexes = [
+            # Phân trang keyset ngân hàng câu hỏi theo giáo viên (quiz/pagination.py)
+            models.Index(fields=['created_by', '-created_at', '-id']),
+            # Danh sách id theo (môn, độ khó, loại) để bốc câu theo khung đề (quiz/blueprints.py)
+            models.Index(fields=['created_by', 'subject', 'difficulty', 'question_type'], name='quiz_question_pool_idx'),
+        ]
 
     def __str__(self):
         return self.text[:50]
@@ -61,6 +72,44 @@ class Answer(models.Model):
             if self.text not in ['Đúng', 'Sai']:
                 raise ValidationError({'text': 'Câu hỏi Đúng/Sai chỉ được có đáp án "Đúng" hoặc "Sai"'})
 
+
+class QuestionFingerprint(models.Model):
+    """Chữ ký MinHash + các dải LSH của câu hỏi, dùng phát hiện câu gần trùng (xem quiz/dedup.py)"""
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='fingerprint')
+    # Trùng với question.created_by: tra ứng viên trong ngân hàng của một giáo viên bằng index
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', db_index=False)
+    signature = models.BinaryField()  # NUM_PERM số uint32 little-endian
+    band_0 = models.BigIntegerField()
+    band_1 = models.BigIntegerField()
+    band_2 = models.BigIntegerField()
+    band_3 = models.BigIntegerField()
+    band_4 = models.BigIntegerField()
+    band_5 = models.BigIntegerField()
+    band_6 = models.BigIntegerField()
+    band_7 = models.BigIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['created_by', f'band_{i}'], name=f'quiz_qfp_band_{i}_idx') for i in range(8)]
+
+    def __str__(self):
+        return f"Fingerprint #{self.question_id}"
+
+
+class QuestionSearchIndex(models.Model):
+    """
+    Bảng ảo FTS5 quiz_question_fts (chỉ có trên SQLite, tạo bởi quiz/search.py - ensure_search_index).
+    Không quản lý bởi migration; chỉ để join theo rowid khi tính bm25() xếp hạng kết quả tìm kiếm.
+    """
+    question = models.OneToOneField(
+        Question, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', db_constraint=False,
+        related_name='search_index',
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'quiz_question_fts'
+
+
 class Quiz(models.Model):
     title = models.CharField(max_length=255, verbose_name="Tiêu đề đề thi")
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE, verbose_name="Môn học")
@@ -98,6 +147,13 @@ class Quiz(models.Model):
         verbose_name="Cho phép thi nhiều lần",
         help_text="Nếu được chọn, học sinh có thể thi đề này nhiều lần. Nếu không, mỗi học sinh chỉ được thi 1 lần."
     )
+    # Đề bốc ngẫu nhiên: mỗi học sinh nhận pool_size câu (cố định cho từng học sinh) trong bộ câu của đề
+    pool_size = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Số câu mỗi học sinh",
+        help_text="Để trống: học sinh làm tất cả câu hỏi của đề. Nếu nhập N, mỗi học sinh nhận N câu ngẫu nhiên trong bộ câu của đề."
+    )
     def save(self, *args, **kwargs):
         # Tự động tạo mã tham gia nếu chưa có
         if not self.access_code:
@@ -105,4 +161,80 @@ class Quiz(models.Model):
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+class QuizBlueprint(models.Model):
+    """Khung đề: số câu cần bốc theo độ khó / loại câu hỏi trong một môn (xem quiz/blueprints.py)"""
+    name = models.CharField(max_length=255, verbose_name="Tên khung đề")
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, verbose_name="Môn học")
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='quiz_blueprints', verbose_name="Người tạo")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Ngày tạo")
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.name
+
+
+class BlueprintRule(models.Model):
+    """Một dòng của khung đề, VD: 10 câu Dễ loại Một lựa chọn. Để trống độ khó / loại = không giới hạn"""
+    blueprint = models.ForeignKey(QuizBlueprint, related_name='rules', on_delete=models.CASCADE, verbose_name="Khung đề")
+    difficulty = models.CharField(max_length=10, choices=Question.Difficulty.choices, blank=True, verbose_name="Độ khó")
+    question_type = models.CharField(max_length=20, choices=Question.QuestionType.choices, blank=True, verbose_name="Loại câu hỏi")
+    count = models.PositiveIntegerField(verbose_name="Số câu")
+
+    def __str__(self):
+        return f"{self.count} câu {self.get_difficulty_display() or 'mọi độ khó'} - {self.get_question_type_display() or 'mọi loại'}"
+
+
+def import_storage():
+    """Nơi lưu file Excel chờ import (worker đọc lại từ đây)"""
+    return FileSystemStorage(location=settings.QUIZ_IMPORT_ROOT)
+
+
+class ImportJob(models.Model):
+    """Một lần import câu hỏi từ Excel, chạy nền (xem quiz/importer.py)"""
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Đang chờ'
+        RUNNING = 'RUNNING', 'Đang import'
+        DONE = 'DONE', 'Hoàn thành'
+        FAILED = 'FAILED', 'Lỗi'
+
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='import_jobs')
+    file = models.FileField(upload_to='%Y/%m/', storage=import_storage, verbose_name="File Excel")
+    file_name = models.CharField(max_length=255, verbose_name="Tên file")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING, verbose_name="Trạng thái")
+    total_rows = models.PositiveIntegerField(null=True, blank=True, verbose_name="Tổng số dòng")
+    processed_rows = models.PositiveIntegerField(default=0, verbose_name="Số dòng đã xử lý")
+    imported_count = models.PositiveIntegerField(default=0, verbose_name="Số câu hỏi đã import")
+    error_count = models.PositiveIntegerField(default=0, verbose_name="Số dòng lỗi")
+    errors = models.JSONField(default=list, blank=True, verbose_name="Chi tiết lỗi")  # [{'row': 5, 'message': '...'}]
+    duplicate_count = models.PositiveIntegerField(default=0, verbose_name="Số câu nghi trùng")
+    # [{'row': 5, 'question_id': 12, 'text': '...', 'duplicate_of': 3, 'similarity': 0.9}]
+    duplicates = models.JSONField(default=list, blank=True, verbose_name="Câu hỏi nghi trùng")
+    message = models.TextField(blank=True, default='', verbose_name="Thông báo")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Lease của tiến trình đang chạy job, gia hạn sau mỗi lô; quá QUIZ_IMPORT_LEASE_SECONDS thì job được nhận lại
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'id'])]
+
+    def __str__(self):
+        return f"{self.file_name} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.Status.DONE, self.Status.FAILED)
+
+    @property
+    def percent(self):
+        if self.status == self.Status.DONE:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, self.processed_rows * 100 // self.total_rows)
@@ -0,0 +1,211 @@
+# quiz/notifications.py
+
+# ===========================================================================
+# THÔNG BÁO THỜI GIAN THỰC (SERVER-SENT EVENTS): YÊU CẦU HỖ TRỢ CHƯA ĐỌC, BÀI CHỜ CHẤM
+# ===========================================================================
+#
+# Ghi SupportTicket / Result -> (sau khi commit) publish lên kênh của những người liên quan
+# ('user:<id>', 'role:<ROLE>', xem quiz/signals.py) -> mỗi kết nối SSE đang mở trên các kênh đó
+# đọc lại bộ đếm (quiz/counters.py, thường chỉ là 1 lần đọc cache) và đẩy xuống trình duyệt,
+# không ai phải tải lại trang hay hỏi định kỳ.
+#
+# InProcessBroker chỉ chuyển sự kiện giữa các kết nối trong CÙNG tiến trình: Result do worker
+# grade_submissions (tiến trình riêng) tạo ra sẽ không bao giờ tới được trình duyệt.
+# Broker mặc định (CacheBroker) chuyển sự kiện giữa các tiến trình qua cache dùng chung (CACHES),
+# trễ tối đa QUIZ_NOTIFICATION_POLL_SECONDS giây. Cần độ trễ thấp hơn thì trỏ QUIZ_NOTIFICATION_BROKER
+# tới một broker pub/sub thật (VD Redis) có cùng giao diện subscribe / unsubscribe / publish.
+
+import asyncio
+import functools
+import json
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils.module_loading import import_string
+
+from .counters import get_counters
+
+# Vai trò có bộ đếm
+NOTIFIED_ROLES = ('TEACHER', 'ADMIN')
+
+
+class InProcessBroker:
+    """
+    Pub/sub trong bộ nhớ của tiến trình. subscribe / unsubscribe gọi trong event loop của kết nối SSE,
+    publish gọi được từ bất kỳ thread nào (view đồng bộ, signal).
+    Sự kiện chỉ là tín hiệu "có thay đổi": hàng đợi mỗi kết nối giữ tối đa 1 sự kiện, các sự kiện
+    đến dồn trong lúc đang tính lại bộ đếm được gộp làm một.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, channels):
+        queue = asyncio.Queue(maxsize=1)
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(subscriber)
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            for channel, subscribers in list(self._subscribers.items()):
+                subscribers.difference_update({subscriber for subscriber in subscribers if subscriber[1] is queue})
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # Event loop của kết nối đã đóng
+                self.unsubscribe(queue)
+
+
+def _offer(queue, event):
+    if not queue.full():
+        queue.put_nowait(event)
+
+
+class CacheBroker(InProcessBroker):
+    """
+    Broker giữa các tiến trình qua cache dùng chung. publish (từ bất kỳ tiến trình nào, VD worker chấm bài)
+    tăng số phiên bản của kênh trong cache; mỗi tiến trình có kết nối SSE chạy một thread đọc phiên bản
+    các kênh đang được nghe (1 lần get_many mỗi QUIZ_NOTIFICATION_POLL_SECONDS giây) và phát cho
+    các kết nối của mình khi phiên bản đổi. Kết nối trong cùng tiến trình nhận sự kiện ngay.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._versions = {}
+        self._poller = None
+
+    @staticmethod
+    def _version_key(channel):
+        return f'notifications:version:{channel}'
+
+    def subscribe(self, channels):
+        queue = super().subscribe(channels)
+        with self._lock:
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll, daemon=True)
+                self._poller.start()
+        return queue
+
+    def publish(self, channel, event):
+        key = self._version_key(channel)
+        try:
+            version = cache.incr(key)
+        except ValueError:
+            # Kênh chưa có phiên bản (hai tiến trình cùng tạo: một sự kiện bị gộp, không mất thay đổi)
+            version = 1
+            cache.add(key, version, None)
+        with self._lock:
+            self._versions[channel] = version
+        super().publish(channel, event)
+
+    def _poll(self):
+        while True:
+            time.sleep(settings.QUIZ_NOTIFICATION_POLL_SECONDS)
+            with self._lock:
+                channels = list(self._subscribers)
+            if not channels:
+                continue
+            try:
+                close_old_connections()
+                versions = cache.get_many([self._version_key(channel) for channel in channels])
+            except DatabaseError:
+                continue
+            for channel in channels:
+                version = versions.get(self._version_key(channel))
+                with self._lock:
+                    changed = channel in self._versions and self._versions[channel] != version
+                    self._versions[channel] = version
+                if changed:
+                    InProcessBroker.publish(self, channel, 'remote')
+
+
+@functools.cache
+def get_broker():
+    return import_string(settings.QUIZ_NOTIFICATION_BROKER)()
+
+
+# ===== KÊNH VÀ PHÁT SỰ KIỆN =====
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def role_channel(role):
+    return f'role:{role}'
+
+
+def ticket_channels(ticket):
+    """Người thấy yêu cầu trong hộp thư: GV được gửi tới (chưa phân công: mọi GV) và admin"""
+    teachers = user_channel(ticket.teacher_id) if ticket.teacher_id else role_channel('TEACHER')
+    return [teachers, role_channel('ADMIN')]
+
+
+def result_channels(result):
+    """Trang chấm bài tự luận hiển thị bài của mọi đề cho mọi giáo viên"""
+    return [role_channel('TEACHER')]
+
+
+def notify(channels, event):
+    """Phát sự kiện sau khi transaction hiện tại commit (rollback thì không phát)"""
+    broker = get_broker()
+    transaction.on_commit(lambda: [broker.publish(channel, event) for channel in channels])
+
+
+# ===== BỘ ĐẾM =====
+
+def user_counters(user):
+    """Bộ đếm hiển thị trên menu: unread_tickets (GV, admin), pending_grading (GV), xem quiz/counters.py"""
+    counters = get_counters(user)
+    return {name: counters[name] for name in ('unread_tickets', 'pending_grading') if name in counters}
+
+
+def _sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+async def counter_events(user):
+    """
+    Luồng SSE của một người dùng: bộ đếm hiện tại, rồi bộ đếm mới mỗi khi có sự kiện trên kênh của họ.
+    Không có sự kiện thì chỉ gửi dòng chú thích giữ kết nối (không truy vấn).
+    """
+    broker = get_broker()
+    queue = broker.subscribe([user_channel(user.pk), role_channel(user.role)])
+    try:
+        yield f'retry: {settings.QUIZ_NOTIFICATION_RETRY_SECONDS * 1000}\n\n'
+        counters = None
+        while True:
+            latest = await sync_to_async(user_counters)(user)
+            if latest != counters:
+                counters = latest
+                yield _sse('counters', counters)
+            while True:
+                try:
+                    await asyncio.wait_for(queue.get(), settings.QUIZ_NOTIFICATION_HEARTBEAT_SECONDS)
+                    break
+                except asyncio.TimeoutError:
+                    yield ': ping\n\n'
+    finally:
+        broker.unsubscribe(queue)
+
+
+def counter_snapshot(user):
+    """Một lần gửi duy nhất (khi chạy WSGI, không giữ được kết nối): trình duyệt tự kết nối lại sau retry"""
+    return (
+        f'retry: {settings.QUIZ_NOTIFICATION_FALLBACK_RETRY_SECONDS * 1000}\n\n'
+        + _sse('counters', user_counters(user))
+    )
@@ -0,0 +1,120 @@
+# quiz/pagination.py
+
+# ===========================================================================
+# PHÂN TRANG KEYSET - TRANG SÂU NHANH NHƯ TRANG ĐẦU
+# ===========================================================================
+#
+# Thay cho OFFSET (Paginator): mỗi trang lọc "sau/trước con trỏ" rồi LIMIT, nên chỉ đọc
+# đúng số dòng của trang qua index (VD: (created_by, -created_at, -id) của Question).
+#   ?after=<con trỏ>   trang kế tiếp
+#   ?before=<con trỏ>  trang trước
+#   ?last=1            trang cuối
+# Con trỏ = giá trị các khoá sắp xếp của dòng cuối / đầu trang hiện tại, nối bằng "_",
+# mỗi giá trị có tiền tố kiểu: d (datetime, micro giây từ epoch), f (float), i (int).
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+DEFAULT_ORDERING = ('-created_at', '-id')
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        delta = value - EPOCH
+        return f'd{(delta.days * 86400 + delta.seconds) * 10 ** 6 + delta.microseconds}'
+    if isinstance(value, float):
+        return f'f{value!r}'
+    return f'i{int(value)}'
+
+
+def _decode_value(value):
+    kind, raw = value[:1], value[1:]
+    if kind == 'd':
+        return EPOCH + timedelta(microseconds=int(raw))
+    if kind == 'f':
+        return float(raw)
+    if kind == 'i':
+        return int(raw)
+    raise ValueError(value)
+
+
+def encode_cursor(obj, ordering=DEFAULT_ORDERING):
+    return '_'.join(_encode_value(getattr(obj, field.lstrip('-'))) for field in ordering)
+
+
+def decode_cursor(value, ordering=DEFAULT_ORDERING):
+    """Con trỏ -> tuple giá trị các khoá; None nếu không hợp lệ"""
+    try:
+        values = tuple(_decode_value(part) for part in value.split('_'))
+    except (AttributeError, ValueError, OverflowError):
+        return None
+    return values if len(values) == len(ordering) else None
+
+
+def _reverse(ordering):
+    return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+
+def _after(ordering, values):
+    """Điều kiện "đứng sau con trỏ" theo thứ tự ordering: (a, b) > (x, y) viết thành OR các AND"""
+    condition = None
+    for i, field in enumerate(ordering):
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        equal = {ordering[j].lstrip('-'): values[j] for j in range(i)}
+        term = Q(**equal, **{f'{field.lstrip("-")}__{lookup}': values[i]})
+        condition = term if condition is None else condition | term
+    return condition
+
+
+class KeysetPage:
+    """Một trang kết quả; dùng như page_obj (duyệt được, has_next, has_previous, con trỏ trang)"""
+
+    def __init__(self, object_list, has_next, has_previous, ordering=DEFAULT_ORDERING):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.ordering = ordering
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1], self.ordering) if self.object_list else ''
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.object_list[0], self.ordering) if self.object_list else ''
+
+
+def keyset_page(queryset, params, per_page, ordering=DEFAULT_ORDERING):
+    """
+    Lấy một trang của queryset theo tham số GET (after / before / last), 1 truy vấn.
+    ordering là các trường sắp xếp, trường cuối phải duy nhất (thường là id).
+    """
+    after = decode_cursor(params.get('after'), ordering)
+    before = decode_cursor(params.get('before'), ordering)
+    reverse = _reverse(ordering)
+
+    if before:
+        rows = list(queryset.filter(_after(reverse, before)).order_by(*reverse)[:per_page + 1])
+        return KeysetPage(rows[:per_page][::-1], True, len(rows) > per_page, ordering)
+
+    if params.get('last'):
+        rows = list(queryset.order_by(*reverse)[:per_page + 1])
+        return KeysetPage(rows[:per_page][::-1], False, len(rows) > per_page, ordering)
+
+    if after:
+        queryset = queryset.filter(_after(ordering, after))
+    rows = list(queryset.order_by(*ordering)[:per_page + 1])
+    return KeysetPage(rows[:per_page], len(rows) > per_page, bool(after), ordering)
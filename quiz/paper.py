@@ -0,0 +1,111 @@
+# quiz/paper.py
+
+# ===========================================================================
+# ĐỀ THI CỦA TỪNG HỌC SINH: DỮ LIỆU ĐỀ CACHE SẴN + HOÁN VỊ CÓ SEED
+# ===========================================================================
+
+import random
+from typing import NamedTuple
+
+from django.core.cache import cache
+
+from .models import Question, Quiz
+
+# Thời gian sống của dữ liệu đề trong cache (giây), bị xoá khi đề thay đổi (xem quiz/signals.py)
+PAYLOAD_TIMEOUT = 60 * 60 * 24
+
+CHOICE_TYPES = (
+    Question.QuestionType.SINGLE_CHOICE,
+    Question.QuestionType.MULTIPLE_CHOICE,
+    Question.QuestionType.TRUE_FALSE,
+)
+
+
+class PaperAnswer(NamedTuple):
+    id: int
+    text: str
+
+
+class PaperQuestion(NamedTuple):
+    """Bản sao gọn của Question dùng để hiển thị đề (không chứa đáp án đúng của câu trắc nghiệm)"""
+    id: int
+    text: str
+    question_type: str
+    difficulty: str
+    explanation: str
+    correct_answer_text: str
+    answers: tuple
+
+    def get_question_type_display(self):
+        return Question.QuestionType(self.question_type).label
+
+    def get_difficulty_display(self):
+        return Question.Difficulty(self.difficulty).label if self.difficulty else ''
+
+
+def build_quiz_payload(quiz_id):
+    """Tải câu hỏi và đáp án của đề bằng 2 truy vấn, sắp theo id để thứ tự gốc ổn định"""
+    questions = Question.objects.filter(quiz__id=quiz_id).order_by('id').prefetch_related('answers')
+    return tuple(
+        PaperQuestion(
+            id=q.id,
+            text=q.text,
+            question_type=q.question_type,
+            difficulty=q.difficulty,
+            explanation=q.explanation or '',
+            correct_answer_text=q.correct_answer_text or '',
+            answers=tuple(PaperAnswer(a.id, a.text) for a in sorted(q.answers.all(), key=lambda a: a.id)),
+        )
+        for q in questions
+    )
+
+
+def _cache_key(quiz_id):
+    return f'quiz:{quiz_id}:payload'
+
+
+def get_quiz_payload(quiz, refresh=False):
+    """Lấy dữ liệu đề (từ cache, tải lại nếu chưa có hoặc refresh=True)"""
+    quiz_id = quiz.pk if isinstance(quiz, Quiz) else quiz
+    payload = None if refresh else cache.get(_cache_key(quiz_id))
+    if payload is None:
+        payload = build_quiz_payload(quiz_id)
+        cache.set(_cache_key(quiz_id), payload, PAYLOAD_TIMEOUT)
+    return payload
+
+
+def invalidate_payloads(quiz_ids):
+    """Xoá dữ liệu đề đã cache"""
+    cache.delete_many([_cache_key(quiz_id) for quiz_id in quiz_ids])
+
+
+def paper_rng(quiz_id, student_id, attempt):
+    """RNG xác định theo (đề, học sinh, lần thi): tải lại trang vẫn ra cùng một đề"""
+    return random.Random(f'{quiz_id}:{student_id}:{attempt}')
+
+
+def render_paper(quiz, student, attempt, question_ids=None):
+    """
+    Tạo đề riêng cho học sinh: xáo thứ tự câu hỏi và đáp án bằng hoán vị có seed.
+    question_ids: chỉ lấy các câu này (đề bốc ngẫu nhiên, xem quiz/attempts.py); None = mọi câu.
+    Không truy vấn DB khi dữ liệu đề đã có trong cache.
+    """
+    rng = paper_rng(quiz.pk, student.pk, attempt)
+    questions = list(get_quiz_payload(quiz))
+    if question_ids is not None:
+        questions = [q for q in questions if q.id in question_ids]
+    rng.shuffle(questions)
+
+    shuffled_questions = []
+    for q in questions:
+        answers = []
+        if q.question_type in CHOICE_TYPES:
+            # Xáo trộn đáp án cho câu hỏi có lựa chọn
+            answers = list(q.answers)
+            rng.shuffle(answers)
+        shuffled_questions.append({
+            'question': q,
+            'answers': answers,
+            'question_type': q.question_type,
+        })
+    return shuffled_questions
@@ -0,0 +1,56 @@
+# quiz/prewarm.py
+
+# ===========================================================================
+# LÀM NÓNG CACHE TRƯỚC GIỜ THI (TRÁNH "THUNDERING HERD" LÚC start_time)
+# ===========================================================================
+#
+# Lệnh `prewarm_quizzes` chạy trong tiến trình riêng: dữ liệu chỉ đến được các worker web khi
+# cache dùng chung (DatabaseCache / Redis, xem CACHES trong settings). Với LocMemCache lệnh chỉ
+# làm nóng bộ nhớ của chính nó rồi thoát, nên lệnh từ chối chạy.
+
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .answer_key import get_answer_key
+from .models import Quiz
+from .paper import get_quiz_payload
+from .visibility import get_allowed_student_ids, get_quiz_schedule
+
+
+def upcoming_quizzes(lead_minutes, now=None):
+    """Các đề sẽ mở trong `lead_minutes` phút tới"""
+    now = now or timezone.now()
+    return Quiz.objects.filter(
+        start_time__gt=now,
+        start_time__lte=now + timedelta(minutes=lead_minutes),
+    ).order_by('start_time')
+
+
+def prewarm_quiz(quiz):
+    """Tính trước và ghi đè vào cache dữ liệu đề, đáp án và danh sách học sinh của một đề"""
+    payload = get_quiz_payload(quiz, refresh=True)
+    answer_key = get_answer_key(quiz, refresh=True)
+    allowed_students = get_allowed_student_ids(quiz, refresh=True)
+    return {
+        'quiz_id': quiz.pk,
+        'title': quiz.title,
+        'start_time': quiz.start_time,
+        'questions': len(payload),
+        'answer_key_entries': len(answer_key),
+        'allowed_students': len(allowed_students),
+    }
+
+
+def prewarm_upcoming(lead_minutes, skip=()):
+    """
+    Làm nóng cache cho các đề sắp mở (bỏ qua các (quiz_id, start_time) trong `skip`)
+    và làm mới lịch đề thi của dashboard. Trả về (số đề trên lịch, báo cáo từng đề).
+    """
+    reports = [
+        prewarm_quiz(quiz)
+        for quiz in upcoming_quizzes(lead_minutes)
+        if (quiz.pk, quiz.start_time) not in skip
+    ]
+    schedule = get_quiz_schedule(refresh=True) if reports else get_quiz_schedule()
+    return len(schedule), reports
@@ -0,0 +1,107 @@
+# quiz/responses.py
+
+# ===========================================================================
+# LƯU BÀI LÀM DẠNG NÉN: CÂU CÓ LỰA CHỌN GỘP VÀO 1 CỘT Result.packed_answers
+# ===========================================================================
+#
+# packed_answers là mảng uint32 little-endian các cặp (question_id, answer_id), sắp theo
+# question_id rồi answer_id (8 byte / lựa chọn, không có dòng StudentAnswer nào).
+# Chỉ câu tự luận (cần giáo viên chấm) còn lưu thành dòng StudentAnswer.
+# packed_answers = NULL: kết quả cũ, mọi câu trả lời vẫn nằm trong StudentAnswer
+# (manage.py pack_student_answers để chuyển sang dạng nén).
+
+import sys
+from array import array
+from typing import NamedTuple
+
+from django.db import transaction
+
+from results.models import Result, StudentAnswer
+
+PACKED_TYPECODE = 'I'
+
+
+class Responses(NamedTuple):
+    """Bài làm của một kết quả: {question_id: set(answer_id)} + các dòng StudentAnswer tự luận"""
+    selected: dict
+    short_answers: list
+
+
+def pack_selections(pairs):
+    """[(question_id, answer_id)] -> bytes"""
+    packed = array(PACKED_TYPECODE)
+    for question_id, answer_id in sorted(pairs):
+        packed.append(question_id)
+        packed.append(answer_id)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_selections(blob):
+    """bytes -> [(question_id, answer_id)]"""
+    packed = array(PACKED_TYPECODE)
+    packed.frombytes(bytes(blob))
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return list(zip(packed[::2], packed[1::2]))
+
+
+def selections_dict(pairs):
+    selected = {}
+    for question_id, answer_id in pairs:
+        selected.setdefault(question_id, set()).add(answer_id)
+    return selected
+
+
+def load_responses(results):
+    """
+    Đọc bài làm của nhiều kết quả (cả dạng nén lẫn dạng cũ) bằng 1 truy vấn StudentAnswer.
+    results cần có packed_answers. Trả về {result_id: Responses}.
+    """
+    responses = {}
+    for result in results:
+        pairs = unpack_selections(result.packed_answers) if result.packed_answers is not None else []
+        responses[result.id] = Responses(selections_dict(pairs), [])
+
+    for sa in StudentAnswer.objects.filter(result__in=[result.id for result in results]).order_by('id'):
+        entry = responses[sa.result_id]
+        if sa.selected_answer_id:
+            entry.selected.setdefault(sa.question_id, set()).add(sa.selected_answer_id)
+        else:
+            entry.short_answers.append(sa)
+    return responses
+
+
+def get_responses(result):
+    """Bài làm của một kết quả"""
+    return load_responses([result])[result.id]
+
+
+def pack_results(batch_size=500):
+    """
+    Chuyển các kết quả cũ sang dạng nén theo lô: gộp các dòng StudentAnswer có lựa chọn
+    vào packed_answers rồi xoá các dòng đó. Trả về (số kết quả, số dòng đã xoá).
+    """
+    packed_count = deleted_count = 0
+    last_id = 0
+    while True:
+        results = list(
+            Result.objects.filter(packed_answers__isnull=True, id__gt=last_id).order_by('id').only('id')[:batch_size]
+        )
+        if not results:
+            return packed_count, deleted_count
+        last_id = results[-1].id
+
+        pairs = {result.id: [] for result in results}
+        rows = StudentAnswer.objects.filter(result__in=results, selected_answer__isnull=False)
+        for result_id, question_id, answer_id in rows.values_list('result_id', 'question_id', 'selected_answer_id'):
+            pairs[result_id].append((question_id, answer_id))
+
+        with transaction.atomic():
+            for result in results:
+                result.packed_answers = pack_selections(pairs[result.id])
+            Result.objects.bulk_update(results, ['packed_answers'])
+            deleted, _ = rows.delete()
+        packed_count += len(results)
+        deleted_count += deleted
@@ -0,0 +1,126 @@
+# quiz/review.py
+
+# ===========================================================================
+# BẢN CHỤP BÀI LÀM (REVIEW SNAPSHOT) - HIỂN THỊ view_result KHÔNG CẦN JOIN StudentAnswer
+# ===========================================================================
+
+# Định dạng bản chụp: xem REVIEW_VERSION trong quiz/grading.py
+
+from .answer_key import get_answer_key
+from .attempts import result_question_ids
+from .grading import choice_entry, make_review, short_answer_entry
+from .models import Question
+from .paper import get_quiz_payload
+from .responses import get_responses, load_responses
+from results.models import Result
+
+
+def build_review_from_answers(answer_key, responses):
+    """Tạo bản chụp từ bài làm đã lưu (quiz.responses.Responses, dùng khi backfill kết quả cũ)"""
+    short_answers = {
+        sa.question_id: short_answer_entry(sa.custom_answer or '', sa.points_earned, sa.teacher_comment)
+        for sa in responses.short_answers
+    }
+
+    questions = {}
+    for question_id, entry in answer_key.items():
+        if entry.type == Question.QuestionType.SHORT_ANSWER:
+            if question_id in short_answers:
+                questions[question_id] = short_answers[question_id]
+        else:
+            questions[question_id] = choice_entry(entry, responses.selected.get(question_id, set()))
+    return make_review(questions)
+
+
+def backfill_reviews(batch_size=500):
+    """
+    Tạo bản chụp cho các Result chưa có (theo lô: 1 truy vấn Result + 1 truy vấn StudentAnswer + 1 bulk_update).
+    Trả về số kết quả đã cập nhật.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        results = list(
+            Result.objects.filter(review__isnull=True, id__gt=last_id).order_by('id')
+            .only('id', 'quiz_id', 'packed_answers')[:batch_size]
+        )
+        if not results:
+            return updated
+        last_id = results[-1].id
+
+        responses = load_responses(results)
+        for result in results:
+            result.review = build_review_from_answers(get_answer_key(result.quiz_id), responses[result.id])
+        Result.objects.bulk_update(results, ['review'])
+        updated += len(results)
+
+
+def get_review(result):
+    """Bản chụp của kết quả; kết quả cũ chưa được backfill thì tạo ngay và lưu lại"""
+    if result.review is None:
+        result.review = build_review_from_answers(get_answer_key(result.quiz_id), get_responses(result))
+        Result.objects.filter(pk=result.pk).update(review=result.review)
+    return result.review
+
+
+def update_short_answer_review(result, student_answers):
+    """Ghi điểm / nhận xét giáo viên vừa chấm vào bản chụp"""
+    review = get_review(result)
+    for sa in student_answers:
+        review['q'][str(sa.question_id)] = short_answer_entry(sa.custom_answer or '', sa.points_earned, sa.teacher_comment)
+    Result.objects.filter(pk=result.pk).update(review=review)
+
+
+def review_items(result):
+    """
+    Danh sách câu hỏi cho trang kết quả: nội dung từ dữ liệu đề đã cache + bài làm từ bản chụp.
+    Câu được thêm vào đề sau khi nộp bài được coi là chưa trả lời.
+    Đề bốc ngẫu nhiên: chỉ hiển thị các câu học sinh đã nhận (nên select_related('attempt')).
+    """
+    questions = get_review(result)['q']
+    drawn = result_question_ids(result)
+    answer_key = None
+    items = []
+
+    for question in get_quiz_payload(result.quiz_id):
+        if drawn is not None and question.id not in drawn:
+            continue
+        data = questions.get(str(question.id))
+        is_short_answer = question.question_type == Question.QuestionType.SHORT_ANSWER
+
+        if is_short_answer:
+            data = data or short_answer_entry('')
+            items.append({
+                'question': question,
+                'question_type': question.question_type,
+                'correct_answer_text': question.correct_answer_text,
+                'student_answer_text': data['t'],
+                'points_earned': data['p'],
+                'teacher_comment': data['m'],
+                'is_correct': data['p'] > 0,
+                'is_short_answer': True,
+                'is_multiple_choice': False,
+                'explanation': question.explanation,
+            })
+            continue
+
+        if data is None:
+            if answer_key is None:
+                answer_key = get_answer_key(result.quiz_id)
+            entry = answer_key.get(question.id)
+            data = choice_entry(entry, set()) if entry else {'s': [], 'c': [], 'ok': False}
+
+        selected_ids = set(data['s'])
+        correct_ids = set(data['c'])
+        items.append({
+            'question': question,
+            'question_type': question.question_type,
+            'all_answers': question.answers,
+            'selected_ids': selected_ids,
+            'correct_ids': correct_ids,
+            'is_correct': data['ok'],
+            'is_short_answer': False,
+            'is_multiple_choice': question.question_type == Question.QuestionType.MULTIPLE_CHOICE,
+            'explanation': question.explanation,
+        })
+    return items
@@ -0,0 +1,195 @@
+# quiz/search.py
+
+# ===========================================================================
+# TÌM KIẾM CÂU HỎI: FULL-TEXT, KHÔNG DẤU, CÓ XẾP HẠNG
+# ===========================================================================
+#
+# Question.search_text lưu bản "bỏ dấu + chữ thường" của nội dung, giải thích và các đáp án
+# (cập nhật qua signal, xem quiz/signals.py; importer tự tính khi bulk_create).
+# Chỉ mục trên cột này (ensure_search_index, gọi trong migration 0012 và sau mỗi lần migrate):
+#   - SQLite: bảng ảo FTS5 quiz_question_fts (external content), đồng bộ bằng trigger
+#   - PostgreSQL: chỉ mục GIN trên to_tsvector('simple', search_text)
+# Backend khác: lọc icontains trên search_text (không có chỉ mục, không xếp hạng).
+
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+
+def fts_table(table):
+    return f'{table}_fts'
+
+
+def sqlite_triggers(table):
+    """Trigger giữ bảng FTS5 (external content) của `table` khớp với cột search_text"""
+    fts = fts_table(table)
+    return {
+        f'{fts}_insert': f"""AFTER INSERT ON {table} BEGIN
+        INSERT INTO {fts}(rowid, search_text) VALUES (new.id, new.search_text);
+    END""",
+        f'{fts}_delete': f"""AFTER DELETE ON {table} BEGIN
+        INSERT INTO {fts}({fts}, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+    END""",
+        f'{fts}_update': f"""AFTER UPDATE OF search_text ON {table} BEGIN
+        INSERT INTO {fts}({fts}, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+        INSERT INTO {fts}(rowid, search_text) VALUES (new.id, new.search_text);
+    END""",
+    }
+
+
+def postgresql_index(table):
+    return f'{table}_search_tsv'
+
+
+QUESTION_TABLE = 'quiz_question'
+FTS_TABLE = fts_table(QUESTION_TABLE)
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def fold_text(text):
+    """'Đạo hàm' -> 'dao ham': bỏ dấu tiếng Việt, đ -> d, chữ thường"""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFD', text.replace('đ', 'd').replace('Đ', 'D'))
+    return ''.join(char for char in text if unicodedata.category(char) != 'Mn').lower()
+
+
+def search_tokens(query):
+    """Các từ (đã bỏ dấu) trong chuỗi tìm kiếm"""
+    return _TOKEN_RE.findall(fold_text(query))
+
+
+def build_search_text(text, explanation='', answer_texts=()):
+    return fold_text(' '.join(filter(None, [text, explanation, *answer_texts])))
+
+
+def question_search_text(question):
+    """search_text của một câu hỏi đã lưu (1 truy vấn đáp án)"""
+    answer_texts = question.answers.order_by('id').values_list('text', flat=True) if question.pk else ()
+    return build_search_text(question.text, question.explanation, answer_texts)
+
+
+# ===== TẠO / XOÁ CHỈ MỤC (dùng chung cho mọi bảng có cột search_text, VD support/search.py) =====
+
+def ensure_text_index(connection, table):
+    """
+    Tạo chỉ mục tìm kiếm trên `table`.search_text nếu chưa có. Trên SQLite, migration AlterField dựng lại
+    bảng làm mất trigger: tạo lại trigger và dựng lại chỉ mục FTS từ search_text.
+    """
+    with connection.cursor() as cursor:
+        columns = {column.name for column in connection.introspection.get_table_description(cursor, table)}
+        if 'search_text' not in columns:
+            # Chưa chạy (hoặc đã rollback) migration thêm search_text
+            return
+        if connection.vendor == 'sqlite':
+            triggers = sqlite_triggers(table)
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [table])
+            existing = {row[0] for row in cursor.fetchall()}
+            if existing >= set(triggers):
+                return
+            # External content: FTS5 chỉ lưu chỉ mục, nội dung đọc từ cột search_text của bảng gốc
+            fts = fts_table(table)
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"search_text, content='{table}', content_rowid='id', prefix='2 3')"
+            )
+            for name, body in triggers.items():
+                cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {postgresql_index(table)} ON {table} "
+                "USING gin (to_tsvector('simple', search_text))"
+            )
+
+
+def drop_text_index(connection, table):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for name in sqlite_triggers(table):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {fts_table(table)}')
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f'DROP INDEX IF EXISTS {postgresql_index(table)}')
+
+
+def ensure_search_index(connection=connection):
+    ensure_text_index(connection, QUESTION_TABLE)
+
+
+def drop_search_index(connection=connection):
+    drop_text_index(connection, QUESTION_TABLE)
+
+
+# ===== TÌM KIẾM =====
+
+def _fts_match(tokens):
+    # Mỗi từ đặt trong ngoặc kép (không bị hiểu là toán tử FTS5), * = khớp tiền tố
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _tsquery(tokens):
+    return ' & '.join(f'{token}:*' for token in tokens)
+
+
+def filter_text_index(queryset, table, query):
+    """
+    Lọc queryset (của bảng `table`) theo chuỗi tìm kiếm: mọi từ đều phải xuất hiện (khớp theo tiền tố).
+    Trên SQLite dùng "id IN (truy vấn FTS)" để chỉ mục FTS luôn được quét trước (COUNT nhanh).
+    """
+    tokens = search_tokens(query)
+    if not tokens:
+        return queryset
+    if connection.vendor == 'sqlite':
+        fts = fts_table(table)
+        return queryset.filter(id__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', (_fts_match(tokens),)))
+    if connection.vendor == 'postgresql':
+        # Đúng biểu thức của chỉ mục GIN (SearchVector của django.contrib.postgres bọc COALESCE -> không dùng được chỉ mục)
+        return queryset.filter(RawSQL(
+            f"to_tsvector('simple', {table}.search_text) @@ to_tsquery('simple', %s)",
+            (_tsquery(tokens),), output_field=BooleanField(),
+        ))
+    condition = Q()
+    for token in tokens:
+        condition &= Q(search_text__icontains=token)
+    return queryset.filter(condition)
+
+
+def search_questions(queryset, query):
+    """Lọc queryset câu hỏi theo chuỗi tìm kiếm (xem filter_text_index)"""
+    return filter_text_index(queryset, QUESTION_TABLE, query)
+
+
+def rank_questions(queryset, query):
+    """Gắn search_rank (càng nhỏ càng liên quan) cho queryset đã qua search_questions, để sắp xếp trang kết quả"""
+    tokens = search_tokens(query)
+    if tokens and connection.vendor == 'sqlite':
+        # bm25() chỉ tính được khi join với bảng FTS5 (QuestionSearchIndex, join theo rowid) trong truy vấn MATCH;
+        # trả về số âm, càng nhỏ càng khớp
+        return queryset.filter(
+            RawSQL(f'{FTS_TABLE} MATCH %s', (_fts_match(tokens),), output_field=BooleanField()),
+            search_index__isnull=False,
+        ).annotate(search_rank=RawSQL(f'bm25({FTS_TABLE})', (), output_field=FloatField()))
+    if tokens and connection.vendor == 'postgresql':
+        return queryset.annotate(search_rank=RawSQL(
+            "-ts_rank(to_tsvector('simple', quiz_question.search_text), to_tsquery('simple', %s))",
+            (_tsquery(tokens),), output_field=FloatField(),
+        ))
+    return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+def refresh_search_text(question_ids):
+    """Tính lại search_text cho các câu hỏi (sau khi đáp án thay đổi)"""
+    from .models import Answer, Question
+
+    answers = {}
+    for question_id, text in Answer.objects.filter(question_id__in=question_ids).order_by('id').values_list('question_id', 'text'):
+        answers.setdefault(question_id, []).append(text)
+    for question_id, text, explanation in Question.objects.filter(pk__in=question_ids).values_list('id', 'text', 'explanation'):
+        Question.objects.filter(pk=question_id).update(
+            search_text=build_search_text(text, explanation, answers.get(question_id, ()))
+        )
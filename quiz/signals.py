@@ -0,0 +1,226 @@
+# quiz/signals.py
+
+import threading
+from contextlib import contextmanager
+
+from django.db import connections
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from results.models import Result
+from support.models import SupportTicket
+
+from .analytics import invalidate_item_analysis
+from .blueprints import invalidate_pools
+from .counters import (
+    RESULT_FIELDS, TICKET_FIELDS, invalidate_pending_grading, record_change, result_keys, saved_state, snapshot,
+    stored_state, ticket_keys,
+)
+from .answer_key import invalidate_answer_keys, quiz_ids_for_questions
+from .dedup import refresh_fingerprints
+from .models import Answer, Question, Quiz, Subject
+from .notifications import notify, result_channels, ticket_channels
+from .paper import invalidate_payloads
+from .search import ensure_search_index, question_search_text, refresh_search_text
+from .subjects import invalidate_subjects
+from .visibility import invalidate_allowed_students, invalidate_quiz_schedule
+
+
+# ===== XOÁ CACHE CỦA ĐỀ (ĐÁP ÁN, DỮ LIỆU ĐỀ) KHI CÂU HỎI / ĐÁP ÁN / ĐỀ THI THAY ĐỔI =====
+
+def invalidate_quiz_caches(quiz_ids):
+    if quiz_ids:
+        invalidate_answer_keys(quiz_ids)
+        invalidate_payloads(quiz_ids)
+        invalidate_item_analysis(quiz_ids)
+        # Đề có / không có câu tự luận quyết định bài đã nộp có "chờ chấm" hay không
+        invalidate_pending_grading()
+        # Số câu hỏi hiển thị trên dashboard
+        invalidate_quiz_schedule()
+
+
+# pre_delete: liên kết M2M của câu hỏi bị xoá trước khi post_delete được gọi
+@receiver([post_save, pre_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    invalidate_quiz_caches(quiz_ids_for_questions([instance.pk]))
+
+
+@receiver([post_save, post_delete], sender=Answer)
+def answer_changed(sender, instance, **kwargs):
+    invalidate_quiz_caches(quiz_ids_for_questions([instance.question_id]))
+
+
+@receiver(m2m_changed, sender=Quiz.questions.through)
+def quiz_questions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        # quiz.questions.add/remove/clear(...)
+        invalidate_quiz_caches([instance.pk])
+    elif action == 'pre_clear':
+        # question.quiz_set.clear(): lấy danh sách đề trước khi xoá liên kết
+        invalidate_quiz_caches(quiz_ids_for_questions([instance.pk]))
+    elif pk_set:
+        # question.quiz_set.add/remove(...): pk_set là id các đề thi
+        invalidate_quiz_caches(pk_set)
+
+
+# ===== LỊCH ĐỀ THI TRÊN DASHBOARD & DANH SÁCH HỌC SINH ĐƯỢC PHÉP THI =====
+
+@receiver([post_save, post_delete], sender=Quiz)
+def quiz_changed(sender, instance, **kwargs):
+    invalidate_quiz_schedule()
+
+
+@receiver(post_delete, sender=Quiz)
+def quiz_deleted(sender, instance, **kwargs):
+    # Bài nộp bị xoá theo đề: đáp án của đề không còn để tính chênh lệch -> đếm lại
+    invalidate_pending_grading()
+
+
+@receiver([post_save, post_delete], sender=Subject)
+def subject_changed(sender, instance, **kwargs):
+    invalidate_quiz_schedule()
+    invalidate_subjects()
+
+
+@receiver(m2m_changed, sender=Quiz.allowed_students.through)
+def quiz_allowed_students_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_allowed_students([instance.pk])
+    elif action == 'pre_clear':
+        invalidate_allowed_students(
+            Quiz.allowed_students.through.objects.filter(user_id=instance.pk).values_list('quiz_id', flat=True)
+        )
+    elif pk_set:
+        invalidate_allowed_students(pk_set)
+
+
+# ===== CHỈ MỤC TÌM KIẾM CÂU HỎI (search_text đã bỏ dấu, xem quiz/search.py) =====
+# ===== & CHỮ KÝ MINHASH PHÁT HIỆN CÂU GẦN TRÙNG (xem quiz/dedup.py) =====
+
+_deferred = threading.local()
+
+
+@contextmanager
+def deferred_question_refresh():
+    """
+    Lưu câu hỏi cùng nhiều đáp án (form + formset): trong khối này các signal chỉ ghi nhận id câu hỏi,
+    ra khỏi khối mới tính lại search_text và chữ ký MinHash, mỗi câu 1 lần (thay vì 1 lần mỗi dòng lưu).
+    Khối bị lỗi (transaction sẽ rollback) thì bỏ qua.
+    """
+    if getattr(_deferred, 'question_ids', None) is not None:
+        # Lồng trong một khối khác: khối ngoài cùng tính lại
+        yield
+        return
+    _deferred.question_ids = set()
+    try:
+        yield
+        question_ids = _deferred.question_ids
+    finally:
+        _deferred.question_ids = None
+    refresh_question_index(question_ids)
+
+
+def refresh_question_index(question_ids):
+    if question_ids:
+        refresh_search_text(question_ids)
+        refresh_fingerprints(question_ids)
+
+
+def _defer(question_id):
+    """True nếu đang trong deferred_question_refresh (đã ghi nhận, để tính lại khi ra khỏi khối)"""
+    question_ids = getattr(_deferred, 'question_ids', None)
+    if question_ids is None:
+        return False
+    question_ids.add(question_id)
+    return True
+
+
+@receiver(pre_save, sender=Question)
+def question_search_text_changed(sender, instance, raw=False, **kwargs):
+    if not raw and (instance.pk is None or not _defer(instance.pk)):
+        instance.search_text = question_search_text(instance)
+
+
+def deleted_directly(origin, model):
+    """post_delete do chính đối tượng / QuerySet của `model` bị xoá, không phải cascade khi xoá đối tượng cha"""
+    return isinstance(origin, model) or (isinstance(origin, QuerySet) and origin.model is model)
+
+
+@receiver([post_save, post_delete], sender=Answer)
+def answer_search_text_changed(sender, instance, raw=False, signal=None, origin=None, **kwargs):
+    # Xoá câu hỏi cascade sang đáp án: không tính lại (tạo lại chữ ký của câu đang bị xoá -> lỗi khoá ngoại)
+    if raw or (signal is post_delete and not deleted_directly(origin, Answer)):
+        return
+    if not _defer(instance.question_id):
+        refresh_question_index([instance.question_id])
+
+
+@receiver(post_save, sender=Question)
+def question_fingerprint_changed(sender, instance, raw=False, **kwargs):
+    if not raw and not _defer(instance.pk):
+        refresh_fingerprints([instance.pk])
+
+
+# ===== DANH SÁCH ID THEO TẦNG ĐỂ BỐC CÂU THEO KHUNG ĐỀ (xem quiz/blueprints.py) =====
+
+@receiver([post_save, post_delete], sender=Question)
+def question_pools_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_pools(instance.created_by_id)
+
+
+# ===== BỘ ĐẾM THEO NGƯỜI DÙNG & THÔNG BÁO SSE (xem quiz/counters.py, quiz/notifications.py) =====
+
+COUNTER_SOURCES = {
+    SupportTicket: (TICKET_FIELDS, ticket_keys, ticket_channels),
+    Result: (RESULT_FIELDS, result_keys, result_channels),
+}
+
+
+@receiver(post_init, sender=SupportTicket)
+@receiver(post_init, sender=Result)
+def remember_counter_state(sender, instance, **kwargs):
+    # Trạng thái lúc nạp từ DB, để tính chênh lệch bộ đếm khi lưu
+    instance._counter_state = snapshot(instance, COUNTER_SOURCES[sender][0])
+
+
+@receiver(pre_save, sender=SupportTicket)
+@receiver(pre_save, sender=Result)
+def load_counter_state(sender, instance, raw=False, **kwargs):
+    if not raw and not instance._state.adding and instance._counter_state is None:
+        instance._counter_state = stored_state(instance, COUNTER_SOURCES[sender][0])
+
+
+@receiver(post_save, sender=SupportTicket)
+@receiver(post_save, sender=Result)
+def counters_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    fields, keys, channels = COUNTER_SOURCES[sender]
+    previous = None if created else instance._counter_state
+    state = saved_state(instance, fields, previous)
+    record_change(keys(previous) if previous else [], keys(state))
+    instance._counter_state = state
+    notify(channels(instance), sender._meta.model_name)
+
+
+@receiver(post_delete, sender=SupportTicket)
+@receiver(post_delete, sender=Result)
+def counters_deleted(sender, instance, **kwargs):
+    fields, keys, channels = COUNTER_SOURCES[sender]
+    state = instance._counter_state or snapshot(instance, fields)
+    if state:
+        record_change(keys(state), [])
+    notify(channels(instance), sender._meta.model_name)
+
+
+@receiver(post_migrate)
+def search_index_after_migrate(sender, app_config, using, **kwargs):
+    # Migration dựng lại bảng quiz_question trên SQLite làm mất trigger FTS -> tạo lại
+    if app_config.name == 'quiz':
+        ensure_search_index(connections[using])
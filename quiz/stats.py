@@ -0,0 +1,183 @@
+# quiz/stats.py
+
+# ===========================================================================
+# THỐNG KÊ CỘNG DỒN THEO ĐỀ THI (QuizStats) - CẬP NHẬT BẰNG F(), KHÔNG QUÉT LỊCH SỬ
+# ===========================================================================
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from .models import Answer
+from .responses import unpack_selections
+from results.models import PracticeStats, QuizStats, Result, StudentAnswer
+
+# Câu trả lời được tính là đúng: lựa chọn trắc nghiệm đúng (như teacher_dashboard trước đây).
+# Câu tự luận chỉ nằm ở mẫu số, không tính là đúng dù được chấm điểm > 0.
+CORRECT_ANSWER_FILTER = Q(selected_answer__is_correct=True)
+
+
+def _upsert(model, lookup, **changes):
+    """UPDATE dòng thống kê; tạo dòng nếu chưa có (2 request cùng tạo -> thử lại UPDATE)"""
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup)
+    except IntegrityError:
+        pass
+    model.objects.filter(**lookup).update(**changes)
+
+
+def record_result(quiz_id, score, correct_answers, total_answers):
+    """Cộng một kết quả mới vào thống kê của đề (1 UPDATE nguyên tử)"""
+    bucket = f'bucket_{QuizStats.bucket_for(score)}'
+    _upsert(
+        QuizStats,
+        {'quiz_id': quiz_id},
+        attempt_count=F('attempt_count') + 1,
+        score_sum=F('score_sum') + score,
+        score_sq_sum=F('score_sq_sum') + score * score,
+        score_min=Least(Coalesce(F('score_min'), Value(score)), Value(score)),
+        score_max=Greatest(Coalesce(F('score_max'), Value(score)), Value(score)),
+        correct_answers=F('correct_answers') + correct_answers,
+        total_answers=F('total_answers') + total_answers,
+        **{bucket: F(bucket) + 1},
+    )
+
+
+def _bucket_filter(i):
+    """Điều kiện điểm của khoảng thứ i, khớp với QuizStats.bucket_for()"""
+    condition = Q()
+    if i > 0:
+        condition &= Q(score__gte=i * 10)
+    if i < QuizStats.HISTOGRAM_BUCKETS - 1:
+        condition &= Q(score__lt=i * 10 + 10)
+    return condition
+
+
+def compute_quiz_stats(quiz_ids=None):
+    """Tính thống kê từ Result / StudentAnswer (dùng khi dựng lại). Trả về list QuizStats chưa lưu."""
+    results = Result.objects.all()
+    answers = StudentAnswer.objects.all()
+    if quiz_ids is not None:
+        results = results.filter(quiz_id__in=quiz_ids)
+        answers = answers.filter(result__quiz_id__in=quiz_ids)
+
+    buckets = {
+        f'bucket_{i}': Count('id', filter=_bucket_filter(i))
+        for i in range(QuizStats.HISTOGRAM_BUCKETS)
+    }
+
+    rows = results.values('quiz_id').order_by().annotate(
+        attempt_count=Count('id'),
+        score_sum=Sum('score'),
+        score_sq_sum=Sum(F('score') * F('score')),
+        score_min=Min('score'),
+        score_max=Max('score'),
+        **buckets,
+    )
+    answer_counts = {
+        row['result__quiz_id']: row
+        for row in answers.values('result__quiz_id').order_by().annotate(
+            total_answers=Count('id'), correct_answers=Count('id', filter=CORRECT_ANSWER_FILTER)
+        )
+    }
+
+    # Lựa chọn lưu dạng nén (Result.packed_answers): giải nén và so với các đáp án đúng
+    correct_ids = Answer.objects.filter(is_correct=True)
+    if quiz_ids is not None:
+        correct_ids = correct_ids.filter(question__quiz__id__in=quiz_ids)
+    correct_ids = set(correct_ids.values_list('id', flat=True))
+    packed = results.filter(packed_answers__isnull=False).values_list('quiz_id', 'packed_answers').order_by()
+    for quiz_id, blob in packed.iterator():
+        pairs = unpack_selections(blob)
+        counts = answer_counts.setdefault(quiz_id, {'total_answers': 0, 'correct_answers': 0})
+        counts['total_answers'] += len(pairs)
+        counts['correct_answers'] += sum(1 for _, answer_id in pairs if answer_id in correct_ids)
+
+    stats = []
+    for row in rows:
+        counts = answer_counts.get(row['quiz_id'], {})
+        stats.append(QuizStats(
+            total_answers=counts.get('total_answers', 0),
+            correct_answers=counts.get('correct_answers', 0),
+            **row,
+        ))
+    return stats
+
+
+def rebuild_quiz_stats(quiz_ids=None):
+    """Dựng lại thống kê (toàn bộ hoặc một số đề) trong một transaction. Trả về số đề có bài nộp."""
+    stats = compute_quiz_stats(quiz_ids)
+    with transaction.atomic():
+        existing = QuizStats.objects.all()
+        if quiz_ids is not None:
+            existing = existing.filter(quiz_id__in=quiz_ids)
+        existing.delete()
+        QuizStats.objects.bulk_create(stats)
+    return len(stats)
+
+
+def teacher_totals(teacher):
+    """Tổng hợp thống kê các đề của giáo viên: 1 truy vấn trên QuizStats (1 dòng / đề)"""
+    totals = QuizStats.objects.filter(quiz__created_by=teacher).aggregate(
+        attempts=Sum('attempt_count'),
+        score_sum=Sum('score_sum'),
+        correct=Sum('correct_answers'),
+        answers=Sum('total_answers'),
+    )
+    attempts = totals['attempts'] or 0
+    answers = totals['answers'] or 0
+    return {
+        'total_attempts': attempts,
+        'average_score': (totals['score_sum'] or 0) / attempts if attempts else 0,
+        'average_correct_rate': (totals['correct'] or 0) / answers * 100 if answers else 0,
+    }
+
+
+# ===========================================================================
+# THỐNG KÊ LUYỆN TẬP THEO (HỌC SINH, ĐỀ) - PracticeStats
+# ===========================================================================
+
+def record_practice(student, quiz, score, practiced_at):
+    """Cộng một lần luyện tập vào thống kê (1 UPDATE, các F() đọc giá trị cũ của dòng)"""
+    _upsert(
+        PracticeStats,
+        {'student': student, 'quiz': quiz},
+        attempt_count=F('attempt_count') + 1,
+        average_score=(F('average_score') * F('attempt_count') + score) / (F('attempt_count') + 1),
+        best_score=Greatest(Coalesce(F('best_score'), Value(score)), Value(score)),
+        previous_score=F('last_score'),
+        previous_practiced_at=F('last_practiced_at'),
+        last_score=Value(score),
+        last_practiced_at=Value(practiced_at),
+    )
+
+
+def practice_summary(student):
+    """Tổng lượt luyện tập, điểm trung bình và % cải thiện giữa 2 lần gần nhất (1 truy vấn)"""
+    rows = list(PracticeStats.objects.filter(student=student).order_by('-last_practiced_at'))
+    total_attempts = sum(row.attempt_count for row in rows)
+    average_score = (
+        sum(row.average_score * row.attempt_count for row in rows) / total_attempts if total_attempts else 0
+    )
+
+    # Lần gần nhất là last_score của dòng mới nhất; lần trước đó là previous_score của cùng đề
+    # hoặc last_score của đề được luyện gần thứ hai, tuỳ lần nào mới hơn
+    improvement = 0
+    if rows:
+        latest = rows[0]
+        old_score = None
+        if latest.previous_practiced_at and (len(rows) < 2 or latest.previous_practiced_at >= rows[1].last_practiced_at):
+            old_score = latest.previous_score
+        elif len(rows) >= 2:
+            old_score = rows[1].last_score
+        if old_score:
+            improvement = round(((latest.last_score - old_score) / old_score) * 100, 1)
+
+    return {
+        'total_attempts': total_attempts,
+        'average_score': round(average_score, 1),
+        'improvement': improvement,
+    }
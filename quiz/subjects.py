@@ -0,0 +1,26 @@
+# quiz/subjects.py
+
+# ===========================================================================
+# DANH SÁCH MÔN HỌC (CACHE) - DÙNG CHO CÁC Ô LỌC / TRANG KHÁM PHÁ
+# ===========================================================================
+
+from django.core.cache import cache
+
+from .models import Subject
+
+# Xoá khi môn học thay đổi (xem quiz/signals.py), TTL chỉ để phòng hờ
+SUBJECTS_TIMEOUT = 60 * 60
+SUBJECTS_CACHE_KEY = 'quiz:subjects'
+
+
+def get_subjects():
+    """Tất cả môn học (sắp theo tên)"""
+    subjects = cache.get(SUBJECTS_CACHE_KEY)
+    if subjects is None:
+        subjects = list(Subject.objects.order_by('name'))
+        cache.set(SUBJECTS_CACHE_KEY, subjects, SUBJECTS_TIMEOUT)
+    return subjects
+
+
+def invalidate_subjects():
+    cache.delete(SUBJECTS_CACHE_KEY)
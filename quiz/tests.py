@@ -1,3 +1,1306 @@
-from django.test import TestCase
+import tempfile
+import zipfile
+from datetime import timedelta
+from io import BytesIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed
+from django.forms import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+from openpyxl import Workbook, load_workbook
+
+from django.urls import reverse
+
+from results.models import Attempt, QuizStats, Result, StudentAnswer, Submission
+from support.models import SupportTicket
+from users.models import User
+
+from .analytics import analyze
+from .answer_key import compile_answer_key, get_answer_key
+from .attempts import _draft_key
+from .blueprints import BlueprintError, _draw, rule_strata, sample_blueprint
+from .counters import PENDING_GRADING, UNREAD_ALL, get_counters, open_key, unread_key
+from .forms import QuestionIdsField, QuizForm
+from .grading import drain_submissions, grade_submission, process_submission, submit_expired_attempts
+from .importer import ImportRowError, parse_row, process_job
+from .models import Answer, BlueprintRule, ImportJob, Question, Quiz, QuizBlueprint, Subject
+from .pagination import decode_cursor, encode_cursor, keyset_page
+from .paper import build_quiz_payload, get_quiz_payload
+from .models import QuestionFingerprint
+from .responses import get_responses, pack_selections, unpack_selections
+from . import dedup, exports, importer, search
+from .search import _fts_match, fold_text, rank_questions, search_questions, search_tokens
+from .signals import deferred_question_refresh
+
+
+def create_quiz(teacher, subject):
+    """Đề thi 4 câu: một lựa chọn, nhiều lựa chọn, Đúng/Sai, tự luận"""
+    now = timezone.now()
+    quiz = Quiz.objects.create(
+        title='Kiểm tra 15 phút', subject=subject, created_by=teacher, duration_minutes=15,
+        start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1),
+    )
+    questions = {
+        'single': Question.objects.create(
+            subject=subject, text='Đạo hàm của x^2', difficulty='EASY',
+            question_type=Question.QuestionType.SINGLE_CHOICE, created_by=teacher,
+        ),
+        'multiple': Question.objects.create(
+            subject=subject, text='Các số nguyên tố', difficulty='MEDIUM',
+            question_type=Question.QuestionType.MULTIPLE_CHOICE, created_by=teacher,
+        ),
+        'true_false': Question.objects.create(
+            subject=subject, text='1 là số nguyên tố', difficulty='HARD',
+            question_type=Question.QuestionType.TRUE_FALSE, created_by=teacher,
+        ),
+        'short': Question.objects.create(
+            subject=subject, text='Phát biểu định lý Pytago', difficulty='EASY',
+            question_type=Question.QuestionType.SHORT_ANSWER, created_by=teacher, correct_answer_text='a^2 + b^2 = c^2',
+        ),
+    }
+    answers = {
+        'single': [Answer.objects.create(question=questions['single'], text=text, is_correct=text == '2x')
+                   for text in ('2x', 'x', 'x^2', '2')],
+        'multiple': [Answer.objects.create(question=questions['multiple'], text=text, is_correct=text in ('2', '3'))
+                     for text in ('2', '3', '4', '9')],
+        'true_false': [Answer.objects.create(question=questions['true_false'], text='Đúng', is_correct=False),
+                       Answer.objects.create(question=questions['true_false'], text='Sai', is_correct=True)],
+    }
+    quiz.questions.add(*questions.values())
+    return quiz, questions, answers
+
+
+# ===== LƯU BÀI LÀM DẠNG NÉN (quiz/responses.py) =====
+
+class PackedSelectionsTests(TestCase):
+
+    def test_round_trip_sorted(self):
+        pairs = [(7, 30), (2, 11), (7, 21), (2 ** 32 - 1, 5)]
+        blob = pack_selections(pairs)
+        self.assertEqual(len(blob), 8 * len(pairs))
+        self.assertEqual(unpack_selections(blob), sorted(pairs))
+
+    def test_little_endian(self):
+        self.assertEqual(pack_selections([(1, 256)]), b'\x01\x00\x00\x00\x00\x01\x00\x00')
+
+    def test_empty(self):
+        self.assertEqual(pack_selections([]), b'')
+        self.assertEqual(unpack_selections(b''), [])
+
+
+class PackedGradingEquivalenceTests(TestCase):
+    """Chấm cùng một bài làm với QUIZ_PACKED_ANSWERS bật / tắt phải cho cùng kết quả"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', 'teacher@example.com', 'pw', role='TEACHER')
+        cls.subject = Subject.objects.create(name='Toán')
+        cls.quiz, cls.questions, cls.answers = create_quiz(cls.teacher, cls.subject)
+
+    def setUp(self):
+        cache.clear()
+
+    def submission(self, single=0, multiple=(0, 1), true_false='false', short='a^2 + b^2 = c^2'):
+        data = MultiValueDict()
+        if single is not None:
+            data['question_%d' % self.questions['single'].pk] = str(self.answers['single'][single].pk)
+        data.setlist(
+            'question_%d' % self.questions['multiple'].pk,
+            [str(self.answers['multiple'][i].pk) for i in multiple],
+        )
+        if true_false is not None:
+            data['question_%d' % self.questions['true_false'].pk] = true_false
+        if short:
+            data['short_answer_%d' % self.questions['short'].pk] = short
+        return data
+
+    def grade(self, packed, index, data):
+        username = f'student{packed:d}{index}'
+        student = User.objects.create_user(username, f'{username}@example.com', 'pw', role='STUDENT')
+        with override_settings(QUIZ_PACKED_ANSWERS=packed):
+            return grade_submission(self.quiz, student, data)
+
+    def stats(self):
+        stats = QuizStats.objects.filter(quiz=self.quiz).first()
+        return (stats.attempt_count, stats.correct_answers, stats.total_answers) if stats else (0, 0, 0)
+
+    def assert_equivalent(self, data, index=0):
+        before = self.stats()
+        rows = self.grade(False, index, data)
+        middle = self.stats()
+        packed = self.grade(True, index, data)
+        after = self.stats()
+
+        self.assertIsNone(rows.packed_answers)
+        self.assertIsNotNone(packed.packed_answers)
+        self.assertEqual(rows.score, packed.score)
+        self.assertEqual(rows.review, packed.review)
+        self.assertEqual(get_responses(rows).selected, get_responses(packed).selected)
+        self.assertEqual(
+            [(sa.question_id, sa.custom_answer) for sa in get_responses(rows).short_answers],
+            [(sa.question_id, sa.custom_answer) for sa in get_responses(packed).short_answers],
+        )
+        # QuizStats cộng cùng số bài / số lựa chọn đúng / số câu trả lời
+        self.assertEqual(
+            [m - b for m, b in zip(middle, before)],
+            [a - m for a, m in zip(after, middle)],
+        )
+        # Dạng nén: chỉ câu tự luận còn dòng StudentAnswer
+        self.assertFalse(StudentAnswer.objects.filter(result=packed, selected_answer__isnull=False).exists())
+        return rows, packed
+
+    def test_all_correct(self):
+        rows, packed = self.assert_equivalent(self.submission())
+        self.assertEqual(packed.score, 100)
+
+    def test_partially_correct(self):
+        rows, packed = self.assert_equivalent(self.submission(single=1, multiple=(0,), true_false='true'))
+        self.assertEqual(packed.score, 0)
+        rows, packed = self.assert_equivalent(self.submission(single=0, multiple=(0, 1, 2)), index=1)
+        self.assertAlmostEqual(packed.score, 66.67)
+
+    def test_blank_and_invalid_selections(self):
+        data = self.submission(single=None, multiple=(), true_false=None, short='')
+        data['question_%d' % self.questions['single'].pk] = 'abc'
+        data.appendlist('question_%d' % self.questions['multiple'].pk, str(self.answers['single'][0].pk))
+        rows, packed = self.assert_equivalent(data)
+        self.assertEqual(packed.score, 0)
+        self.assertEqual(unpack_selections(packed.packed_answers), [])
+        self.assertEqual(get_responses(packed).selected, {})
+
+
+# ===== PHÂN TRANG KEYSET (quiz/pagination.py) =====
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        teacher = User.objects.create_user('teacher', 'teacher@example.com', 'pw', role='TEACHER')
+        subject = Subject.objects.create(name='Toán')
+        cls.questions = [
+            Question.objects.create(
+                subject=subject, text=f'Câu {i}', difficulty='EASY',
+                question_type=Question.QuestionType.SINGLE_CHOICE, created_by=teacher,
+            )
+            for i in range(8)
+        ]
+        # Nhiều câu trùng created_at: thứ tự phải phân định bằng id
+        base = timezone.now().replace(microsecond=123456)
+        for i, question in enumerate(cls.questions):
+            Question.objects.filter(pk=question.pk).update(created_at=base - timedelta(seconds=i // 3))
+        cls.expected = list(Question.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def test_cursor_round_trip(self):
+        question = Question.objects.get(pk=self.questions[0].pk)
+        cursor = encode_cursor(question)
+        self.assertEqual(decode_cursor(cursor), (question.created_at, question.pk))
+        ordering = ('-score', 'id')
+        row = SimpleNamespace(score=7.25, id=3)
+        self.assertEqual(decode_cursor(encode_cursor(row, ordering), ordering), (7.25, 3))
+
+    def test_invalid_cursor(self):
+        for value in (None, '', 'abc', 'i1', 'x1_i2', 'd1_i2_i3', 'd99999999999999999999999_i1'):
+            self.assertIsNone(decode_cursor(value), value)
+        # Con trỏ hỏng -> trang đầu
+        page = keyset_page(Question.objects.all(), {'after': 'abc'}, 3)
+        self.assertEqual([q.pk for q in page], self.expected[:3])
+        self.assertFalse(page.has_previous)
+
+    def test_forward(self):
+        seen, params = [], {}
+        while True:
+            page = keyset_page(Question.objects.all(), params, 3)
+            seen.extend(q.pk for q in page)
+            self.assertEqual(page.has_previous, bool(params))
+            if not page.has_next:
+                break
+            params = {'after': page.next_cursor}
+        self.assertEqual(seen, self.expected)
+
+    def test_backward_from_last(self):
+        seen = []
+        page = keyset_page(Question.objects.all(), {'last': '1'}, 3)
+        self.assertFalse(page.has_next)
+        while True:
+            seen[:0] = [q.pk for q in page]
+            if not page.has_previous:
+                break
+            page = keyset_page(Question.objects.all(), {'before': page.previous_cursor}, 3)
+            self.assertTrue(page.has_next)
+        self.assertEqual(seen, self.expected)
+
+    def test_next_then_previous(self):
+        first = keyset_page(Question.objects.all(), {}, 3)
+        second = keyset_page(Question.objects.all(), {'after': first.next_cursor}, 3)
+        back = keyset_page(Question.objects.all(), {'before': second.previous_cursor}, 3)
+        self.assertEqual([q.pk for q in back], [q.pk for q in first])
+        self.assertFalse(back.has_previous)
+
+
+# ===== TÌM KIẾM CÂU HỎI (quiz/search.py) =====
+
+class QuestionSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        teacher = User.objects.create_user('teacher', 'teacher@example.com', 'pw', role='TEACHER')
+        subject = Subject.objects.create(name='Toán')
+        cls.derivative = Question.objects.create(
+            subject=subject, text='Đạo hàm của hàm số y = x^2', difficulty='EASY',
+            question_type=Question.QuestionType.SINGLE_CHOICE, created_by=teacher,
+        )
+        Answer.objects.create(question=cls.derivative, text='Bằng 2x', is_correct=True)
+        cls.integral = Question.objects.create(
+            subject=subject, text='Tích phân từng phần', difficulty='HARD',
+            question_type=Question.QuestionType.SINGLE_CHOICE, created_by=teacher,
+            explanation='Dùng công thức NEAR đúng',
+        )
+
+    def search(self, query):
+        return set(search_questions(Question.objects.all(), query).values_list('id', flat=True))
+
+    def test_fold_text(self):
+        self.assertEqual(fold_text('Đạo HÀM Tích phân'), 'dao ham tich phan')
+        self.assertEqual(fold_text(None), '')
+
+    def test_tokens_are_quoted(self):
+        tokens = search_tokens('"đạo" OR hàm* NEAR(x, 2) ^col: -y')
+        self.assertEqual(tokens, ['dao', 'or', 'ham', 'near', 'x', '2', 'col', 'y'])
+        self.assertEqual(_fts_match(['dao', 'or']), '"dao"* "or"*')
+
+    def test_accent_insensitive_prefix(self):
+        self.assertEqual(self.search('ĐẠO HÀM'), {self.derivative.pk})
+        self.assertEqual(self.search('dao ha'), {self.derivative.pk})
+        self.assertEqual(self.search('tich phan'), {self.integral.pk})
+        # Nội dung đáp án và giải thích cũng được đánh chỉ mục
+        self.assertEqual(self.search('bằng 2x'), {self.derivative.pk})
+        self.assertEqual(self.search('cong thuc'), {self.integral.pk})
+
+    def test_operators_are_literal(self):
+        # Toán tử FTS5 trong chuỗi tìm kiếm không gây lỗi cú pháp và chỉ khớp như từ thường
+        for query in ('"', '"đạo', 'đạo"hàm', '*', 'hàm*', 'NOT tích', 'đạo AND', '(hàm', 'search_text:tich', '^tich', 'a" OR "b'):
+            with self.subTest(query=query):
+                list(rank_questions(search_questions(Question.objects.all(), query), query))
+        self.assertEqual(self.search('hàm" OR "tích'), set())
+        self.assertEqual(self.search('NEAR'), {self.integral.pk})
+        self.assertEqual(self.search('"đạo"hàm*'), {self.derivative.pk})
+
+    def test_empty_query(self):
+        self.assertEqual(self.search('  "*" '), {self.derivative.pk, self.integral.pk})
+
+    def test_search_text_follows_answers(self):
+        answer = Answer.objects.create(question=self.integral, text='Nguyên hàm')
+        self.assertEqual(self.search('nguyen ham'), {self.integral.pk})
+        answer.delete()
+        self.assertEqual(self.search('nguyen ham'), set())
+
+    def test_rank(self):
+        ranked = list(rank_questions(search_questions(Question.objects.all(), 'hàm'), 'hàm').order_by('search_rank'))
+        self.assertEqual([q.pk for q in ranked], [self.derivative.pk])
+        self.assertIsInstance(ranked[0].search_rank, float)
+
+    def test_rank_order_and_keyset_pages(self):
+        teacher = self.derivative.created_by
+        # "ham" xuất hiện nhiều lần / văn bản ngắn -> bm25 nhỏ hơn (liên quan hơn)
+        texts = ['Hàm số hàm hợp hàm ngược', 'Hàm số bậc hai', 'Khảo sát sự biến thiên và vẽ đồ thị của hàm số bậc ba trên đoạn']
+        for text in texts * 3:
+            Question.objects.create(subject=self.derivative.subject, text=text, difficulty='EASY', created_by=teacher)
+        queryset = rank_questions(search_questions(Question.objects.all(), 'ham'), 'ham')
+        ranked = list(queryset.order_by('search_rank', '-id'))
+        self.assertEqual(len(ranked), 10)
+        self.assertEqual(ranked[0].text, texts[0])
+        self.assertEqual([q.search_rank for q in ranked], sorted(q.search_rank for q in ranked))
+
+        seen, params = [], {}
+        while True:
+            page = keyset_page(queryset, params, 3, ('search_rank', '-id'))
+            seen += [q.pk for q in page]
+            if not page.has_next:
+                break
+            params = {'after': page.next_cursor}
+        self.assertEqual(seen, [q.pk for q in ranked])
+
+        # Xoá câu hỏi không đụng tới bảng FTS qua ORM (trigger tự xoá khỏi chỉ mục)
+        ranked[0].delete()
+        self.assertEqual(queryset.count(), 9)
+
+
+# ===== PHÂN TÍCH CÂU HỎI (quiz/analytics.py) =====
+
+class ItemAnalysisTests(SimpleTestCase):
+
+    scores = np.array([
+        [1, 1, 1, 0],
+        [1, 1, 0, 0],
+        [1, 0, 1, 1],
+        [0, 0, 0, 1],
+        [1, 1, 1, 1],
+    ], dtype=float)
+    # Mỗi câu 2 phương án, phương án đầu là đáp án đúng
+    option_question = np.repeat(np.arange(4), 2)
+
+    def selections(self, scores):
+        return np.repeat(scores, 2, axis=1) * np.tile([1, 0], 4) + np.repeat(1 - scores, 2, axis=1) * np.tile([0, 1], 4)
+
+    def test_full_quiz_matches_kr20(self):
+        drawn = np.ones(self.scores.shape, dtype=bool)
+        result = analyze(self.scores, self.selections(self.scores), drawn, self.option_question)
+        p = self.scores.mean(axis=0)
+        k = self.scores.shape[1]
+        expected = k / (k - 1) * (1 - (p * (1 - p)).sum() / self.scores.sum(axis=1).var())
+        np.testing.assert_allclose(result['p_values'], p)
+        self.assertAlmostEqual(result['kr20'], expected)
+        np.testing.assert_allclose(result['option_rates'][::2], p)
+
+    def test_undrawn_questions_are_not_wrong(self):
+        # Câu 3 chỉ được bốc cho 2 học sinh đầu (và họ làm sai) - các ô còn lại không tính
+        drawn = np.ones(self.scores.shape, dtype=bool)
+        drawn[2:, 3] = False
+        result = analyze(self.scores, self.selections(self.scores), drawn, self.option_question)
+        self.assertEqual(result['p_values'][3], 0)
+        # Điểm của ô không bốc (kể cả giá trị rác) không ảnh hưởng kết quả
+        noisy = self.scores.copy()
+        noisy[2:, 3] = 1 - noisy[2:, 3]
+        other = analyze(noisy, self.selections(noisy), drawn, self.option_question)
+        for name in ('p_values', 'option_rates', 'discrimination'):
+            np.testing.assert_allclose(result[name], other[name], equal_nan=True)
+        self.assertAlmostEqual(result['kr20'], other['kr20'])
+        self.assertEqual(result['option_rates'][7], 1)
+
+    def test_question_drawn_by_nobody(self):
+        drawn = np.ones(self.scores.shape, dtype=bool)
+        drawn[:, 0] = False
+        result = analyze(self.scores, self.selections(self.scores), drawn, self.option_question)
+        self.assertTrue(np.isnan(result['p_values'][0]))
+        self.assertTrue(np.isnan(result['option_rates'][0]))
+        np.testing.assert_allclose(result['p_values'][1:], self.scores[:, 1:].mean(axis=0))
+
+
+# ===== NỘP BÀI SAU KHI ĐỀ ĐÓNG / LƯỢT LÀM BÀI BỊ BỎ DỞ (quiz/views.py, quiz/grading.py) =====
+
+@override_settings(QUIZ_ASYNC_GRADING=False, QUIZ_SUBMIT_GRACE_SECONDS=60)
+class LateSubmissionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', 'teacher@example.com', 'pw', role='TEACHER')
+        cls.student = User.objects.create_user('student', 'student@example.com', 'pw', role='STUDENT')
+        cls.quiz, cls.questions, cls.answers = create_quiz(cls.teacher, Subject.objects.create(name='Toán'))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.student)
+
+    def close_quiz(self, seconds_ago):
+        """Đề đóng cách đây seconds_ago giây; lượt làm bài có hạn nộp = giờ đóng đề, bản nháp chọn đáp án đúng"""
+        end_time = timezone.now() - timedelta(seconds=seconds_ago)
+        Quiz.objects.filter(pk=self.quiz.pk).update(end_time=end_time)
+        field = 'question_%d' % self.questions['single'].pk
+        return Attempt.objects.create(
+            quiz=self.quiz, student=self.student, deadline=end_time,
+            draft={field: [str(self.answers['single'][0].pk)]},
+        )
+
+    def post_wrong_answer(self):
+        field = 'question_%d' % self.questions['single'].pk
+        return self.client.post(reverse('quiz:submit_quiz', args=[self.quiz.pk]), {field: self.answers['single'][1].pk})
+
+    def test_post_within_grace_after_close(self):
+        attempt = self.close_quiz(10)
+        response = self.post_wrong_answer()
+        result = Result.objects.get(quiz=self.quiz, student=self.student)
+        self.assertRedirects(response, reverse('quiz:view_result', args=[result.pk]), fetch_redirect_response=False)
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.status, Attempt.Status.SUBMITTED)
+        self.assertEqual(attempt.result_id, result.pk)
+        # Còn trong thời gian ân hạn: chấm theo bài POST lên
+        self.assertEqual(result.score, 0)
+
+    def test_post_after_grace_grades_draft(self):
+        self.close_quiz(120)
+        self.post_wrong_answer()
+        result = Result.objects.get(quiz=self.quiz, student=self.student)
+        self.assertAlmostEqual(result.score, 33.33)
+
+    def test_post_without_attempt_after_close(self):
+        Quiz.objects.filter(pk=self.quiz.pk).update(end_time=timezone.now() - timedelta(seconds=10))
+        self.post_wrong_answer()
+        self.assertFalse(Result.objects.filter(quiz=self.quiz).exists())
+
+    def test_revisit_after_close_submits_draft(self):
+        attempt = self.close_quiz(10)
+        self.client.get(reverse('quiz:take_quiz', args=[self.quiz.pk]))
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.status, Attempt.Status.SUBMITTED)
+        self.assertAlmostEqual(attempt.result.score, 33.33)
+        self.assertEqual(Attempt.objects.filter(quiz=self.quiz).count(), 1)
+
+    def test_sweep_submits_abandoned_attempts(self):
+        abandoned = self.close_quiz(120)
+        other = User.objects.create_user('late', 'late@example.com', 'pw', role='STUDENT')
+        in_grace = Attempt.objects.create(
+            quiz=self.quiz, student=other, deadline=timezone.now() - timedelta(seconds=10),
+        )
+        self.assertEqual(submit_expired_attempts(), 1)
+        abandoned.refresh_from_db()
+        in_grace.refresh_from_db()
+        self.assertEqual(abandoned.status, Attempt.Status.SUBMITTED)
+        self.assertEqual(in_grace.status, Attempt.Status.IN_PROGRESS)
+        submission = Submission.objects.get(attempt=abandoned)
+        self.assertEqual(submission.status, Submission.Status.DONE)
+        self.assertAlmostEqual(submission.result.score, 33.33)
+        # Chạy lại: không nộp lần hai
+        self.assertEqual(submit_expired_attempts(), 0)
+
+    @override_settings(QUIZ_ASYNC_GRADING=True)
+    def test_sweep_queues_for_worker(self):
+        abandoned = self.close_quiz(120)
+        draft = {'question_%d' % self.questions['multiple'].pk: [str(a.pk) for a in self.answers['multiple'][:2]]}
+        cache.set(_draft_key(abandoned.pk), draft)
+        self.assertEqual(submit_expired_attempts(), 1)
+        submission = Submission.objects.get(attempt=abandoned)
+        self.assertEqual(submission.status, Submission.Status.PENDING)
+        # Bản nháp mới nhất trong cache được nộp
+        self.assertEqual(submission.payload, draft)
+        self.assertEqual(drain_submissions(), 1)
+        submission.refresh_from_db()
+        self.assertAlmostEqual(submission.result.score, 33.33)
+
+
+# ===== HỘP THƯ BÀI NỘP: NHẬN BÀI, LEASE, TRANG CHỜ (quiz/grading.py) =====
+
+@override_settings(QUIZ_ASYNC_GRADING=True, QUIZ_GRADING_FALLBACK_SECONDS=30, QUIZ_GRADING_LEASE_SECONDS=120)
+class SubmissionInboxTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', 'teacher@example.com', 'pw', role='TEACHER')
+        cls.student = User.objects.create_user('student', 'student@example.com', 'pw', role='STUDENT')
+        cls.quiz, cls.questions, cls.answers = create_quiz(cls.teacher, Subject.objects.create(name='Toán'))
+
+    def setUp(self):
+        cache.clear()
+
+    def submit(self, status=Submission.Status.PENDING, claimed_seconds_ago=None, created_seconds_ago=0):
+        field = 'question_%d' % self.questions['single'].pk
+        submission = Submission.objects.create(
+            student=self.student, quiz=self.quiz, payload={field: [str(self.answers['single'][0].pk)]},
+        )
+        now = timezone.now()
+        Submission.objects.filter(pk=submission.pk).update(
+            status=status,
+            created_at=now - timedelta(seconds=created_seconds_ago),
+            claimed_at=None if claimed_seconds_ago is None else now - timedelta(seconds=claimed_seconds_ago),
+        )
+        return Submission.objects.select_related('quiz', 'student', 'attempt').get(pk=submission.pk)
+
+    def test_grades_pending(self):
+        submission = self.submit()
+        self.assertTrue(process_submission(submission))
+        submission.refresh_from_db()
+        self.assertEqual(submission.status, Submission.Status.DONE)
+        self.assertIsNotNone(submission.claimed_at)
+        self.assertAlmostEqual(submission.result.score, 33.33)
+        self.assertFalse(process_submission(submission))
+
+    def test_reclaims_stale_processing(self):
+        stale = self.submit(Submission.Status.PROCESSING, claimed_seconds_ago=600)
+        legacy = self.submit(Submission.Status.PROCESSING)
+        active = self.submit(Submission.Status.PROCESSING, claimed_seconds_ago=10)
+        self.assertEqual(drain_submissions(), 2)
+        statuses = dict(Submission.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[stale.pk], Submission.Status.DONE)
+        self.assertEqual(statuses[legacy.pk], Submission.Status.DONE)
+        self.assertEqual(statuses[active.pk], Submission.Status.PROCESSING)
+
+    def test_crash_while_grading_keeps_submission_pending(self):
+        submission = self.submit()
+        with mock.patch('quiz.grading.grade_submission', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                process_submission(submission)
+        # Nhận bài và chấm cùng một transaction: không còn dòng PROCESSING mồ côi
+        submission.refresh_from_db()
+        self.assertEqual(submission.status, Submission.Status.PENDING)
+        self.assertIsNone(submission.claimed_at)
+        self.assertFalse(Result.objects.exists())
+
+    def test_grading_error_is_terminal(self):
+        submission = self.submit()
+        with mock.patch('quiz.grading.grade_submission', side_effect=ValueError('hỏng')):
+            self.assertTrue(process_submission(submission))
+        submission.refresh_from_db()
+        self.assertEqual((submission.status, submission.error), (Submission.Status.FAILED, 'hỏng'))
+
+    def status_page(self, submission):
+        self.client.force_login(self.student)
+        return self.client.get(reverse('quiz:submission_status', args=[submission.pk]))
+
+    def test_status_page_refreshes_while_waiting(self):
+        response = self.status_page(self.submit())
+        self.assertContains(response, 'http-equiv="refresh"')
+
+    def test_status_page_grades_stale_processing(self):
+        submission = self.submit(Submission.Status.PROCESSING, claimed_seconds_ago=600, created_seconds_ago=600)
+        response = self.status_page(submission)
+        submission.refresh_from_db()
+        self.assertRedirects(response, reverse('quiz:view_result', args=[submission.result_id]), fetch_redirect_response=False)
+
+    def test_status_page_stops_refreshing_when_stalled(self):
+        submission = self.submit(Submission.Status.PROCESSING, claimed_seconds_ago=10, created_seconds_ago=600)
+        response = self.status_page(submission)
+        self.assertNotContains(response, 'http-equiv="refresh"')
+        self.assertContains(response, 'chưa chấm xong')
+
+    def test_reopening_single_attempt_quiz_while_grading(self):
+        submission = self.submit()
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('quiz:take_quiz', args=[self.quiz.pk]))
+        self.assertRedirects(response, reverse('quiz:submission_status', args=[submission.pk]), fetch_redirect_response=False)
+        self.assertFalse(Attempt.objects.filter(quiz=self.quiz, student=self.student).exists())
+
+
+# ===== TÍNH LẠI search_text / CHỮ KÝ MINHASH MỖI CÂU 1 LẦN KHI LƯU FORM (quiz/signals.py) =====
+
+class QuestionIndexRefreshTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', 'teacher@example.com', 'pw', role='TEACHER')
+        cls.subject = Subject.objects.create(name='Toán')
+
+    def setUp(self):
+        self.client.force_login(self.teacher)
+
+    def count_refreshes(self):
+        return (
+            mock.patch('quiz.signals.refresh_search_text', wraps=search.refresh_search_text),
+            mock.patch('quiz.signals.refresh_fingerprints', wraps=dedup.refresh_fingerprints),
+        )
+
+    def form_data(self, text, answers, question=None):
+        data = {
+            'subject': self.subject.pk, 'text': text, 'question_type': Question.QuestionType.SINGLE_CHOICE,
+            'difficulty': 'EASY', 'correct_answer_text': '', 'explanation': '',
+            'answers-TOTAL_FORMS': len(answers), 'answers-INITIAL_FORMS': 0 if question is None else len(answers),
+            'answers-MIN_NUM_FORMS': 1, 'answers-MAX_NUM_FORMS': 6,
+        }
+        for i, (answer_id, answer_text, is_correct) in enumerate(answers):
+            data[f'answers-{i}-text'] = answer_text
+            if is_correct:
+                data[f'answers-{i}-is_correct'] = 'on'
+            if answer_id:
+                data[f'answers-{i}-id'] = answer_id
+                data[f'answers-{i}-question'] = question.pk
+        return data
+
+    def assert_indexed(self, question):
+        question.refresh_from_db()
+        texts = question.answers.order_by('id').values_list('text', flat=True)
+        self.assertEqual(question.search_text, search.build_search_text(question.text, question.explanation, texts))
+        stored = QuestionFingerprint.objects.get(question=question)
+        expected = dedup.make_fingerprint(question.pk, question.created_by_id, question.text, texts)
+        self.assertEqual(bytes(stored.signature), bytes(expected.signature))
+
+    def test_create_and_edit_refresh_once(self):
+        patch_search, patch_fingerprints = self.count_refreshes()
+        with patch_search as refresh_search, patch_fingerprints as refresh_fingerprints:
+            self.client.post(reverse('quiz:question_create'), self.form_data(
+                'Thủ đô của Việt Nam', [(None, 'Hà Nội', True), (None, 'Huế', False), (None, 'Đà Nẵng', False), (None, 'Sài Gòn', False)],
+            ))
+        question = Question.objects.get(text='Thủ đô của Việt Nam')
+        self.assertEqual(refresh_search.call_count, 1)
+        self.assertEqual(refresh_fingerprints.call_count, 1)
+        self.assert_indexed(question)
+
+        answers = list(question.answers.order_by('id'))
+        patch_search, patch_fingerprints = self.count_refreshes()
+        with patch_search as refresh_search, patch_fingerprints as refresh_fingerprints:
+            self.client.post(reverse('quiz:question_edit', args=[question.pk]), self.form_data(
+                'Thủ đô nước Việt Nam',
+                [(answer.pk, 'Thành phố Huế' if answer.text == 'Huế' else answer.text, answer.is_correct) for answer in answers],
+                question,
+            ))
+        self.assertEqual(refresh_search.call_count, 1)
+        self.assertEqual(refresh_fingerprints.call_count, 1)
+        self.assert_indexed(question)
+        self.assertIn('thanh pho hue', question.search_text)
+
+    def test_single_answer_change_outside_block(self):
+        question = Question.objects.create(
+            subject=self.subject, text='Số nguyên tố nhỏ nhất', difficulty='EASY',
+            question_type=Question.QuestionType.SINGLE_CHOICE, created_by=self.teacher,
+        )
+        Answer.objects.create(question=question, text='Hai', is_correct=True)
+        self.assert_indexed(question)
+
+    def test_failed_block_skips_refresh(self):
+        question = Question.objects.create(
+            subject=self.subject, text='Căn bậc hai của 4', difficulty='EASY',
+            question_type=Question.QuestionType.SINGLE_CHOICE, created_by=self.teacher,
+        )
+        with mock.patch('quiz.signals.refresh_fingerprints') as refresh_fingerprints:
+            with self.assertRaises(ValueError):
+                with deferred_question_refresh():
+                    Answer.objects.create(question=question, text='2', is_correct=True)
+                    raise ValueError
+        refresh_fingerprints.assert_not_called()
+
+
+# ===== IMPORT CÂU HỎI TỪ EXCEL (quiz/importer.py) =====
+
+def excel_row(subject='Toán', text='Câu hỏi', difficulty='EASY', answers=('A', 'B', 'C', 'D'), correct=1,
+              question_type='', explanation=''):
+    return (subject, text, difficulty, *(tuple(answers) + (None,) * (4 - len(answers))), correct, question_type, explanation)
+
+
+class ParseRowTests(SimpleTestCase):
+
+    def test_single_choice(self):
+        parsed = parse_row(excel_row(text=' Đạo hàm của x^2 ', difficulty='easy', answers=('2x', 'x', 'x^2'), correct=1.0))
+        self.assertEqual(parsed.text, 'Đạo hàm của x^2')
+        self.assertEqual(parsed.difficulty, 'EASY')
+        self.assertEqual(parsed.question_type, Question.QuestionType.SINGLE_CHOICE)
+        self.assertEqual(parsed.answers, (('2x', True), ('x', False), ('x^2', False)))
+
+    def test_multiple_choice(self):
+        parsed = parse_row(excel_row(correct='1; 3', question_type='multiple_choice', explanation='2 và 3 là số nguyên tố'))
+        self.assertEqual(parsed.answers, (('A', True), ('B', False), ('C', True), ('D', False)))
+        self.assertEqual(parsed.explanation, '2 và 3 là số nguyên tố')
+
+    def test_true_false(self):
+        for value, is_true in (('Đúng', True), ('sai', False), (1, True), (2.0, False), ('TRUE', True)):
+            with self.subTest(value=value):
+                parsed = parse_row(excel_row(answers=(), correct=value, question_type='TRUE_FALSE'))
+                self.assertEqual(parsed.answers, (('Đúng', is_true), ('Sai', not is_true)))
+
+    def test_short_answer(self):
+        parsed = parse_row(excel_row(answers=('a^2 + b^2 = c^2',), correct=None, question_type='SHORT_ANSWER'))
+        self.assertEqual((parsed.answers, parsed.correct_answer_text), ((), 'a^2 + b^2 = c^2'))
+
+    def test_errors(self):
+        cases = [
+            (excel_row(subject=''), 'Thiếu tên môn học'),
+            (excel_row(text='  '), 'Thiếu nội dung câu hỏi'),
+            (excel_row(difficulty='khó'), 'Độ khó "khó" không hợp lệ (EASY/MEDIUM/HARD)'),
+            (excel_row(question_type='ESSAY'), 'Loại câu hỏi "ESSAY" không hợp lệ'),
+            (excel_row(answers=(), correct='có', question_type='TRUE_FALSE'), 'Câu Đúng/Sai cần cột H là "Đúng" hoặc "Sai"'),
+            (excel_row(answers=('A', '', 'C')), 'Các đáp án phải điền liên tục từ cột D'),
+            (excel_row(answers=('A',)), 'Cần ít nhất 2 đáp án'),
+            (excel_row(answers=('A', 'x' * 256)), 'Đáp án dài quá 255 ký tự'),
+            (excel_row(correct='B'), 'Đáp án đúng "B" không phải là số'),
+            (excel_row(correct=5), 'Vị trí đáp án đúng 5 phải từ 1 đến 4'),
+            (excel_row(answers=('A', 'B'), correct=3), 'Đáp án 3 đang để trống'),
+            (excel_row(correct=None), 'Thiếu đáp án đúng (cột H)'),
+            (excel_row(correct='1,2'), 'Câu một lựa chọn chỉ có 1 đáp án đúng'),
+        ]
+        for values, message in cases:
+            with self.subTest(message=message):
+                with self.assertRaisesMessage(ImportRowError, message):
+                    parse_row(values)
+
+
+@override_settings(QUIZ_IMPORT_LEASE_SECONDS=120)
+class ImportJobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', 'teacher@example.com', 'pw', role='TEACHER')
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(ImportJob._meta.get_field('file'), 'storage', FileSystemStorage(location=directory.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_job(self, rows):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Môn học', 'Nội dung', 'Độ khó', 'Đáp án 1', 'Đáp án 2', 'Đáp án 3', 'Đáp án 4', 'Đúng', 'Loại', 'Giải thích'])
+        for row in rows:
+            sheet.append(list(row))
+        buffer = BytesIO()
+        workbook.save(buffer)
+        return ImportJob.objects.create(
+            created_by=self.teacher, file=ContentFile(buffer.getvalue(), name='cau_hoi.xlsx'), file_name='cau_hoi.xlsx',
+        )
+
+    def rows(self, count, start=0):
+        topics = ['đạo hàm', 'tích phân', 'xác suất', 'hình học không gian', 'số phức', 'dãy số', 'logarit', 'lượng giác']
+        return [
+            excel_row(text=f'Bài {i}: câu hỏi về {topics[i % len(topics)]} số {i * 7919}', answers=(f'{i}a', f'{i}b', f'{i}c'), correct=2)
+            for i in range(start, start + count)
+        ]
+
+    def assert_imported(self, job, count):
+        questions = Question.objects.filter(created_by=self.teacher)
+        self.assertEqual(questions.count(), count)
+        self.assertEqual(Answer.objects.filter(question__in=questions).count(), 3 * count)
+        self.assertEqual(QuestionFingerprint.objects.filter(question__in=questions).count(), count)
+        self.assertEqual(len(set(questions.values_list('text', flat=True))), count)
+        self.assertEqual(job.imported_count, count)
+
+    def test_chunked_bulk_create(self):
+        job = self.create_job(self.rows(5))
+        with mock.patch.object(importer, 'CHUNK_SIZE', 2), \
+                mock.patch.object(Answer.objects, 'bulk_create', wraps=Answer.objects.bulk_create) as answers, \
+                mock.patch.object(QuestionFingerprint.objects, 'bulk_create', wraps=QuestionFingerprint.objects.bulk_create) as fingerprints:
+            self.assertTrue(process_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.Status.DONE)
+        self.assert_imported(job, 5)
+        # 3 lô (2 + 2 + 1 câu), mỗi lô 1 bulk_create đáp án + 1 bulk_create chữ ký
+        self.assertEqual([len(call.args[0]) for call in answers.call_args_list], [6, 6, 3])
+        self.assertEqual([len(call.args[0]) for call in fingerprints.call_args_list], [2, 2, 1])
+        self.assertTrue(all(call.kwargs['batch_size'] == 2 for call in answers.call_args_list))
+        self.assertEqual((job.total_rows, job.processed_rows, job.error_count), (5, 5, 0))
+        self.assertIn('Import thành công 5 câu hỏi', job.message)
+        self.assertFalse(job.file.storage.exists(job.file.name))
+
+    def test_error_report(self):
+        rows = self.rows(2) + [excel_row(subject=''), excel_row(correct=9)] + self.rows(1, start=2) + [excel_row(difficulty='?')]
+        job = self.create_job(rows)
+        with mock.patch.object(importer, 'MAX_STORED_ERRORS', 2):
+            process_job(job)
+        job.refresh_from_db()
+        self.assert_imported(job, 3)
+        self.assertEqual((job.processed_rows, job.error_count), (6, 3))
+        # Số dòng theo Excel (dòng 1 là tiêu đề); chỉ lưu chi tiết MAX_STORED_ERRORS lỗi đầu
+        self.assertEqual(job.errors, [
+            {'row': 4, 'message': 'Thiếu tên môn học'},
+            {'row': 5, 'message': 'Vị trí đáp án đúng 9 phải từ 1 đến 4'},
+        ])
+
+    def test_resume_after_lease_lost(self):
+        job = self.create_job(self.rows(5))
+        save_chunk = importer._save_chunk
+        calls = []
+
+        def reclaimed_during_second_chunk(*args):
+            calls.append(args)
+            result = save_chunk(*args)
+            if len(calls) == 2:
+                # Tiến trình khác nhận lại job (lease hết hạn) trong lúc lô thứ 2 đang lưu
+                ImportJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() + timedelta(seconds=1))
+            return result
+
+        with mock.patch.object(importer, 'CHUNK_SIZE', 2), \
+                mock.patch.object(importer, '_save_chunk', side_effect=reclaimed_during_second_chunk):
+            self.assertFalse(process_job(job))
+        job.refresh_from_db()
+        # Lô thứ 2 rollback cùng lần ghi tiến độ bị từ chối; lô 1 đã commit
+        self.assertEqual(job.status, ImportJob.Status.RUNNING)
+        self.assertEqual((job.processed_rows, job.imported_count), (2, 2))
+        self.assertEqual(Question.objects.filter(created_by=self.teacher).count(), 2)
+
+        # Lease hết hạn -> tiến trình khác chạy tiếp từ dòng đã lưu, không import trùng
+        ImportJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(seconds=600))
+        job.refresh_from_db()
+        with mock.patch.object(importer, 'CHUNK_SIZE', 2):
+            self.assertTrue(process_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.Status.DONE)
+        self.assertEqual(job.processed_rows, 5)
+        self.assert_imported(job, 5)
+
+    def test_active_lease_is_not_claimed(self):
+        job = self.create_job(self.rows(1))
+        ImportJob.objects.filter(pk=job.pk).update(status=ImportJob.Status.RUNNING, heartbeat_at=timezone.now())
+        job.refresh_from_db()
+        self.assertFalse(process_job(job))
+        self.assertFalse(Question.objects.filter(created_by=self.teacher).exists())
+
+
+# ===== BỘ ĐẾM TRONG CACHE (quiz/counters.py) =====
+
+class CounterTests(TestCase):
+    """Sau mỗi lần ghi (đã commit), giá trị cộng / trừ trong cache phải bằng COUNT đếm lại từ DB"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', 'teacher@example.com', 'pw', role='TEACHER')
+        cls.other_teacher = User.objects.create_user('teacher2', 'teacher2@example.com', 'pw', role='TEACHER')
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role='ADMIN')
+        cls.student = User.objects.create_user('student', 'student@example.com', 'pw', role='STUDENT')
+        cls.subject = Subject.objects.create(name='Toán')
+        cls.quiz = create_quiz(cls.teacher, cls.subject)[0]
+
+    def setUp(self):
+        cache.clear()
+        self.users = [self.teacher, self.other_teacher, self.admin, self.student]
+
+    def fresh_counts(self, user):
+        tickets = SupportTicket.objects.all()
+        counts = {'open_tickets': tickets.filter(user=user, status=SupportTicket.Status.OPEN).count()}
+        if user.role == 'TEACHER':
+            counts['unread_tickets'] = tickets.filter(Q(teacher=user) | Q(teacher=None), is_read=False).count()
+            counts['pending_grading'] = Result.objects.filter(
+                is_graded=False, quiz__questions__question_type=Question.QuestionType.SHORT_ANSWER,
+            ).distinct().count()
+        elif user.role == 'ADMIN':
+            counts['unread_tickets'] = tickets.filter(is_read=False).count()
+        return counts
+
+    def warm(self):
+        for user in self.users:
+            get_counters(user)
+
+    def assert_counters(self):
+        # Các khoá vẫn còn trong cache: giá trị đọc được là kết quả cộng / trừ, không phải đếm lại
+        keys = [UNREAD_ALL, PENDING_GRADING, unread_key(None)] + [open_key(user.pk) for user in self.users] + [
+            unread_key(user.pk) for user in self.users if user.role == 'TEACHER'
+        ]
+        self.assertEqual(set(cache.get_many(keys)), set(keys))
+        for user in self.users:
+            with self.subTest(user=user.username):
+                self.assertEqual(get_counters(user), self.fresh_counts(user))
+
+    def write(self, change):
+        with self.captureOnCommitCallbacks(execute=True):
+            value = change()
+        self.assert_counters()
+        return value
+
+    def create_ticket(self, **kwargs):
+        return SupportTicket.objects.create(user=self.student, subject='Lỗi nộp bài', message='Không bấm được', **kwargs)
+
+    def test_ticket_read_unread(self):
+        self.warm()
+        ticket = self.write(lambda: self.create_ticket(teacher=self.teacher))
+        unassigned = self.write(self.create_ticket)
+        self.assertEqual(get_counters(self.other_teacher)['unread_tickets'], 1)
+
+        ticket.is_read = True
+        self.write(lambda: ticket.save(update_fields=['is_read']))
+        ticket.is_read = False
+        self.write(ticket.save)
+        # Chuyển sang giáo viên khác
+        ticket.teacher = self.other_teacher
+        self.write(ticket.save)
+        unassigned.teacher = self.teacher
+        unassigned.is_read = True
+        self.write(unassigned.save)
+        self.assertEqual(get_counters(self.teacher)['unread_tickets'], 0)
+        self.assertEqual(get_counters(self.admin)['unread_tickets'], 1)
+
+    def test_status_changes(self):
+        self.warm()
+        ticket = self.write(lambda: self.create_ticket(teacher=self.teacher))
+        for status in (SupportTicket.Status.IN_PROGRESS, SupportTicket.Status.OPEN, SupportTicket.Status.CLOSED):
+            ticket.status = status
+            self.write(lambda: ticket.save(update_fields=['status', 'updated_at']))
+        self.assertEqual(get_counters(self.student)['open_tickets'], 0)
+
+        # Nạp với trường bị defer: trạng thái cũ đọc lại từ DB trước khi lưu
+        deferred = SupportTicket.objects.only('id', 'status').get(pk=ticket.pk)
+        deferred.status = SupportTicket.Status.OPEN
+        self.write(lambda: deferred.save(update_fields=['status']))
+        self.assertEqual(get_counters(self.student)['open_tickets'], 1)
+        deferred = SupportTicket.objects.defer('status', 'is_read').get(pk=ticket.pk)
+        deferred.is_read = True
+        self.write(lambda: deferred.save(update_fields=['is_read']))
+
+    def test_deletes(self):
+        first = self.create_ticket(teacher=self.teacher)
+        self.create_ticket()
+        self.create_ticket(teacher=self.other_teacher, is_read=True)
+        self.warm()
+        self.write(first.delete)
+        self.write(lambda: SupportTicket.objects.filter(teacher=None).delete())
+        # Xoá người gửi -> cascade sang các yêu cầu của họ
+        self.write(lambda: self.create_ticket(teacher=self.teacher))
+        self.users.remove(self.student)
+        self.write(self.student.delete)
+        self.assertFalse(SupportTicket.objects.exists())
+
+    def test_rollback(self):
+        ticket = self.create_ticket(teacher=self.teacher)
+        self.warm()
+        before = {user.pk: get_counters(user) for user in self.users}
+
+        def rolled_back():
+            with transaction.atomic():
+                ticket.is_read = True
+                ticket.status = SupportTicket.Status.RESOLVED
+                ticket.save()
+                self.create_ticket()
+                raise RuntimeError
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError):
+                rolled_back()
+        self.assertEqual(callbacks, [])
+        self.assertEqual({user.pk: get_counters(user) for user in self.users}, before)
+        self.assert_counters()
+
+    def test_pending_grading(self):
+        self.warm()
+        result = Result(student=self.student, quiz=self.quiz, score=5)
+        self.write(result.save)
+        self.assertEqual(get_counters(self.teacher)['pending_grading'], 1)
+        result.is_graded = True
+        self.write(result.save)
+        result.is_graded = False
+        self.write(result.save)
+        self.write(result.delete)
+
+        # Đề không có câu tự luận: không tính là chờ chấm
+        objective = Quiz.objects.create(
+            title='Trắc nghiệm', subject=self.subject, created_by=self.teacher, duration_minutes=15,
+            start_time=self.quiz.start_time, end_time=self.quiz.end_time,
+        )
+        objective.questions.add(*self.quiz.questions.exclude(question_type=Question.QuestionType.SHORT_ANSWER))
+        self.write(lambda: Result.objects.create(student=self.student, quiz=objective, score=10))
+        self.assertEqual(get_counters(self.teacher)['pending_grading'], 0)
+
+
+# ===== XOÁ CACHE ĐÁP ÁN / DỮ LIỆU ĐỀ KHI CÂU HỎI THAY ĐỔI (quiz/signals.py) =====
+
+class QuizCacheInvalidationTests(TestCase):
+    """Sau mỗi thay đổi, lần đọc cache kế tiếp phải khác lần trước và bằng kết quả tải lại từ DB"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', 'teacher@example.com', 'pw', role='TEACHER')
+        cls.subject = Subject.objects.create(name='Toán')
+
+    def setUp(self):
+        cache.clear()
+        self.quiz, self.questions, self.answers = create_quiz(self.teacher, self.subject)
+        self.other_quiz = create_quiz(self.teacher, self.subject)[0]
+
+    def cached(self, quiz):
+        return dict(get_answer_key(quiz)), get_quiz_payload(quiz)
+
+    def assert_changes(self, change, quizzes=None):
+        quizzes = quizzes or [self.quiz]
+        before = [self.cached(quiz) for quiz in quizzes]
+        change()
+        for quiz, previous in zip(quizzes, before):
+            with self.subTest(quiz=quiz.pk):
+                fresh = dict(compile_answer_key(quiz.pk)), build_quiz_payload(quiz.pk)
+                self.assertEqual(self.cached(quiz), fresh)
+                self.assertNotEqual(fresh, previous)
+
+    def test_answer_is_correct_edited(self):
+        answer = self.answers['single'][1]
+
+        def mark_correct():
+            answer.is_correct = True
+            answer.save()
+
+        self.assert_changes(mark_correct)
+        self.assertEqual(get_answer_key(self.quiz)[self.questions['single'].pk].correct_ids,
+                         {self.answers['single'][0].pk, answer.pk})
+
+    def test_answer_added_and_deleted(self):
+        self.assert_changes(lambda: Answer.objects.create(question=self.questions['multiple'], text='5', is_correct=True))
+        self.assert_changes(self.answers['multiple'][2].delete)
+
+    def test_quiz_questions_added_and_removed(self):
+        extra = Question.objects.create(
+            subject=self.subject, text='Số pi', difficulty='EASY',
+            question_type=Question.QuestionType.SHORT_ANSWER, created_by=self.teacher,
+        )
+        self.assert_changes(lambda: self.quiz.questions.add(extra))
+        self.assertIn(extra.pk, get_answer_key(self.quiz))
+        self.assert_changes(lambda: self.quiz.questions.remove(self.questions['single']))
+        self.assertNotIn(self.questions['single'].pk, get_answer_key(self.quiz))
+        # Thêm / bỏ từ phía câu hỏi (question.quiz_set)
+        self.assert_changes(lambda: extra.quiz_set.remove(self.quiz))
+        self.assert_changes(lambda: self.questions['single'].quiz_set.add(self.quiz, self.other_quiz),
+                            [self.quiz, self.other_quiz])
+        self.assert_changes(self.questions['single'].quiz_set.clear, [self.quiz, self.other_quiz])
+        self.assert_changes(self.quiz.questions.clear)
+        self.assertEqual(len(get_answer_key(self.quiz)), 0)
+
+    def test_question_deleted(self):
+        self.assert_changes(self.questions['true_false'].delete)
+        self.assertNotIn(self.questions['true_false'].pk, get_answer_key(self.quiz))
+        self.assert_changes(lambda: Question.objects.filter(pk=self.questions['short'].pk).delete())
+        self.assertEqual(get_answer_key(self.quiz).scorable_count, 2)
+
+    def test_question_text_edited(self):
+        question = self.questions['short']
+
+        def edit():
+            question.text = 'Phát biểu và chứng minh định lý Pytago'
+            question.save()
+
+        self.assert_changes(edit)
+
+
+# ===== BỐC CÂU HỎI THEO KHUNG ĐỀ (quiz/blueprints.py) =====
+
+class DrawTests(SimpleTestCase):
+
+    def setUp(self):
+        self.pools = {
+            'a': np.arange(100, 110, dtype=np.int64),
+            'b': np.arange(200, 203, dtype=np.int64),
+            'c': np.array([], dtype=np.int64),
+        }
+
+    def test_no_duplicates_and_taken_positions_skipped(self):
+        for seed in range(50):
+            with self.subTest(seed=seed):
+                rng = np.random.default_rng(seed)
+                taken = {'a': {0, 1, 2}}
+                first = _draw(self.pools, ['a', 'b', 'c'], 6, taken, rng)
+                second = _draw(self.pools, ['a', 'b'], 4, taken, rng)
+                picked = first + second
+                self.assertEqual(len(picked), len(set(picked)))
+                self.assertEqual(set(picked), set(range(103, 110)) | {200, 201, 202})
+                self.assertEqual(sum(len(offsets) for offsets in taken.values()), 13)
+
+    def test_not_enough(self):
+        taken = {'b': {0}}
+        self.assertIsNone(_draw(self.pools, ['b', 'c'], 3, taken, np.random.default_rng(0)))
+        # Không bốc được thì không đánh dấu thêm vị trí nào
+        self.assertEqual(taken, {'b': {0}})
+        self.assertEqual(_draw(self.pools, ['c'], 0, {}, np.random.default_rng(0)), [])
+
+    def test_seeded(self):
+        draws = {tuple(_draw(self.pools, ['a', 'b'], 5, {}, np.random.default_rng(seed))) for seed in range(20)}
+        self.assertGreater(len(draws), 1)
+        self.assertEqual(
+            _draw(self.pools, ['a', 'b'], 5, {}, np.random.default_rng(7)),
+            _draw(self.pools, ['a', 'b'], 5, {}, np.random.default_rng(7)),
+        )
+
+
+class SampleBlueprintTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', 'teacher@example.com', 'pw', role='TEACHER')
+        cls.other_teacher = User.objects.create_user('teacher2', 'teacher2@example.com', 'pw', role='TEACHER')
+        cls.subject = Subject.objects.create(name='Toán')
+        cls.other_subject = Subject.objects.create(name='Lý')
+        single, multiple = Question.QuestionType.SINGLE_CHOICE, Question.QuestionType.MULTIPLE_CHOICE
+        cls.strata = {
+            ('EASY', single): 4, ('EASY', multiple): 1, ('MEDIUM', single): 3, ('HARD', multiple): 2,
+        }
+        cls.ids = {}
+        for (difficulty, question_type), count in cls.strata.items():
+            cls.ids[difficulty, question_type] = {
+                Question.objects.create(
+                    subject=cls.subject, text=f'{difficulty} {question_type} {i}', difficulty=difficulty,
+                    question_type=question_type, created_by=cls.teacher,
+                ).pk
+                for i in range(count)
+            }
+        # Câu của môn khác / giáo viên khác không bao giờ được bốc
+        Question.objects.create(subject=cls.other_subject, text='Lực', difficulty='EASY', question_type=single, created_by=cls.teacher)
+        Question.objects.create(subject=cls.subject, text='Hàm số', difficulty='EASY', question_type=single, created_by=cls.other_teacher)
+        cls.blueprint = QuizBlueprint.objects.create(name='Giữa kỳ', subject=cls.subject, created_by=cls.teacher)
+
+    def setUp(self):
+        cache.clear()
+
+    def rules(self, *specs):
+        return [
+            BlueprintRule.objects.create(blueprint=self.blueprint, difficulty=difficulty, question_type=question_type, count=count)
+            for difficulty, question_type, count in specs
+        ]
+
+    def stratum_of(self, question_id):
+        return next(stratum for stratum, ids in self.ids.items() if question_id in ids)
+
+    def test_overlapping_rules_narrow_first(self):
+        # "2 câu Dễ" khai báo trước "3 câu Dễ - Một lựa chọn": nếu dòng rộng bốc trước và lấy 2 câu Một lựa chọn,
+        # dòng hẹp chỉ còn 2 câu. Dòng hẹp bốc trước -> dòng rộng lấy 2 câu Dễ còn lại.
+        rules = self.rules(('EASY', '', 2), ('EASY', 'SINGLE_CHOICE', 3), ('', '', 3))
+        for seed in range(30):
+            with self.subTest(seed=seed):
+                chosen = sample_blueprint(self.blueprint, seed=seed)
+                self.assertEqual(len(chosen), 8)
+                self.assertEqual(len(set(chosen)), 8)
+                strata = [self.stratum_of(question_id) for question_id in chosen]
+                # 3 câu dòng hẹp + 2 câu dòng "Dễ" = cả 5 câu Dễ của ngân hàng
+                self.assertEqual(sum(difficulty == 'EASY' for difficulty, _ in strata), 5)
+                self.assertEqual(sum(stratum == ('EASY', 'SINGLE_CHOICE') for stratum in strata), 4)
+        self.assertEqual([len(rule_strata(rule)) for rule in rules], [4, 1, 12])
+
+    def test_seeded(self):
+        self.rules(('', '', 6))
+        self.assertEqual(sample_blueprint(self.blueprint, seed=42), sample_blueprint(self.blueprint, seed=42))
+        self.assertGreater(len({tuple(sample_blueprint(self.blueprint, seed=seed)) for seed in range(10)}), 1)
+        self.assertEqual(len(sample_blueprint(self.blueprint, seed=1)), 6)
+
+    def test_not_enough_questions(self):
+        self.rules(('MEDIUM', 'SINGLE_CHOICE', 2), ('MEDIUM', '', 2))
+        with self.assertRaisesMessage(BlueprintError, 'Ngân hàng chỉ còn 1 câu phù hợp với dòng "2 câu Trung bình - mọi loại" (cần 2 câu).'):
+            sample_blueprint(self.blueprint, seed=0)
+        # Cả ngân hàng chỉ có 10 câu phù hợp
+        with self.assertRaises(BlueprintError):
+            sample_blueprint(self.blueprint, seed=0, rules=[BlueprintRule(blueprint=self.blueprint, count=11)])
+        self.assertEqual(len(sample_blueprint(self.blueprint, seed=0, rules=[BlueprintRule(blueprint=self.blueprint, count=10)])), 10)
+
+
+# ===== FORM ĐỀ THI: CHỌN CÂU HỎI THEO ID, CẬP NHẬT LIÊN KẾT THEO CHÊNH LỆCH (quiz/forms.py) =====
+
+class QuizFormQuestionsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', 'teacher@example.com', 'pw', role='TEACHER')
+        cls.other_teacher = User.objects.create_user('teacher2', 'teacher2@example.com', 'pw', role='TEACHER')
+        cls.subject = Subject.objects.create(name='Toán')
+        cls.questions = [
+            Question.objects.create(subject=cls.subject, text=f'Câu {i}', difficulty='EASY', created_by=cls.teacher)
+            for i in range(5)
+        ]
+        cls.foreign = Question.objects.create(subject=cls.subject, text='Câu của GV khác', difficulty='EASY', created_by=cls.other_teacher)
+
+    def setUp(self):
+        cache.clear()
+
+    def ids(self, *indexes):
+        return [self.questions[i].pk for i in indexes]
+
+    def form(self, question_ids, instance=None, **fields):
+        now = timezone.localtime()
+        data = MultiValueDict({
+            'title': ['Kiểm tra'], 'subject': [str(self.subject.pk)], 'duration_minutes': ['15'],
+            'start_time': [now.strftime('%Y-%m-%dT%H:%M')],
+            'end_time': [(now + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M')],
+            'is_public': ['True'], 'questions': [str(question_id) for question_id in question_ids],
+        })
+        for name, value in fields.items():
+            data[name] = value
+        return QuizForm(data, instance=instance, user=self.teacher)
+
+    def test_field_validation(self):
+        field = QuestionIdsField(queryset=Question.objects.filter(created_by=self.teacher))
+        # Giữ thứ tự chọn, bỏ id lặp
+        self.assertEqual(field.clean([str(self.questions[2].pk), self.questions[0].pk, str(self.questions[2].pk)]), self.ids(2, 0))
+        cases = [
+            ([], 'Vui lòng chọn ít nhất một câu hỏi.'),
+            (['1', 'abc'], 'Danh sách câu hỏi không hợp lệ.'),
+            # Câu của giáo viên khác / id không tồn tại
+            ([self.questions[0].pk, self.foreign.pk], 'Có 1 câu hỏi không tồn tại hoặc không thuộc ngân hàng của bạn.'),
+            ([self.foreign.pk, 999999, self.questions[1].pk], 'Có 2 câu hỏi không tồn tại hoặc không thuộc ngân hàng của bạn.'),
+        ]
+        for value, message in cases:
+            with self.subTest(value=value):
+                with self.assertRaisesMessage(ValidationError, message):
+                    field.clean(value)
+
+    def test_form_rejects_foreign_questions(self):
+        form = self.form([self.questions[0].pk, self.foreign.pk])
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['questions'], ['Có 1 câu hỏi không tồn tại hoặc không thuộc ngân hàng của bạn.'])
+
+    def test_diff_edit(self):
+        form = self.form(self.ids(0, 1, 2))
+        self.assertTrue(form.is_valid(), form.errors)
+        # Như view tạo đề
+        quiz = form.save(commit=False)
+        quiz.created_by = self.teacher
+        quiz.save()
+        form.save_m2m()
+        self.assertEqual(set(quiz.questions.values_list('id', flat=True)), set(self.ids(0, 1, 2)))
+
+        changes = []
+
+        def record(sender, action, pk_set, **kwargs):
+            changes.append((action, pk_set))
+
+        m2m_changed.connect(record, sender=Quiz.questions.through)
+        self.addCleanup(m2m_changed.disconnect, record, sender=Quiz.questions.through)
+
+        form = self.form(self.ids(1, 2, 3, 4), instance=quiz)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(changes, [
+            ('pre_remove', set(self.ids(0))), ('post_remove', set(self.ids(0))),
+            ('pre_add', set(self.ids(3, 4))), ('post_add', set(self.ids(3, 4))),
+        ])
+        self.assertEqual(set(quiz.questions.values_list('id', flat=True)), set(self.ids(1, 2, 3, 4)))
+
+        # Không đổi câu nào: không xoá / thêm liên kết
+        changes.clear()
+        form = self.form(self.ids(4, 3, 2, 1), instance=quiz)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(changes, [])
+
+        # Trang sửa đề hiển thị sẵn các câu hiện có
+        self.assertEqual(QuizForm(instance=quiz, user=self.teacher).initial['questions'], self.ids(1, 2, 3, 4))
+
+    def test_pool_size(self):
+        form = self.form(self.ids(0, 1, 2), pool_size='4')
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['pool_size'], ['Số câu mỗi học sinh không được lớn hơn số câu của đề (3 câu).'])
+
+        form = self.form(self.ids(0, 1, 2), pool_size='3')
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['pool_size'], 3)
+        form = self.form(self.ids(0, 1, 2), pool_size='0')
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertIsNone(form.cleaned_data['pool_size'])
+
+
+# ===== XUẤT KẾT QUẢ XLSX / CSV (quiz/exports.py) =====
+
+class ResultExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', 'teacher@example.com', 'pw', role='TEACHER')
+        cls.subject = Subject.objects.create(name='Toán')
+        cls.quiz, cls.questions, cls.answers = create_quiz(cls.teacher, cls.subject)
+        for i in range(3):
+            student = User.objects.create_user(f'student{i}', f'student{i}@example.com', 'pw', role='STUDENT')
+            data = MultiValueDict({
+                f'question_{cls.questions["single"].pk}': [str(cls.answers['single'][i].pk)],
+                f'short_answer_{cls.questions["short"].pk}': [f'=HYPERLINK("x") {i}'],
+            })
+            grade_submission(cls.quiz, student, data)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.teacher)
+
+    def export(self, **params):
+        return self.client.get(reverse('quiz:quiz_results_export', args=[self.quiz.pk]), params)
+
+    def test_xlsx_inline_strings(self):
+        response = self.export()
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content)
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            # Chuỗi ghi ngay trong dòng, không có bảng sharedStrings
+            self.assertNotIn('xl/sharedStrings.xml', archive.namelist())
+            self.assertIn(b't="inlineStr"', archive.read('xl/worksheets/sheet2.xml'))
+        workbook = load_workbook(BytesIO(content), read_only=True)
+        self.assertEqual(workbook.sheetnames, ['Kết quả', 'Câu trả lời'])
+        results = list(workbook['Kết quả'].values)
+        self.assertEqual(len(results), 4)
+        self.assertEqual([row[0] for row in results[1:]], ['student0', 'student1', 'student2'])
+        answers = list(workbook['Câu trả lời'].values)
+        self.assertEqual(len(answers), 1 + 3 * 4)
+        # Chặn chèn công thức
+        self.assertIn("'=HYPERLINK(\"x\") 0", [row[6] for row in answers])
+
+    def test_too_many_rows_for_xlsx(self):
+        self.assertEqual(exports.xlsx_row_count(self.quiz), 13)
+        with mock.patch.object(exports, 'XLSX_MAX_ROWS', 12), mock.patch('quiz.views.XLSX_MAX_ROWS', 12):
+            response = self.export()
+            self.assertRedirects(response, reverse('quiz:quiz_results', args=[self.quiz.pk]), fetch_redirect_response=False)
+            # CSV không bị giới hạn
+            response = self.export(format='csv', sheet='answers')
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 13)
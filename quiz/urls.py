@@ -16,7 +16,11 @@ urlpatterns = [
     path('teacher/questions/add/', views.question_create, name='question_create'),
     path('teacher/questions/<int:pk>/edit/', views.question_edit, name='question_edit'),
     path('teacher/questions/<int:pk>/delete/', views.question_delete, name='question_delete'),
+    path('teacher/questions/duplicates/', views.question_duplicates, name='question_duplicates'),
+    path('teacher/questions/picker/', views.question_picker, name='question_picker'),
     path('teacher/questions/import/', views.question_import_excel, name='question_import'),
+    path('teacher/questions/import/<int:pk>/', views.question_import_status, name='question_import_status'),
+    path('teacher/questions/import/<int:pk>/progress/', views.question_import_progress, name='question_import_progress'),
 
     # Quản lý đề thi
     path('teacher/quizzes/', views.quiz_list, name='quiz_list'),
@@ -24,9 +28,15 @@ urlpatterns = [
     path('teacher/quizzes/<int:pk>/edit/', views.quiz_edit, name='quiz_edit'),
     path('teacher/quizzes/<int:pk>/delete/', views.quiz_delete, name='quiz_delete'),
     path('teacher/quizzes/<int:pk>/results/', views.quiz_results, name='quiz_results'),
+    path('teacher/quizzes/<int:pk>/results/export/', views.quiz_results_export, name='quiz_results_export'),
+    path('teacher/blueprints/', views.blueprint_list, name='blueprint_list'),
+    path('teacher/blueprints/add/', views.blueprint_create, name='blueprint_create'),
+    path('teacher/blueprints/<int:pk>/edit/', views.blueprint_edit, name='blueprint_edit'),
+    path('teacher/blueprints/<int:pk>/delete/', views.blueprint_delete, name='blueprint_delete'),
 
     # API
     path('api/question/quick-create/', views.api_quick_create_question, name='api_quick_create_question'),
+    path('api/blueprints/<int:pk>/sample/', views.api_blueprint_sample, name='api_blueprint_sample'),
     
     # URLs chấm điểm tự luận
     path('grading/dashboard/', views.grading_dashboard, name='grading_dashboard'),
@@ -36,7 +46,9 @@ urlpatterns = [
     # URLs của Học sinh - Thi thật
     path('take/<int:pk>/', views.take_quiz, name='take_quiz'),
     path('submit/<int:pk>/', views.submit_quiz, name='submit_quiz'),
+    path('attempts/<int:pk>/autosave/', views.autosave_attempt, name='autosave_attempt'),
     path('results/<int:pk>/', views.view_result, name='view_result'),
+    path('submissions/<int:pk>/', views.submission_status, name='submission_status'),
     path('history/', views.test_history, name='test_history'),
 
     path('join/', views.join_with_code, name='join_with_code'),
@@ -64,6 +76,7 @@ urlpatterns = [
     path('support/my-tickets/', views.my_support_tickets, name='my_support_tickets'),
     path('support/teacher-inbox/', views.teacher_support_inbox, name='teacher_support_inbox'),
     path('support/admin-dashboard/', views.admin_support_dashboard, name='admin_support_dashboard'),
+    path('notifications/stream/', views.notification_stream, name='notification_stream'),
     path('support/ticket/<int:ticket_id>/update-status/', views.update_ticket_status, name='update_ticket_status'),
 
 ]
\ No newline at end of file
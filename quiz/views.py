@@ -11,23 +11,49 @@ from django.db import transaction, models
 from django.core.paginator import Paginator
 from django.contrib import messages
 import random
-from openpyxl import load_workbook
 from django.db.models import Count, Q
 from django.core.exceptions import PermissionDenied
-from .models import Question, Quiz, Answer, Subject
-from support.models import SupportTicket
+from .models import Question, Quiz, Answer, Subject, ImportJob, QuizBlueprint
+from support.models import SupportTicket, TicketMessage
+from support.search import search_tickets
+from support.stats import TOP_STUDENTS, get_ticket_stats, type_stats
 from users.models import User 
 
 
 # ===== IMPORT TỪ CÁC FILE KHÁC TRONG DỰ ÁN =====
-from .forms import QuestionForm, AnswerFormSet, QuizForm
-from results.models import Result, StudentAnswer
+from .forms import QuestionForm, AnswerFormSet, QuizForm, QuizBlueprintForm, BlueprintRuleFormSet
+from .analytics import get_item_analysis
+from .blueprints import BlueprintError, available_counts, sample_blueprint
+from .attempts import (
+    attempt_question_ids, current_attempt, discard_draft, final_answers, is_expired, load_draft, save_draft,
+    start_attempt,
+)
+from .dedup import REPORT_MAX_GROUPS, duplicate_groups, similar_questions
+from .exports import XLSX_MAX_ROWS, answer_rows, result_rows, stream_csv, write_xlsx, xlsx_row_count
+from .counters import get_counters
+from .importer import ensure_progress
+from .notifications import NOTIFIED_ROLES, counter_events, counter_snapshot
+from .pagination import keyset_page
+from .paper import render_paper
+from .review import review_items, update_short_answer_review
+from .search import rank_questions, search_questions
+from .signals import deferred_question_refresh
+from .subjects import get_subjects
+from .stats import practice_summary, record_practice, teacher_totals
+from .visibility import is_student_allowed, visible_quizzes_for
+from .grading import (
+    grade_practice, grade_submission, is_claimable, payload_from_post, process_submission,
+)
 from users.decorators import student_required, teacher_required
-from results.models import Result, StudentAnswer
-from results.models import PracticeResult
-from django.db.models import Avg, F
+from results.models import Attempt, PracticeResult, PracticeStats, QuizStats, Result, Submission
+from django.conf import settings
+from django.utils.datastructures import MultiValueDict
+from django.db.models import Avg, F, FilteredRelation
+from django.db.models.functions import Coalesce
 import json
-from django.http import JsonResponse
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 from django.views.decorators.http import require_POST
 from django.shortcuts import render, redirect
 from users.decorators import student_required, teacher_required, admin_required  # THÊM admin_required
@@ -50,15 +76,12 @@ def dashboard(request):
     
     elif user.role == 'STUDENT':
         now = timezone.now()
-        # Lấy các đề thi công khai, đang diễn ra
-        public_quizzes = Quiz.objects.filter(is_public=True, start_time__lte=now, end_time__gte=now)
-        # Lấy các đề thi riêng tư mà học sinh đã được phép tham gia
-        private_quizzes_joined = user.allowed_quizzes.filter(is_public=False, start_time__lte=now, end_time__gte=now)
-        
-        all_quizzes = (public_quizzes | private_quizzes_joined).distinct()
+        # Đề công khai đang diễn ra + đề riêng tư học sinh đã tham gia
+        # (đọc từ lịch đề thi trong cache, xem quiz/visibility.py)
+        all_quizzes = visible_quizzes_for(user, now)
         
         taken_quiz_ids = Result.objects.filter(student=user).values_list('quiz__id', flat=True)
-        context = {'quizzes': all_quizzes, 'taken_quiz_ids': list(taken_quiz_ids)}
+        context = {'quizzes': all_quizzes, 'taken_quiz_ids': list(taken_quiz_ids), 'now': now}
         return render(request, 'pages/student_dashboard.html', context)
     
     else: # Admin
@@ -76,22 +99,16 @@ def teacher_dashboard(request):
     total_questions = Question.objects.filter(created_by=teacher).count()
     total_quizzes = Quiz.objects.filter(created_by=teacher).count()
     recent_quizzes = Quiz.objects.filter(created_by=teacher).order_by('-created_at')[:5]
-    total_attempts = Result.objects.filter(quiz__created_by=teacher).count()
 
-    student_answers = StudentAnswer.objects.filter(result__quiz__created_by=teacher)
-    total_answers_submitted = student_answers.count()
-    total_correct_answers = student_answers.filter(selected_answer__is_correct=True).count()
-    
-    average_correct_rate = 0
-    if total_answers_submitted > 0:
-        average_correct_rate = round((total_correct_answers / total_answers_submitted) * 100)
+    # Đọc từ QuizStats (1 dòng / đề) thay vì quét Result / StudentAnswer
+    totals = teacher_totals(teacher)
 
     context = {
         'total_quizzes': total_quizzes, 
         'total_questions': total_questions, 
         'recent_quizzes': recent_quizzes, 
-        'total_attempts': total_attempts, 
-        'average_correct_rate': average_correct_rate
+        'total_attempts': totals['total_attempts'], 
+        'average_correct_rate': round(totals['average_correct_rate'])
     }
     return render(request, 'pages/teacher_dashboard.html', context)
 
@@ -100,52 +117,140 @@ def teacher_dashboard(request):
 # CHỨC NĂNG QUẢN LÝ CÂU HỎI (QUESTION CRUD)
 # ===========================================================================
 
-@login_required
-@teacher_required
-def question_list(request):
-    questions_qs = Question.objects.filter(created_by=request.user)
+def _filter_questions(user, params):
+    """Câu hỏi của giáo viên lọc theo môn / độ khó / loại / từ khoá (tham số GET); trả về (queryset, từ khoá)"""
+    questions_qs = Question.objects.filter(created_by=user)
     
     # Thêm filter
-    subject_filter = request.GET.get('subject')
-    difficulty_filter = request.GET.get('difficulty')
-    question_type_filter = request.GET.get('question_type')
-    search_query = request.GET.get('search', '')
+    subject_filter = params.get('subject')
+    difficulty_filter = params.get('difficulty')
+    question_type_filter = params.get('question_type')
+    search_query = params.get('search', '')
     
-    if subject_filter:
+    if subject_filter and subject_filter.isdigit():
         questions_qs = questions_qs.filter(subject_id=subject_filter)
     if difficulty_filter:
         questions_qs = questions_qs.filter(difficulty=difficulty_filter)
     if question_type_filter:
         questions_qs = questions_qs.filter(question_type=question_type_filter)
+    # Tìm kiếm full-text không dấu ("dao ham" khớp "đạo hàm"), xếp theo độ liên quan
     if search_query:
-        questions_qs = questions_qs.filter(text__icontains=search_query)
-    
-    questions_qs = questions_qs.order_by('-created_at')
-    
-    # Thống kê
-    total_questions = questions_qs.count()
-    single_choice_count = questions_qs.filter(question_type='SINGLE_CHOICE').count()
-    multiple_choice_count = questions_qs.filter(question_type='MULTIPLE_CHOICE').count()
-    true_false_count = questions_qs.filter(question_type='TRUE_FALSE').count()
-    short_answer_count = questions_qs.filter(question_type='SHORT_ANSWER').count()
-    
-    paginator = Paginator(questions_qs, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
+        questions_qs = search_questions(questions_qs, search_query)
+    return questions_qs, search_query
+
+
+def _question_page(questions_qs, search_query, params, per_page):
+    # Phân trang keyset theo (created_at, id) hoặc (độ liên quan, id) khi tìm kiếm:
+    # trang sâu không phải OFFSET qua hàng nghìn dòng
+    ordering = ('-created_at', '-id')
+    if search_query:
+        questions_qs = rank_questions(questions_qs, search_query)
+        ordering = ('search_rank', '-id')
+    return keyset_page(questions_qs.select_related('subject'), params, per_page, ordering)
+
+
+@login_required
+@teacher_required
+def question_list(request):
+    questions_qs, search_query = _filter_questions(request.user, request.GET)
+
+    # Thống kê theo loại câu hỏi: 1 truy vấn (COUNT có điều kiện)
+    type_counts = questions_qs.aggregate(
+        total=Count('id'),
+        **{
+            question_type.lower(): Count('id', filter=Q(question_type=question_type))
+            for question_type in Question.QuestionType.values
+        }
+    )
+
+    page_obj = _question_page(questions_qs, search_query, request.GET, 10)
+    filter_params = request.GET.copy()
+    for key in ('after', 'before', 'last', 'page'):
+        filter_params.pop(key, None)
+
     context = {
         'page_obj': page_obj,
-        'subjects': Subject.objects.all(),
-        'total_questions': total_questions,
-        'single_choice_count': single_choice_count,
-        'multiple_choice_count': multiple_choice_count,
-        'true_false_count': true_false_count,
-        'short_answer_count': short_answer_count,
+        'filter_query': filter_params.urlencode(),
+        'subjects': get_subjects(),
+        'total_questions': type_counts['total'],
+        'single_choice_count': type_counts['single_choice'],
+        'multiple_choice_count': type_counts['multiple_choice'],
+        'true_false_count': type_counts['true_false'],
+        'short_answer_count': type_counts['short_answer'],
         'search_query': search_query,
     }
     return render(request, 'quiz_management/question_list.html', context)
 
 
+# Số câu mỗi lần tải của bộ chọn câu hỏi trên trang soạn đề
+PICKER_PAGE_SIZE = 20
+
+
+def _picker_item(question):
+    return {
+        'id': question.id,
+        'text': question.text,
+        'subject': question.subject.name,
+        'type': question.get_question_type_display(),
+        'difficulty': question.difficulty,
+        'difficulty_display': question.get_difficulty_display(),
+    }
+
+
+@login_required
+@teacher_required
+def question_picker(request):
+    """
+    API cho bộ chọn câu hỏi trên trang soạn đề: 1 trang câu hỏi (JSON) theo môn / độ khó / loại / từ khoá.
+    Trang tiếp theo: ?after=<next_cursor> (keyset, không OFFSET).
+    """
+    questions_qs, search_query = _filter_questions(request.user, request.GET)
+    page_obj = _question_page(questions_qs, search_query, request.GET, PICKER_PAGE_SIZE)
+    return JsonResponse({
+        'status': 'success',
+        'results': [_picker_item(question) for question in page_obj],
+        'has_next': page_obj.has_next,
+        'next_cursor': page_obj.next_cursor if page_obj.has_next else '',
+    })
+
+
+def _similar_question_list(question, limit=3):
+    """Các câu gần trùng với câu vừa lưu: [{'id', 'text', 'similarity'}] (giống nhất trước)"""
+    similar = similar_questions(question)[:limit]
+    texts = dict(Question.objects.filter(pk__in=[question_id for question_id, _ in similar]).values_list('id', 'text'))
+    return [
+        {'id': question_id, 'text': texts[question_id][:100], 'similarity': round(score * 100)}
+        for question_id, score in similar if question_id in texts
+    ]
+
+
+def _warn_duplicates(request, question):
+    similar = _similar_question_list(question)
+    if similar:
+        listing = '; '.join(f'"{item["text"]}" (giống {item["similarity"]}%)' for item in similar)
+        messages.warning(request, f"Câu hỏi vừa thêm có thể trùng với câu đã có: {listing}.")
+
+
+@login_required
+@teacher_required
+def question_duplicates(request):
+    """Báo cáo các nhóm câu hỏi gần trùng trong ngân hàng của giáo viên (MinHash/LSH, xem quiz/dedup.py)"""
+    groups = duplicate_groups(request.user.id)
+    shown = groups[:REPORT_MAX_GROUPS]
+    questions = Question.objects.select_related('subject').in_bulk(
+        [question_id for _, members in shown for question_id in members]
+    )
+    context = {
+        'groups': [
+            {'similarity': round(score * 100), 'questions': [questions[qid] for qid in members if qid in questions]}
+            for score, members in shown
+        ],
+        'group_count': len(groups),
+        'duplicate_count': sum(len(members) - 1 for _, members in groups),
+    }
+    return render(request, 'quiz_management/question_duplicates.html', context)
+
+
 @login_required
 @teacher_required
 @transaction.atomic
@@ -164,26 +269,32 @@ def question_create(request):
             try:
                 # Xử lý câu hỏi Đúng/Sai
                 if question_type == Question.QuestionType.TRUE_FALSE:
-                    question.save()
-                    # Tạo tự động 2 đáp án Đúng/Sai
-                    Answer.objects.create(question=question, text='Đúng', is_correct=True)
-                    Answer.objects.create(question=question, text='Sai', is_correct=False)
+                    with deferred_question_refresh():
+                        question.save()
+                        # Tạo tự động 2 đáp án Đúng/Sai
+                        Answer.objects.create(question=question, text='Đúng', is_correct=True)
+                        Answer.objects.create(question=question, text='Sai', is_correct=False)
                     messages.success(request, "Thêm câu hỏi Đúng/Sai thành công!")
+                    _warn_duplicates(request, question)
                     return redirect('quiz:question_list')
                 
                 # Xử lý câu hỏi tự luận
                 elif question_type == Question.QuestionType.SHORT_ANSWER:
                     question.save()
                     messages.success(request, "Thêm câu hỏi tự luận thành công!")
+                    _warn_duplicates(request, question)
                     return redirect('quiz:question_list')
                 
                 # Xử lý câu hỏi có đáp án (Single/Multiple choice)
                 else:
                     if formset.is_valid():
-                        question.save()
-                        formset.instance = question
-                        formset.save()
+                        # search_text / chữ ký MinHash tính 1 lần sau khi lưu cả câu hỏi lẫn đáp án
+                        with deferred_question_refresh():
+                            question.save()
+                            formset.instance = question
+                            formset.save()
                         messages.success(request, "Thêm câu hỏi thành công!")
+                        _warn_duplicates(request, question)
                         return redirect('quiz:question_list')
                     else:
                         messages.error(request, "Vui lòng kiểm tra lại các đáp án.")
@@ -241,24 +352,25 @@ def api_quick_create_question(request):
 
         # 2. Tạo câu hỏi
         subject = Subject.objects.get(id=subject_id)
-        question = Question.objects.create(
-            text=text,
-            subject=subject,
-            question_type=q_type,
-            difficulty=difficulty,
-            created_by=request.user,
-            correct_answer_text=correct_answer_text if q_type == 'SHORT_ANSWER' else None
-        )
+        with transaction.atomic(), deferred_question_refresh():
+            question = Question.objects.create(
+                text=text,
+                subject=subject,
+                question_type=q_type,
+                difficulty=difficulty,
+                created_by=request.user,
+                correct_answer_text=correct_answer_text if q_type == 'SHORT_ANSWER' else None
+            )
 
-        # 3. Tạo đáp án (Nếu là trắc nghiệm)
-        if q_type in ['SINGLE_CHOICE', 'MULTIPLE_CHOICE']:
-            for ans in answers_data:
-                if ans.get('text'): # Chỉ lưu đáp án có nội dung
-                    Answer.objects.create(
-                        question=question,
-                        text=ans.get('text'),
-                        is_correct=ans.get('is_correct', False)
-                    )
+            # 3. Tạo đáp án (Nếu là trắc nghiệm)
+            if q_type in ['SINGLE_CHOICE', 'MULTIPLE_CHOICE']:
+                for ans in answers_data:
+                    if ans.get('text'): # Chỉ lưu đáp án có nội dung
+                        Answer.objects.create(
+                            question=question,
+                            text=ans.get('text'),
+                            is_correct=ans.get('is_correct', False)
+                        )
         
         # 4. Trả về dữ liệu để hiển thị ngay lập tức
         return JsonResponse({
@@ -269,7 +381,9 @@ def api_quick_create_question(request):
                 'difficulty': question.get_difficulty_display(),
                 'type': question.get_question_type_display(),
                 'subject': question.subject.name
-            }
+            },
+            # Các câu đã có trong ngân hàng có thể trùng với câu vừa tạo
+            'duplicates': _similar_question_list(question),
         })
 
     except Exception as e:
@@ -307,8 +421,9 @@ def question_edit(request, pk):
                 # Xử lý các câu hỏi có đáp án khác
                 else:
                     if formset and formset.is_valid():
-                        form.save()
-                        formset.save()
+                        with deferred_question_refresh():
+                            form.save()
+                            formset.save()
                         messages.success(request, 'Cập nhật câu hỏi thành công!')
                         return redirect('quiz:question_list')
                     else:
@@ -357,59 +472,46 @@ def question_delete(request, pk):
 @login_required
 @teacher_required
 def question_import_excel(request):
-    """View import câu hỏi từ file Excel"""
+    """View import câu hỏi từ file Excel (tạo job chạy nền, xem quiz/importer.py)"""
     if request.method == 'POST':
         excel_file = request.FILES.get('excel_file')
         if not excel_file or not excel_file.name.endswith('.xlsx'):
             messages.error(request, "Vui lòng upload một file Excel (.xlsx).")
             return redirect('quiz:question_import')
         
-        try:
-            workbook = load_workbook(excel_file)
-            sheet = workbook.active
-            count = 0
-            
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                # Kiểm tra dòng có đủ dữ liệu không
-                if not all(row[i] for i in [0, 1, 2, 3, 4, 7]):
-                    continue
-                    
-                subject_name, q_text, difficulty, ans1, ans2, ans3, ans4, correct_idx_str = row[:8]
-                subject, _ = Subject.objects.get_or_create(name=str(subject_name).strip())
-                
-                difficulty_val = str(difficulty).strip().upper()
-                if difficulty_val not in Question.Difficulty.values:
-                    continue
-                
-                # Tạo câu hỏi với loại mặc định là SINGLE_CHOICE
-                question = Question.objects.create(
-                    subject=subject, 
-                    text=str(q_text).strip(), 
-                    difficulty=difficulty_val, 
-                    question_type=Question.QuestionType.SINGLE_CHOICE,
-                    created_by=request.user
-                )
-                
-                answers = [ans1, ans2, ans3, ans4]
-                correct_idx = int(correct_idx_str)
-                
-                for i, ans_text in enumerate(answers, 1):
-                    if ans_text:
-                        Answer.objects.create(
-                            question=question, 
-                            text=str(ans_text).strip(), 
-                            is_correct=(i == correct_idx)
-                        )
-                count += 1
-                
-            messages.success(request, f'Import thành công {count} câu hỏi.')
-            return redirect('quiz:question_list')
-            
-        except Exception as e:
-            messages.error(request, f"Lỗi xử lý file Excel: {e}")
-            return redirect('quiz:question_import')
+        job = ImportJob.objects.create(created_by=request.user, file=excel_file, file_name=excel_file.name)
+        return redirect('quiz:question_import_status', pk=job.pk)
     
-    return render(request, 'quiz_management/question_import.html')
+    recent_jobs = ImportJob.objects.filter(created_by=request.user)[:5]
+    return render(request, 'quiz_management/question_import.html', {'recent_jobs': recent_jobs})
+
+@login_required
+@teacher_required
+def question_import_status(request, pk):
+    """Trang tiến độ import + danh sách dòng lỗi"""
+    job = get_object_or_404(ImportJob, pk=pk, created_by=request.user)
+    ensure_progress(job)
+    return render(request, 'quiz_management/question_import.html', {'job': job})
+
+@login_required
+@teacher_required
+def question_import_progress(request, pk):
+    """API tiến độ import (trang tiến độ gọi định kỳ)"""
+    job = get_object_or_404(ImportJob, pk=pk, created_by=request.user)
+    ensure_progress(job)
+    return JsonResponse({
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'finished': job.is_finished,
+        'percent': job.percent,
+        'total_rows': job.total_rows,
+        'processed_rows': job.processed_rows,
+        'imported_count': job.imported_count,
+        'error_count': job.error_count,
+        'duplicate_count': job.duplicate_count,
+        'errors': job.errors if job.is_finished else [],
+        'message': job.message,
+    })
 # ===========================================================================
 # CHỨC NĂNG QUẢN LÝ ĐỀ THI (QUIZ CRUD)
 # ===========================================================================
@@ -426,6 +528,15 @@ def quiz_list(request):
     return render(request, 'quiz_management/quiz_list.html', context)
 
 
+def _quiz_form_context(request, form, **extra):
+    return {
+        'form': form,
+        'subjects': get_subjects(),
+        'blueprints': QuizBlueprint.objects.filter(created_by=request.user).select_related('subject'),
+        **extra,
+    }
+
+
 @login_required
 @teacher_required
 def quiz_create(request):
@@ -437,7 +548,7 @@ def quiz_create(request):
                 quiz = form.save(commit=False)
                 quiz.created_by = request.user
                 quiz.save()
-                form.save_m2m()  # Quan trọng để lưu ManyToManyField
+                form.save_m2m()  # Lưu danh sách câu hỏi (cập nhật theo chênh lệch, xem QuizForm.save_questions)
                 messages.success(request, "Tạo đề thi thành công!")
                 return redirect('quiz:quiz_list')
             except Exception as e:
@@ -445,9 +556,17 @@ def quiz_create(request):
         else:
             messages.error(request, "Vui lòng kiểm tra lại thông tin đề thi.")
     else:
-        form = QuizForm(user=request.user)
+        initial = {}
+        # ?blueprint=<id>: bốc sẵn bộ câu hỏi theo khung đề
+        blueprint = _get_blueprint(request.user, request.GET.get('blueprint'))
+        if blueprint is not None:
+            try:
+                initial = {'questions': sample_blueprint(blueprint), 'subject': blueprint.subject_id}
+            except BlueprintError as e:
+                messages.error(request, str(e))
+        form = QuizForm(user=request.user, initial=initial)
     
-    return render(request, 'quiz_management/quiz_form.html', {'form': form, 'is_edit': False})
+    return render(request, 'quiz_management/quiz_form.html', _quiz_form_context(request, form, is_edit=False))
 
 
 @login_required
@@ -472,11 +591,7 @@ def quiz_edit(request, pk):
     else:
         form = QuizForm(instance=quiz, user=request.user)
     
-    return render(request, 'quiz_management/quiz_form.html', {
-        'form': form, 
-        'is_edit': True, 
-        'quiz': quiz
-    })
+    return render(request, 'quiz_management/quiz_form.html', _quiz_form_context(request, form, is_edit=True, quiz=quiz))
 
 
 @login_required
@@ -491,18 +606,146 @@ def quiz_delete(request, pk):
     return render(request, 'quiz_management/quiz_confirm_delete.html', {'quiz': quiz})
 
 
+# ===========================================================================
+# KHUNG ĐỀ (BLUEPRINT) - BỐC CÂU HỎI NGẪU NHIÊN PHÂN TẦNG (xem quiz/blueprints.py)
+# ===========================================================================
+
+def _get_blueprint(user, pk):
+    if not pk or not str(pk).isdigit():
+        return None
+    return QuizBlueprint.objects.filter(pk=pk, created_by=user).prefetch_related('rules').first()
+
+
+@login_required
+@teacher_required
+def blueprint_list(request):
+    """Danh sách khung đề, kèm số câu hiện có trong ngân hàng cho từng dòng"""
+    blueprints = list(
+        QuizBlueprint.objects.filter(created_by=request.user).select_related('subject').prefetch_related('rules')
+    )
+    for blueprint in blueprints:
+        rules = list(blueprint.rules.all())
+        blueprint.rule_rows = list(zip(rules, available_counts(blueprint, rules)))
+        blueprint.total_questions = sum(rule.count for rule in rules)
+    return render(request, 'quiz_management/blueprint_list.html', {'blueprints': blueprints})
+
+
+def _blueprint_form(request, blueprint=None):
+    is_edit = blueprint is not None
+    if request.method == 'POST':
+        form = QuizBlueprintForm(request.POST, instance=blueprint)
+        formset = BlueprintRuleFormSet(request.POST, instance=blueprint)
+        if form.is_valid() and formset.is_valid():
+            with transaction.atomic():
+                blueprint = form.save(commit=False)
+                if not is_edit:
+                    blueprint.created_by = request.user
+                blueprint.save()
+                formset.instance = blueprint
+                formset.save()
+            messages.success(request, "Cập nhật khung đề thành công!" if is_edit else "Tạo khung đề thành công!")
+            return redirect('quiz:blueprint_list')
+        messages.error(request, "Vui lòng kiểm tra lại thông tin khung đề.")
+    else:
+        form = QuizBlueprintForm(instance=blueprint)
+        formset = BlueprintRuleFormSet(instance=blueprint)
+    return render(request, 'quiz_management/blueprint_form.html', {
+        'form': form,
+        'formset': formset,
+        'is_edit': is_edit,
+        'blueprint': blueprint,
+    })
+
+
+@login_required
+@teacher_required
+def blueprint_create(request):
+    return _blueprint_form(request)
+
+
+@login_required
+@teacher_required
+def blueprint_edit(request, pk):
+    return _blueprint_form(request, get_object_or_404(QuizBlueprint, pk=pk, created_by=request.user))
+
+
+@login_required
+@teacher_required
+def blueprint_delete(request, pk):
+    blueprint = get_object_or_404(QuizBlueprint, pk=pk, created_by=request.user)
+    if request.method == 'POST':
+        blueprint.delete()
+        messages.success(request, 'Xóa khung đề thành công!')
+    return redirect('quiz:blueprint_list')
+
+
+@login_required
+@teacher_required
+@require_POST
+def api_blueprint_sample(request, pk):
+    """Bốc một bộ câu hỏi theo khung đề cho trang soạn đề (JSON cùng dạng với question_picker)"""
+    blueprint = _get_blueprint(request.user, pk)
+    if blueprint is None:
+        return JsonResponse({'status': 'error', 'message': 'Không tìm thấy khung đề.'}, status=404)
+    try:
+        question_ids = sample_blueprint(blueprint)
+    except BlueprintError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    questions = Question.objects.select_related('subject').in_bulk(question_ids)
+    return JsonResponse({
+        'status': 'success',
+        'subject_id': blueprint.subject_id,
+        'results': [_picker_item(questions[question_id]) for question_id in question_ids if question_id in questions],
+    })
+
+
 @login_required
 @teacher_required
 def quiz_results(request, pk):
     """View kết quả đề thi"""
     quiz = get_object_or_404(Quiz, pk=pk, created_by=request.user)
-    results = Result.objects.filter(quiz=quiz).order_by('-score')
+    results = Result.objects.filter(quiz=quiz).select_related('student').order_by('-score')
+    stats = QuizStats.objects.filter(quiz=quiz).first() or QuizStats(quiz=quiz)
     return render(request, 'quiz_management/quiz_results.html', {
         'quiz': quiz, 
-        'results': results
+        'results': results,
+        'stats': stats,
+        # Độ khó, độ phân biệt, phương án nhiễu, KR-20 (cache, chỉ tính lại khi có bài nộp mới)
+        'analysis': get_item_analysis(quiz),
     })
 
 
+@login_required
+@teacher_required
+def quiz_results_export(request, pk):
+    """Xuất kết quả đề thi: XLSX (2 sheet) hoặc CSV (?sheet=results|answers), đọc dữ liệu theo lô"""
+    quiz = get_object_or_404(Quiz, pk=pk, created_by=request.user)
+    export_format = request.GET.get('format', 'xlsx')
+    sheet = request.GET.get('sheet', 'results')
+    filename = f'ket-qua-de-{quiz.pk}'
+    
+    if export_format == 'csv':
+        rows = answer_rows(quiz) if sheet == 'answers' else result_rows(quiz)
+        response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}-{sheet}.csv"'
+        return response
+
+    if xlsx_row_count(quiz) > XLSX_MAX_ROWS:
+        messages.warning(
+            request,
+            f"Chi tiết câu trả lời vượt quá {XLSX_MAX_ROWS:,} dòng (giới hạn của một sheet Excel). "
+            "Vui lòng xuất CSV.",
+        )
+        return redirect('quiz:quiz_results', pk=quiz.pk)
+
+    return FileResponse(
+        write_xlsx(quiz),
+        as_attachment=True,
+        filename=f'{filename}.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+
 # ===========================================================================
 # VIEWS CHO HỌC SINH
 # ===========================================================================
@@ -531,11 +774,11 @@ def join_with_code(request):
 @student_required
 def take_quiz(request, pk):
     """View làm bài thi"""
-    quiz = get_object_or_404(Quiz, pk=pk)
+    quiz = get_object_or_404(Quiz.objects.select_related('subject'), pk=pk)
     now = timezone.now()
     
     # Kiểm tra quyền truy cập
-    if not quiz.is_public and request.user not in quiz.allowed_students.all():
+    if not is_student_allowed(quiz, request.user):
         messages.error(request, "Đây là kỳ thi riêng tư. Bạn cần nhập mã tham gia trước.")
         return redirect('dashboard')
     
@@ -546,52 +789,54 @@ def take_quiz(request, pk):
         if existing_result:
             messages.warning(request, "Bạn đã hoàn thành đề thi này rồi!")
             return redirect('quiz:view_result', pk=existing_result.id)
+        # Bài đã nộp nhưng còn trong hộp thư chấm điểm: không mở lượt làm bài mới
+        pending_submission = Submission.objects.filter(
+            student=request.user, quiz=quiz,
+            status__in=[Submission.Status.PENDING, Submission.Status.PROCESSING]
+        ).first()
+        if pending_submission:
+            messages.info(request, "Bài thi của bạn đang được chấm điểm.")
+            return redirect('quiz:submission_status', pk=pending_submission.pk)
     else:
         # Nếu cho phép thi nhiều lần, vẫn cho phép thi lại
         pass
     
-    # Kiểm tra thời gian
-    if now > quiz.end_time:
+    # Kiểm tra thời gian. Đề đã đóng nhưng còn lượt làm bài dở -> xuống dưới để nộp phần bài đã autosave
+    attempt = current_attempt(quiz, request.user)
+    if now > quiz.end_time and attempt is None:
         messages.error(request, "Bài thi này đã kết thúc.")
         return redirect('dashboard')
     if now < quiz.start_time:
         messages.info(request, "Bài thi này chưa đến giờ bắt đầu.")
         return redirect('dashboard')
     
-    # Lấy và xáo trộn câu hỏi
-    questions = list(quiz.questions.all())
-    random.shuffle(questions)
-    
-    shuffled_questions = []
-    for q in questions:
-        if q.question_type in [Question.QuestionType.SINGLE_CHOICE, Question.QuestionType.MULTIPLE_CHOICE, Question.QuestionType.TRUE_FALSE]:
-            # Xáo trộn đáp án cho câu hỏi có lựa chọn
-            answers = list(q.answers.all())
-            random.shuffle(answers)
-            shuffled_questions.append({
-                'question': q, 
-                'answers': answers,
-                'question_type': q.question_type
-            })
-        else:
-            # Câu hỏi tự luận - không có đáp án để xáo trộn
-            shuffled_questions.append({
-                'question': q,
-                'answers': [],
-                'question_type': q.question_type
-            })
+    # Lượt làm bài: tạo khi mở đề lần đầu, mở lại trang sẽ tiếp tục lượt đang dở
+    if attempt is None:
+        attempt = start_attempt(quiz, request.user)
+    if is_expired(attempt, now=now):
+        # Hết thời gian làm bài -> nộp phần bài đã autosave
+        messages.warning(request, "Đã hết thời gian làm bài. Bài làm đã lưu được nộp tự động.")
+        return _submit_answers(request, quiz, load_draft(attempt), attempt)
+    
+    # Đề riêng của học sinh: dữ liệu đề lấy từ cache, thứ tự câu hỏi/đáp án
+    # được xáo bằng seed (đề, học sinh, lần thi) nên tải lại trang vẫn giữ nguyên
+    # Đề bốc ngẫu nhiên: chỉ các câu đã ghi nhận cho lượt làm bài
+    shuffled_questions = render_paper(quiz, request.user, attempt.number, attempt_question_ids(attempt))
 
     context = {
         'quiz': quiz, 
         'shuffled_questions': shuffled_questions,
         'now': now,
-        'end_time': quiz.end_time
+        'end_time': quiz.end_time,
+        'attempt': attempt,
+        'remaining_seconds': int((attempt.deadline - now).total_seconds()),
+        'draft': load_draft(attempt),
+        'autosave_interval': settings.QUIZ_AUTOSAVE_CLIENT_SECONDS,
     }
     return render(request, 'quiz_taking/take_quiz.html', context)
 
 @login_required
 @student_required
-@transaction.atomic
 def submit_quiz(request, pk):
     """View nộp bài thi - ĐÃ SỬA LỖI XỬ LÝ CÁC LOẠI CÂU HỎI"""
     if request.method != 'POST': 
@@ -600,177 +845,124 @@ def submit_quiz(request, pk):
     quiz = get_object_or_404(Quiz, pk=pk)
     now = timezone.now()
     
-    if now > quiz.end_time: 
+    attempt = current_attempt(quiz, request.user)
+    
+    # Có lượt làm bài: hạn nộp (tính cả thời gian ân hạn) quyết định, kể cả khi đề vừa đóng
+    if now > quiz.end_time and attempt is None: 
         messages.error(request, "Đã hết thời gian làm bài, không thể nộp.")
         return redirect('dashboard')
     
-    if Result.objects.filter(student=request.user, quiz=quiz).exists(): 
-        messages.warning(request, "Bạn đã nộp bài thi này rồi.")
-        return redirect('dashboard')
+    if not quiz.allow_multiple_attempts or attempt is None:
+        already_submitted = (
+            Result.objects.filter(student=request.user, quiz=quiz).exists()
+            or Submission.objects.filter(
+                student=request.user, quiz=quiz,
+                status__in=[Submission.Status.PENDING, Submission.Status.PROCESSING]
+            ).exists()
+        )
+        if already_submitted: 
+            messages.warning(request, "Bạn đã nộp bài thi này rồi.")
+            return redirect('dashboard')
 
-    questions = quiz.questions.all()
-    correct_answers_count = 0
-    total_questions = questions.count()
-    result = Result.objects.create(student=request.user, quiz=quiz, score=0)
-    
-    for question in questions:
-        if question.question_type == Question.QuestionType.SINGLE_CHOICE:
-            # Xử lý câu hỏi một lựa chọn
-            selected_answer_id = request.POST.get(f'question_{question.id}')
-            if selected_answer_id:
-                try:
-                    selected_answer = Answer.objects.get(pk=selected_answer_id)
-                    StudentAnswer.objects.create(
-                        result=result, 
-                        question=question, 
-                        selected_answer=selected_answer
-                    )
-                    if selected_answer.is_correct: 
-                        correct_answers_count += 1
-                except Answer.DoesNotExist: 
-                    pass
-
-        elif question.question_type == Question.QuestionType.MULTIPLE_CHOICE:
-            # Xử lý câu hỏi nhiều lựa chọn
-            selected_answer_ids = request.POST.getlist(f'question_{question.id}')
-            if selected_answer_ids:
-                # Lấy tất cả đáp án đúng của câu hỏi
-                correct_answers = set(question.answers.filter(is_correct=True).values_list('id', flat=True))
-                selected_answers = set(int(id) for id in selected_answer_ids)
-                
-                # Tạo StudentAnswer cho mỗi đáp án được chọn
-                for answer_id in selected_answers:
-                    try:
-                        selected_answer = Answer.objects.get(pk=answer_id)
-                        StudentAnswer.objects.create(
-                            result=result, 
-                            question=question, 
-                            selected_answer=selected_answer
-                        )
-                    except Answer.DoesNotExist:
-                        pass
-                
-                # Kiểm tra nếu tất cả đáp án đúng được chọn và không có đáp án sai nào được chọn
-                if selected_answers == correct_answers:
-                    correct_answers_count += 1
-
-        elif question.question_type == Question.QuestionType.TRUE_FALSE:
-            # Xử lý câu hỏi Đúng/Sai - SỬA LẠI PHẦN NÀY
-            selected_value = request.POST.get(f'question_{question.id}')
-            if selected_value:
-                # Tìm đáp án đúng
-                correct_answer = question.answers.filter(is_correct=True).first()
-                if correct_answer:
-                    # Tìm đáp án tương ứng với lựa chọn của học sinh
-                    try:
-                        selected_answer = question.answers.get(
-                            text='Đúng' if selected_value.lower() == 'true' else 'Sai'
-                        )
-                        StudentAnswer.objects.create(
-                            result=result, 
-                            question=question, 
-                            selected_answer=selected_answer
-                        )
-                        # Kiểm tra nếu đáp án học sinh chọn là đáp án đúng
-                        if selected_answer.is_correct:
-                            correct_answers_count += 1
-                    except Answer.DoesNotExist:
-                        pass
-
-        elif question.question_type == Question.QuestionType.SHORT_ANSWER:
-            # Xử lý câu hỏi tự luận ngắn
-            student_answer_text = request.POST.get(f'short_answer_{question.id}', '').strip()
-            if student_answer_text:
-                StudentAnswer.objects.create(
-                    result=result, 
-                    question=question, 
-                    selected_answer=None,
-                    custom_answer=student_answer_text  # Lưu câu trả lời tự luận
-                )
-            # Câu tự luận không tính điểm tự động
-    
-    # Tính điểm (chỉ tính các câu hỏi có thể chấm tự động)
-    scorable_questions = questions.exclude(question_type=Question.QuestionType.SHORT_ANSWER)
-    total_scorable = scorable_questions.count()
-    
-    if total_scorable > 0:
-        score = (correct_answers_count / total_scorable) * 100
+    if attempt is None:
+        # Trang làm bài mở từ trước khi có lượt làm bài -> chấm theo dữ liệu POST
+        answers = payload_from_post(request.POST)
+    elif is_expired(attempt, settings.QUIZ_SUBMIT_GRACE_SECONDS):
+        # Quá hạn nộp: chỉ chấm phần bài đã autosave
+        messages.warning(request, "Bài nộp quá thời gian làm bài, hệ thống chỉ chấm phần bài đã lưu tự động.")
+        answers = load_draft(attempt)
     else:
-        score = 0
-        
-    result.score = round(score, 2)
-    result.save()
+        answers = final_answers(load_draft(attempt), request.POST)
+    
+    return _submit_answers(request, quiz, answers, attempt)
+
+def _submit_answers(request, quiz, answers, attempt=None):
+    """Nộp bài: đưa vào hộp thư chấm điểm (bất đồng bộ) hoặc chấm trực tiếp"""
+    if attempt is not None:
+        submitted = Attempt.objects.filter(pk=attempt.pk, status=Attempt.Status.IN_PROGRESS).update(
+            status=Attempt.Status.SUBMITTED, submitted_at=timezone.now(), draft=answers
+        )
+        if not submitted:
+            # Lượt làm bài đã được nộp (vd. bấm nộp 2 lần)
+            messages.warning(request, "Bạn đã nộp bài thi này rồi.")
+            return redirect('dashboard')
+        discard_draft(attempt)
+
+    if settings.QUIZ_ASYNC_GRADING:
+        # Chỉ lưu bài vào hộp thư (1 INSERT), worker grade_submissions sẽ chấm sau
+        submission = Submission.objects.create(
+            student=request.user, quiz=quiz, attempt=attempt, payload=answers
+        )
+        messages.success(request, "Nộp bài thi thành công! Hệ thống đang chấm điểm.")
+        return redirect('quiz:submission_status', pk=submission.pk)
+
+    # Chấm điểm với số truy vấn cố định (xem quiz/grading.py)
+    with transaction.atomic():
+        result = grade_submission(quiz, request.user, MultiValueDict(answers), attempt)
     
     messages.success(request, "Nộp bài thi thành công!")
     return redirect('quiz:view_result', pk=result.pk)
 
+@login_required
+@student_required
+@require_POST
+def autosave_attempt(request, pk):
+    """API autosave bản nháp (gọi từ script của take_quiz.html)"""
+    attempt = get_object_or_404(Attempt, pk=pk, student=request.user)
+    if attempt.status != Attempt.Status.IN_PROGRESS:
+        return JsonResponse({'status': 'error', 'message': 'Bài thi đã được nộp.'}, status=409)
+    if is_expired(attempt, settings.QUIZ_SUBMIT_GRACE_SECONDS):
+        return JsonResponse({'status': 'error', 'message': 'Đã hết thời gian làm bài.'}, status=403)
+    
+    try:
+        answers = json.loads(request.body).get('answers', {})
+        answers = {
+            str(key): [str(value) for value in values]
+            for key, values in answers.items()
+            if str(key).startswith(('question_', 'short_answer_')) and isinstance(values, list)
+        }
+    except (ValueError, AttributeError):
+        return JsonResponse({'status': 'error', 'message': 'Dữ liệu không hợp lệ.'}, status=400)
+    
+    flushed = save_draft(attempt, answers)
+    return JsonResponse({
+        'status': 'success',
+        'flushed': flushed,
+        'remaining_seconds': int((attempt.deadline - timezone.now()).total_seconds()),
+    })
+
+@login_required
+@student_required
+def submission_status(request, pk):
+    """Trang chờ chấm điểm: hiển thị trạng thái "đang chấm" cho tới khi worker xử lý xong"""
+    submission = get_object_or_404(Submission.objects.select_related('quiz', 'student'), pk=pk, student=request.user)
+    
+    # Worker không chạy, bị chậm quá lâu hoặc chết khi đang chấm (hết lease) -> chấm trực tiếp
+    waited = (timezone.now() - submission.created_at).total_seconds()
+    if waited > settings.QUIZ_GRADING_FALLBACK_SECONDS and is_claimable(submission):
+        if not process_submission(submission):
+            submission.refresh_from_db()
+    
+    if submission.status == Submission.Status.DONE:
+        return redirect('quiz:view_result', pk=submission.result_id)
+    if submission.status == Submission.Status.FAILED:
+        messages.error(request, "Có lỗi khi chấm bài thi của bạn. Vui lòng liên hệ giáo viên.")
+    
+    # Quá cả thời gian chờ lẫn lease mà vẫn chưa chấm được: dừng tự tải lại, báo học sinh
+    stalled = (
+        submission.status != Submission.Status.FAILED
+        and waited > settings.QUIZ_GRADING_FALLBACK_SECONDS + settings.QUIZ_GRADING_LEASE_SECONDS
+    )
+    return render(request, 'quiz_taking/view_result.html', {'submission': submission, 'stalled': stalled})
+
 @login_required
 @student_required
 def view_result(request, pk):
     """View xem kết quả bài thi - ĐÃ SỬA LỖI HIỂN THỊ"""
-    result = get_object_or_404(Result, pk=pk, student=request.user)
-    detailed_answers = []
-    student_answers_dict = {sa.question.id: sa for sa in result.student_answers.all()}
+    result = get_object_or_404(Result.objects.select_related('quiz', 'attempt'), pk=pk, student=request.user)
     
-    for question in result.quiz.questions.order_by('id'):
-        student_answer_obj = student_answers_dict.get(question.id)
-        
-        if question.question_type == Question.QuestionType.SHORT_ANSWER:
-            # Xử lý câu hỏi tự luận
-            detailed_answers.append({
-                'question': question,
-                'question_type': question.question_type,
-                'correct_answer_text': question.correct_answer_text,
-                'student_answer_text': student_answer_obj.custom_answer if student_answer_obj else '',
-                'is_short_answer': True,
-                'is_multiple_choice': False,
-                'explanation': question.explanation
-            })
-        elif question.question_type == Question.QuestionType.MULTIPLE_CHOICE:
-            # Xử lý câu hỏi nhiều lựa chọn
-            correct_answers = question.answers.filter(is_correct=True)
-            student_selected_answers = []
-            if student_answer_obj:
-                # Lấy tất cả câu trả lời của học sinh cho câu hỏi này
-                student_selected_answers = list(result.student_answers.filter(
-                    question=question, 
-                    selected_answer__isnull=False
-                ).values_list('selected_answer_id', flat=True))
-            
-            # Kiểm tra đúng/sai cho multiple choice
-            correct_answer_ids = set(correct_answers.values_list('id', flat=True))
-            student_answer_ids = set(student_selected_answers)
-            is_correct = (correct_answer_ids == student_answer_ids)
-            
-            detailed_answers.append({
-                'question': question,
-                'question_type': question.question_type,
-                'all_answers': question.answers.all(),
-                'correct_answers': correct_answers,
-                'student_selected_answers': student_selected_answers,
-                'is_correct': is_correct,
-                'is_short_answer': False,
-                'is_multiple_choice': True,
-                'explanation': question.explanation
-                
-            })
-        else:
-            # Xử lý câu hỏi một lựa chọn và Đúng/Sai
-            correct_answer = question.answers.filter(is_correct=True).first()
-            student_answer = student_answer_obj.selected_answer if student_answer_obj else None
-            is_correct = student_answer.is_correct if student_answer else False
-            
-            detailed_answers.append({
-                'question': question,
-                'question_type': question.question_type,
-                'all_answers': question.answers.all(),
-                'correct_answer': correct_answer,
-                'student_answer': student_answer,
-                'is_correct': is_correct,
-                'is_short_answer': False,
-                'is_multiple_choice': False,
-                'explanation': question.explanation
-            })
+    # Bài làm từ bản chụp Result.review + nội dung đề từ cache (không truy vấn câu hỏi / đáp án)
+    detailed_answers = review_items(result)
     context = {
         'result': result, 
         'detailed_answers': detailed_answers
@@ -789,52 +981,30 @@ def test_history(request):
 @login_required
 def practice_selection(request):
     """Trang chọn đề để luyện tập"""
-    # Lấy tất cả đề thi cho phép luyện tập nhiều lần
-    available_quizzes = Quiz.objects.filter(
-        allow_multiple_attempts=True,
-        is_public=True
-    ).distinct()
-    
-    # Thêm thông tin thống kê cho mỗi quiz
-    for quiz in available_quizzes:
-        # Số lần luyện tập
-        quiz.attempt_count = PracticeResult.objects.filter(
-            quiz=quiz, 
-            student=request.user
-        ).count()
-        
-        # Điểm cao nhất
-        best_result = PracticeResult.objects.filter(
-            quiz=quiz, 
-            student=request.user
-        ).order_by('-score').first()
-        quiz.best_score = best_result.score if best_result else None
-    
-    # Tính toán thống kê tổng
-    total_attempts = PracticeResult.objects.filter(student=request.user).count()
-    user_practice_results = PracticeResult.objects.filter(student=request.user)
-    
-    if user_practice_results.exists():
-        average_score = user_practice_results.aggregate(Avg('score'))['score__avg']
-        average_score = round(average_score, 1) if average_score else 0
-    else:
-        average_score = 0
+    # Tất cả đề cho phép luyện tập + thống kê luyện tập của học sinh: 1 truy vấn (LEFT JOIN PracticeStats)
+    available_quizzes = list(
+        Quiz.objects.filter(allow_multiple_attempts=True, is_public=True)
+        .select_related('subject')
+        .annotate(
+            my_stats=FilteredRelation('practice_stats', condition=Q(practice_stats__student=request.user)),
+            question_count=Count('questions', distinct=True),
+        )
+        .annotate(
+            attempt_count=Coalesce(F('my_stats__attempt_count'), 0),
+            best_score=F('my_stats__best_score'),
+        )
+        .order_by('id')
+    )
     
-    # Tính % cải thiện
-    improvement = 0
-    recent_results = user_practice_results.order_by('-completed_at')[:2]
-    if len(recent_results) == 2:
-        old_score = recent_results[1].score
-        new_score = recent_results[0].score
-        if old_score > 0:
-            improvement = round(((new_score - old_score) / old_score) * 100, 1)
+    # Thống kê tổng (tổng lượt, điểm trung bình, % cải thiện) từ PracticeStats
+    summary = practice_summary(request.user)
     
     context = {
         'available_quizzes': available_quizzes,
-        'total_attempts': total_attempts,
-        'average_score': average_score,
-        'total_quizzes': available_quizzes.count(),
-        'improvement': improvement,
+        'total_attempts': summary['total_attempts'],
+        'average_score': summary['average_score'],
+        'total_quizzes': len(available_quizzes),
+        'improvement': summary['improvement'],
     }
     return render(request, 'practice_mode/practice_selection.html', context)
 
@@ -842,32 +1012,31 @@ def practice_selection(request):
 def submit_practice_quiz(request, pk):
     """Xử lý nộp bài luyện tập"""
     if request.method == 'POST':
-        quiz = get_object_or_404(Quiz, pk=pk)
+        quiz = get_object_or_404(Quiz.objects.select_related('subject'), pk=pk)
         
         if not quiz.allow_multiple_attempts:
             messages.error(request, "Đề thi này không cho phép luyện tập!")
             return redirect('quiz:practice_selection')
         
-        # Tính điểm và chi tiết câu trả lời
-        score = calculate_practice_score(request, quiz)
-        detailed_answers = get_practice_detailed_answers(request, quiz)
-        correct_count = len([a for a in detailed_answers if a['is_correct']])
+        # Tính điểm và chi tiết câu trả lời (một lượt chấm, đáp án từ cache)
+        score, correct_count, total_questions, detailed_answers = grade_practice(quiz, request.POST)
         
         # Lưu kết quả luyện tập
         practice_result = PracticeResult.objects.create(
             student=request.user,
             quiz=quiz,
             score=score,
-            total_questions=quiz.questions.count(),
+            total_questions=total_questions,
             correct_answers=correct_count
         )
+        record_practice(request.user, quiz, score, practice_result.completed_at)
         
         context = {
             'result': {
                 'quiz': quiz,
                 'score': score,
                 'detailed_answers': detailed_answers,
-                'total_questions': quiz.questions.count(),
+                'total_questions': total_questions,
                 'correct_answers': correct_count,
                 'improvement': calculate_improvement(request.user, quiz, score),
             }
@@ -879,15 +1048,14 @@ def submit_practice_quiz(request, pk):
     return redirect('quiz:practice_selection')
 
 def calculate_improvement(user, quiz, current_score):
-    """Tính % cải thiện so với lần trước"""
-    previous_results = PracticeResult.objects.filter(
-        student=user, 
-        quiz=quiz
-    ).order_by('-completed_at')
-    
-    if previous_results.count() >= 2:
-        previous_score = previous_results[1].score  # Lần trước đó
-        if previous_score > 0:
+    """Tính % cải thiện so với lần trước (đọc điểm lần trước từ PracticeStats)"""
+    stats = PracticeStats.objects.filter(student=user, quiz=quiz).values_list(
+        'attempt_count', 'previous_score'
+    ).first()
+    
+    if stats and stats[0] >= 2:
+        previous_score = stats[1]  # Lần trước đó
+        if previous_score:
             return round(((current_score - previous_score) / previous_score) * 100, 1)
     return 0
 @login_required
@@ -900,28 +1068,10 @@ def practice_quiz(request, pk):
         messages.error(request, "Đề thi này không cho phép luyện tập!")
         return redirect('quiz:practice_selection')
     
-    # Lấy và xáo trộn câu hỏi
-    questions = list(quiz.questions.all())
-    random.shuffle(questions)
-    
-    shuffled_questions = []
-    for q in questions:
-        if q.question_type in [Question.QuestionType.SINGLE_CHOICE, Question.QuestionType.MULTIPLE_CHOICE, Question.QuestionType.TRUE_FALSE]:
-            # Xáo trộn đáp án cho câu hỏi có lựa chọn
-            answers = list(q.answers.all())
-            random.shuffle(answers)
-            shuffled_questions.append({
-                'question': q, 
-                'answers': answers,
-                'question_type': q.question_type
-            })
-        else:
-            # Câu hỏi tự luận - không có đáp án để xáo trộn
-            shuffled_questions.append({
-                'question': q,
-                'answers': [],
-                'question_type': q.question_type
-            })
+    # Đề luyện tập: xáo theo seed (đề, học sinh, lần luyện tập)
+    attempt = PracticeResult.objects.filter(quiz=quiz, student=request.user).count() + 1
+    shuffled_questions = render_paper(quiz, request.user, attempt)
+    questions = [item['question'] for item in shuffled_questions]
 
     context = {
         'quiz': quiz,
@@ -973,101 +1123,6 @@ def practice_random(request):
         messages.info(request, "Hiện không có đề thi nào để luyện tập.")
         return redirect('quiz:practice_selection')
 
-# ===========================================================================
-# HÀM HỖ TRỢ TÍNH ĐIỂM CHO LUYỆN TẬP
-# ===========================================================================
-
-def calculate_practice_score(request, quiz):
-    """Tính điểm cho bài luyện tập"""
-    score = 0
-    total_questions = quiz.questions.count()
-    
-    if total_questions == 0:
-        return 0
-    
-    for question in quiz.questions.all():
-        if is_answer_correct(request, question):
-            score += 1
-    
-    return round((score / total_questions) * 100, 2)
-
-def get_practice_detailed_answers(request, quiz):
-    """Lấy chi tiết câu trả lời cho kết quả luyện tập"""
-    detailed_answers = []
-    
-    for question in quiz.questions.all():
-        student_answer = get_student_answer_from_request(request, question)
-        is_correct = is_answer_correct(request, question)
-        
-        detailed_answers.append({
-            'question': question,
-            'student_answer': student_answer,
-            'is_correct': is_correct,
-            'is_short_answer': question.question_type == Question.QuestionType.SHORT_ANSWER,
-            'student_answer_text': student_answer.text if student_answer else request.POST.get(f'question_{question.id}', ''),
-            'correct_answer_text': question.correct_answer_text if question.question_type == Question.QuestionType.SHORT_ANSWER else '',
-            'correct_answer': get_correct_answer(question),
-            'all_answers': question.answers.all() if question.question_type != Question.QuestionType.SHORT_ANSWER else [],
-        })
-    
-    return detailed_answers
-
-def is_answer_correct(request, question):
-    """Kiểm tra câu trả lời có đúng không"""
-    if question.question_type == Question.QuestionType.SHORT_ANSWER:
-        # Với câu tự luận, luôn tính là đúng trong luyện tập (hoặc có thể bỏ qua)
-        return True
-    elif question.question_type == Question.QuestionType.SINGLE_CHOICE:
-        selected_answer_id = request.POST.get(f'question_{question.id}')
-        if selected_answer_id:
-            try:
-                selected_answer = Answer.objects.get(id=selected_answer_id)
-                return selected_answer.is_correct
-            except Answer.DoesNotExist:
-                return False
-        return False
-    elif question.question_type == Question.QuestionType.MULTIPLE_CHOICE:
-        selected_ids = request.POST.getlist(f'question_{question.id}')
-        correct_answers = question.answers.filter(is_correct=True)
-        selected_correct = Answer.objects.filter(id__in=selected_ids, is_correct=True)
-        return selected_correct.count() == correct_answers.count() and len(selected_ids) == correct_answers.count()
-    elif question.question_type == Question.QuestionType.TRUE_FALSE:
-        selected_answer_id = request.POST.get(f'question_{question.id}')
-        if selected_answer_id:
-            try:
-                selected_answer = Answer.objects.get(id=selected_answer_id)
-                return selected_answer.is_correct
-            except Answer.DoesNotExist:
-                return False
-        return False
-    return False
-
-def get_student_answer_from_request(request, question):
-    """Lấy câu trả lời của học sinh từ request"""
-    if question.question_type == Question.QuestionType.SINGLE_CHOICE:
-        answer_id = request.POST.get(f'question_{question.id}')
-        if answer_id:
-            return Answer.objects.filter(id=answer_id).first()
-    elif question.question_type == Question.QuestionType.MULTIPLE_CHOICE:
-        # Trả về answer đầu tiên được chọn (cho đơn giản)
-        answer_ids = request.POST.getlist(f'question_{question.id}')
-        if answer_ids:
-            return Answer.objects.filter(id=answer_ids[0]).first()
-    elif question.question_type == Question.QuestionType.TRUE_FALSE:
-        answer_id = request.POST.get(f'question_{question.id}')
-        if answer_id:
-            return Answer.objects.filter(id=answer_id).first()
-    return None
-
-def get_correct_answer(question):
-    """Lấy đáp án đúng của câu hỏi"""
-    if question.question_type == Question.QuestionType.SINGLE_CHOICE:
-        return question.answers.filter(is_correct=True).first()
-    elif question.question_type == Question.QuestionType.MULTIPLE_CHOICE:
-        return question.answers.filter(is_correct=True).first()  # Trả về 1 đáp án đúng
-    elif question.question_type == Question.QuestionType.TRUE_FALSE:
-        return question.answers.filter(is_correct=True).first()
-    return None
 @teacher_required
 def grading_dashboard(request):
     """Dashboard chấm điểm cho giáo viên"""
@@ -1109,6 +1164,8 @@ def grade_short_answer(request, result_id):
         total_points = 0
         short_answer_count = 0
         
+        graded_answers = []
+        
         # Xử lý điểm cho từng câu hỏi tự luận
         for student_answer in result.student_answers.filter(question__question_type='SHORT_ANSWER'):
             points_field = f"points_{student_answer.id}"
@@ -1123,6 +1180,7 @@ def grade_short_answer(request, result_id):
                     student_answer.points_earned = points
                     student_answer.teacher_comment = comment
                     student_answer.save()
+                    graded_answers.append(student_answer)
                     
                     total_points += points
                     short_answer_count += 1
@@ -1135,6 +1193,7 @@ def grade_short_answer(request, result_id):
         result.is_graded = True
         result.teacher_feedback = request.POST.get('overall_feedback', '')
         result.save()
+        update_short_answer_review(result, graded_answers)
         
         messages.success(request, f'Đã chấm điểm {short_answer_count} câu tự luận! Tổng điểm tự luận: {total_points}')
         return redirect('quiz:grading_dashboard')
@@ -1162,8 +1221,9 @@ def settings_page(request):
     if user.role == 'TEACHER':
         total_questions = Question.objects.filter(created_by=user).count()
         total_quizzes = Quiz.objects.filter(created_by=user).count()
-        total_attempts = Result.objects.filter(quiz__created_by=user).count()
-        avg_score = Result.objects.filter(quiz__created_by=user).aggregate(Avg('score'))['score__avg'] or 0
+        totals = teacher_totals(user)
+        total_attempts = totals['total_attempts']
+        avg_score = totals['average_score']
         
         context = {
             'user': user,
@@ -1379,11 +1439,8 @@ def contact_admin(request):
     """Liên hệ với quản trị viên"""
     user = request.user
     
-    # Tính số ticket đang mở của user
-    open_tickets_count = SupportTicket.objects.filter(
-        user=user,
-        status='OPEN'
-    ).count()
+    # Số ticket đang mở của user (bộ đếm trong cache, xem quiz/counters.py)
+    open_tickets_count = get_counters(user)['open_tickets']
     
     # Tính ID ticket tiếp theo
     last_ticket = SupportTicket.objects.order_by('-id').first()
@@ -1424,10 +1481,13 @@ def contact_admin(request):
 
 # quiz/views.py
 
+# Số tin nhắn mỗi trang của luồng trao đổi
+TICKET_THREAD_PAGE_SIZE = 20
+
 @login_required
 def support_ticket_detail(request, ticket_id):
     """Xem chi tiết ticket hỗ trợ"""
-    ticket = get_object_or_404(SupportTicket, id=ticket_id)
+    ticket = get_object_or_404(SupportTicket.objects.select_related('user', 'teacher', 'admin', 'quiz'), id=ticket_id)
     user = request.user
     
     # --- SỬA LẠI LOGIC KIỂM TRA QUYỀN (QUAN TRỌNG) ---
@@ -1449,39 +1509,53 @@ def support_ticket_detail(request, ticket_id):
     # Đánh dấu là đã đọc (Nếu người xem là người xử lý)
     if (is_assigned_teacher or is_admin) and not ticket.is_read:
         ticket.is_read = True
-        ticket.save()
+        ticket.save(update_fields=['is_read'])
     
     if request.method == 'POST':
-        # Logic phản hồi (Giữ nguyên hoặc tinh chỉnh)
         response = request.POST.get('response', '').strip()
         new_status = request.POST.get('status')
         
-        if response:
-            # Nếu là người xử lý (GV hoặc Admin) -> Cập nhật admin_response
+        if response and (is_assigned_teacher or is_admin or is_owner):
+            # Mỗi phản hồi / tin bổ sung là 1 dòng TicketMessage (chỉ INSERT, không ghi lại nội dung cũ)
+            now = timezone.now()
+            TicketMessage.objects.create(ticket=ticket, author=user, body=response, created_at=now)
+            
+            # Người xử lý (GV hoặc Admin) -> phản hồi chính thức
             if is_assigned_teacher or is_admin:
-                ticket.admin_response = response
                 ticket.replied_by = user
-                ticket.replied_at = timezone.now()
-                if new_status:
+                ticket.replied_at = now
+                if new_status in SupportTicket.Status.values:
                     ticket.status = new_status
-                ticket.save()
+                ticket.save(update_fields=['replied_by', 'replied_at', 'status', 'updated_at'])
                 messages.success(request, "Đã gửi phản hồi!")
             
-            # Nếu là người tạo ticket (HS hoặc GV gửi lên Admin) -> Chat thêm
-            elif is_owner:
-                # Nối thêm tin nhắn vào nội dung cũ (Chat nối tiếp)
-                timestamp = timezone.now().strftime('%d/%m %H:%M')
-                ticket.message += f"\n\n--- Bổ sung từ {user.username} ({timestamp}) ---\n{response}"
-                # Đổi trạng thái lại thành Open hoặc In Progress để Admin biết
+            # Người tạo ticket (HS hoặc GV gửi lên Admin) -> tin nhắn bổ sung
+            else:
+                # Mở lại yêu cầu đã xong và báo chưa đọc để người xử lý biết
                 if ticket.status in ['RESOLVED', 'CLOSED']:
                     ticket.status = 'IN_PROGRESS'
-                ticket.save()
+                ticket.is_read = False
+                ticket.save(update_fields=['status', 'is_read', 'updated_at'])
                 messages.success(request, "Đã gửi tin nhắn bổ sung!")
                 
         return redirect('quiz:support_ticket_detail', ticket_id=ticket.id)
     
+    # Luồng tin nhắn: phân trang keyset theo (created_at, id), mặc định trang mới nhất
+    thread_params = request.GET if ('after' in request.GET or 'before' in request.GET) else {'last': 1}
+    thread = keyset_page(
+        ticket.messages.select_related('author'), thread_params, TICKET_THREAD_PAGE_SIZE,
+        ordering=('created_at', 'id'),
+    )
+    
+    # Đánh dấu đã xem các tin nhắn của phía bên kia đang hiển thị
+    unread_ids = [message.id for message in thread if message.read_at is None and message.author_id != user.id]
+    if unread_ids:
+        TicketMessage.objects.filter(id__in=unread_ids).update(read_at=timezone.now())
+    
     context = {
         'ticket': ticket,
+        'thread': thread,
+        'message_count': ticket.messages.count(),
         'can_reply': (is_assigned_teacher or is_admin), # Chỉ người xử lý mới hiện form trả lời chính thức
         'is_owner': is_owner,
         'is_admin': is_admin,
@@ -1523,12 +1597,13 @@ def update_ticket_status(request, ticket_id):
         if hasattr(ticket, 'status_history'):
             ticket.status_history = f"{ticket.status_history or ''}\n{timezone.now().strftime('%d/%m/%Y %H:%M')} - {user.username} cập nhật từ {old_status_display} thành {ticket.get_status_display()}"
         
-        # Nếu là admin và có comment, thêm vào admin_response
+        # Nếu là admin và có comment, thêm vào luồng tin nhắn
         admin_comment = request.POST.get('admin_comment', '').strip()
         if admin_comment and user.role == 'ADMIN':
-            ticket.admin_response = f"{ticket.admin_response or ''}\n\n--- Cập nhật trạng thái ({timezone.now().strftime('%d/%m/%Y %H:%M')}) ---\n{admin_comment}"
+            now = timezone.now()
+            TicketMessage.objects.create(ticket=ticket, author=user, body=admin_comment, created_at=now)
             ticket.replied_by = user
-            ticket.replied_at = timezone.now()
+            ticket.replied_at = now
             ticket.is_read = False
         
         ticket.save()
@@ -1553,13 +1628,10 @@ def my_support_tickets(request):
     if ticket_type_filter:
         tickets = tickets.filter(ticket_type=ticket_type_filter)
     
-    # Thêm search
+    # Tìm kiếm full-text không dấu (tiêu đề, nội dung, tin nhắn), xem support/search.py
     search_query = request.GET.get('search')
     if search_query:
-        tickets = tickets.filter(
-            Q(subject__icontains=search_query) | 
-            Q(message__icontains=search_query)
-        )
+        tickets = search_tickets(tickets, search_query)
     
     # Pagination
     paginator = Paginator(tickets, 10)
@@ -1589,39 +1661,25 @@ def teacher_support_inbox(request):
     if status_filter:
         tickets = tickets.filter(status=status_filter)
     
-    # Tìm kiếm
+    # Tìm kiếm full-text không dấu (tiêu đề, nội dung, tin nhắn, tên / email người gửi)
     search_query = request.GET.get('search')
     if search_query:
-        tickets = tickets.filter(
-            models.Q(subject__icontains=search_query) | 
-            models.Q(message__icontains=search_query) |
-            models.Q(user__username__icontains=search_query) |
-            models.Q(user__first_name__icontains=search_query) |
-            models.Q(user__last_name__icontains=search_query) |
-            models.Q(user__email__icontains=search_query)
-        )
+        tickets = search_tickets(tickets, search_query)
     
     # Thêm filter theo loại ticket
     ticket_type_filter = request.GET.get('ticket_type')
     if ticket_type_filter:
         tickets = tickets.filter(ticket_type=ticket_type_filter)
     
-    # Thống kê (phải tính trên tất cả tickets trước khi phân trang)
-    total_tickets = tickets.count()
-    open_tickets = tickets.filter(status='OPEN').count()
-    in_progress_tickets = tickets.filter(status='IN_PROGRESS').count()
-    resolved_tickets = tickets.filter(status='RESOLVED').count()
-    unread_tickets = tickets.filter(is_read=False).count()
-    
-    # Phân loại theo loại ticket (thống kê toàn bộ)
-    ticket_type_stats = {}
-    for ticket_type, display_name in SupportTicket.TicketType.choices:
-        count = tickets.filter(ticket_type=ticket_type).count()
-        if count > 0:
-            ticket_type_stats[display_name] = count
+    # Thống kê (tính trên tất cả tickets đã lọc, trước khi phân trang): 1 truy vấn GROUP BY, cache ngắn hạn
+    stats = get_ticket_stats(
+        f'teacher:{teacher.pk}',
+        {'status': status_filter, 'search': search_query, 'ticket_type': ticket_type_filter},
+        tickets,
+    )
     
     # Pagination (QUAN TRỌNG: phải làm sau khi filter)
-    paginator = Paginator(tickets, 10)
+    paginator = Paginator(tickets.select_related('user', 'quiz'), 10)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
@@ -1629,13 +1687,13 @@ def teacher_support_inbox(request):
         'tickets': page_obj,  # Giữ để tương thích
         'page_obj': page_obj,
         'is_paginated': page_obj.has_other_pages(),
-        'total_tickets': total_tickets,
-        'open_tickets': open_tickets,
-        'in_progress_tickets': in_progress_tickets,
-        'resolved_tickets': resolved_tickets,
-        'unread_tickets': unread_tickets,
+        'total_tickets': stats['total'],
+        'open_tickets': stats['status']['OPEN'],
+        'in_progress_tickets': stats['status']['IN_PROGRESS'],
+        'resolved_tickets': stats['status']['RESOLVED'],
+        'unread_tickets': stats['unread'],
         'ticket_types': SupportTicket.TicketType.choices,
-        'ticket_type_stats': ticket_type_stats,
+        'ticket_type_stats': type_stats(stats),
         'teacher': teacher,
     }
     return render(request, 'support/teacher_inbox.html', context)
@@ -1653,61 +1711,64 @@ def admin_support_dashboard(request):
     if status_filter:
         tickets = tickets.filter(status=status_filter)
     
-    # Tìm kiếm
+    # Tìm kiếm full-text không dấu (tiêu đề, nội dung, tin nhắn, tên / email người gửi)
     search_query = request.GET.get('search')
     if search_query:
-        tickets = tickets.filter(
-            Q(subject__icontains=search_query) | 
-            Q(message__icontains=search_query) |
-            Q(user__username__icontains=search_query)
-        )
+        tickets = search_tickets(tickets, search_query)
     
-    # Thống kê
-    total_tickets = tickets.count()
-    open_tickets = tickets.filter(status='OPEN').count()
-    in_progress_tickets = tickets.filter(status='IN_PROGRESS').count()
-    resolved_tickets = tickets.filter(status='RESOLVED').count()
-    closed_tickets = tickets.filter(status='CLOSED').count()
-    
-    # Phân loại theo loại yêu cầu
-    ticket_types_stats = {}
-    for ticket_type, display_name in SupportTicket.TicketType.choices:
-        count = tickets.filter(ticket_type=ticket_type).count()
-        if count > 0:
-            ticket_types_stats[display_name] = count
-    
-    # Phân loại theo giáo viên (nếu có)
-    teacher_tickets = {}
-    teacher_tickets_data = tickets.filter(teacher__isnull=False).values('teacher__username').annotate(count=Count('id'))
-    for item in teacher_tickets_data:
-        teacher_tickets[item['teacher__username']] = item['count']
-    
-    # Phân loại theo học sinh
-    student_tickets = {}
-    student_tickets_data = tickets.values('user__username').annotate(count=Count('id')).order_by('-count')[:10]
-    for item in student_tickets_data:
-        student_tickets[item['user__username']] = item['count']
+    # Thống kê theo trạng thái / loại / giáo viên (1 truy vấn GROUP BY) + top học sinh (1 truy vấn),
+    # cache ngắn hạn theo bộ lọc
+    stats = get_ticket_stats(
+        'admin', {'status': status_filter, 'search': search_query}, tickets,
+        by_teacher=True, top_students=TOP_STUDENTS,
+    )
     
-    # Pagination
-    paginator = Paginator(tickets, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Phân trang keyset theo (created_at, id): không COUNT lại, trang sâu không OFFSET
+    page_obj = keyset_page(tickets.select_related('user'), request.GET, 20)
+    filter_params = request.GET.copy()
+    for key in ('after', 'before', 'last', 'page'):
+        filter_params.pop(key, None)
     
     context = {
         'tickets': page_obj,
         'page_obj': page_obj,
-        'is_paginated': page_obj.has_other_pages(),
-        'total_tickets': total_tickets,
-        'open_tickets': open_tickets,
-        'in_progress_tickets': in_progress_tickets,
-        'resolved_tickets': resolved_tickets,
-        'closed_tickets': closed_tickets,
-        'ticket_types_stats': ticket_types_stats,
-        'teacher_tickets': teacher_tickets,
-        'student_tickets': student_tickets,
+        'is_paginated': page_obj.has_other_pages,
+        'filter_query': filter_params.urlencode(),
+        'stats': {
+            'total': stats['total'],
+            'open': stats['status']['OPEN'],
+            'processing': stats['status']['IN_PROGRESS'],
+            'resolved': stats['status']['RESOLVED'],
+            'closed': stats['status']['CLOSED'],
+        },
+        'total_tickets': stats['total'],
+        'open_tickets': stats['status']['OPEN'],
+        'in_progress_tickets': stats['status']['IN_PROGRESS'],
+        'resolved_tickets': stats['status']['RESOLVED'],
+        'closed_tickets': stats['status']['CLOSED'],
+        'ticket_types_stats': type_stats(stats),
+        'teacher_tickets': stats['teachers'],
+        'student_tickets': stats['students'],
         'user': user,
     }
     return render(request, 'support/admin_dashboard.html', context)
+
+
+@login_required
+async def notification_stream(request):
+    """Server-sent events: số yêu cầu hỗ trợ chưa đọc / bài chờ chấm, đẩy mỗi khi thay đổi (GV và admin)"""
+    user = await request.auser()
+    if user.role not in NOTIFIED_ROLES:
+        raise PermissionDenied
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(counter_events(user), content_type='text/event-stream')
+    else:
+        # WSGI không giữ được kết nối: gửi 1 bản, trình duyệt tự kết nối lại
+        response = HttpResponse(await sync_to_async(counter_snapshot)(user), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Không để nginx gom dữ liệu trước khi gửi
+    response['X-Accel-Buffering'] = 'no'
+    return response
 # ===========================================================================
 # VIEWS KHÁM PHÁ ĐỀ THI
 # ===========================================================================
@@ -1715,8 +1776,8 @@ def admin_support_dashboard(request):
 @login_required
 def explore(request):
     """Trang khám phá đề thi"""
-    # 1. Lấy tất cả môn học
-    subjects = Subject.objects.all()
+    # 1. Lấy tất cả môn học (cache)
+    subjects = get_subjects()
     
     # 2. Lấy các đề thi CÔNG KHAI và ĐANG MỞ
     now = timezone.now()
@@ -0,0 +1,118 @@
+# quiz/visibility.py
+
+# ===========================================================================
+# DANH SÁCH ĐỀ HIỂN THỊ TRÊN DASHBOARD & HỌC SINH ĐƯỢC PHÉP THI (CACHE)
+# ===========================================================================
+
+from datetime import datetime
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Quiz
+
+# Lịch đề thi được xoá khi đề thay đổi (xem quiz/signals.py), TTL chỉ để phòng hờ
+SCHEDULE_TIMEOUT = 60 * 5
+ALLOWED_STUDENTS_TIMEOUT = 60 * 60 * 24
+
+SCHEDULE_CACHE_KEY = 'quiz:schedule'
+
+
+class QuizCard(NamedTuple):
+    """Thông tin đề thi hiển thị trên dashboard học sinh"""
+    id: int
+    title: str
+    subject_name: str
+    duration_minutes: int
+    question_count: int
+    start_time: datetime
+    end_time: datetime
+    is_public: bool
+
+    def is_open(self, now):
+        return self.start_time <= now <= self.end_time
+
+
+def build_quiz_schedule():
+    """Tất cả đề chưa kết thúc (đang mở hoặc sắp mở), 1 truy vấn"""
+    quizzes = (
+        Quiz.objects.filter(end_time__gte=timezone.now())
+        .select_related('subject')
+        .annotate(question_count=Count('questions'))
+        .order_by('start_time', 'id')
+    )
+    return tuple(
+        QuizCard(
+            id=quiz.id,
+            title=quiz.title,
+            subject_name=quiz.subject.name,
+            duration_minutes=quiz.duration_minutes,
+            # Đề bốc ngẫu nhiên: mỗi học sinh làm pool_size câu
+            question_count=min(quiz.pool_size, quiz.question_count) if quiz.pool_size else quiz.question_count,
+            start_time=quiz.start_time,
+            end_time=quiz.end_time,
+            is_public=quiz.is_public,
+        )
+        for quiz in quizzes
+    )
+
+
+def get_quiz_schedule(refresh=False):
+    """Lấy lịch đề thi (từ cache, tải lại nếu chưa có hoặc refresh=True)"""
+    schedule = None if refresh else cache.get(SCHEDULE_CACHE_KEY)
+    if schedule is None:
+        schedule = build_quiz_schedule()
+        cache.set(SCHEDULE_CACHE_KEY, schedule, SCHEDULE_TIMEOUT)
+    return schedule
+
+
+def invalidate_quiz_schedule():
+    cache.delete(SCHEDULE_CACHE_KEY)
+
+
+def _allowed_cache_key(quiz_id):
+    return f'quiz:{quiz_id}:allowed_students'
+
+
+def get_allowed_student_ids(quiz, refresh=False):
+    """Tập id học sinh được phép thi đề riêng tư (từ cache)"""
+    quiz_id = quiz.pk if isinstance(quiz, Quiz) else quiz
+    student_ids = None if refresh else cache.get(_allowed_cache_key(quiz_id))
+    if student_ids is None:
+        student_ids = frozenset(
+            Quiz.allowed_students.through.objects.filter(quiz_id=quiz_id).values_list('user_id', flat=True)
+        )
+        cache.set(_allowed_cache_key(quiz_id), student_ids, ALLOWED_STUDENTS_TIMEOUT)
+    return student_ids
+
+
+def invalidate_allowed_students(quiz_ids):
+    cache.delete_many([_allowed_cache_key(quiz_id) for quiz_id in quiz_ids])
+
+
+def is_student_allowed(quiz, student):
+    return quiz.is_public or student.pk in get_allowed_student_ids(quiz)
+
+
+def visible_quizzes_for(student, now=None):
+    """
+    Các đề đang mở mà học sinh thấy được: đề công khai + đề riêng tư đã tham gia.
+    Đọc lịch đề và danh sách học sinh từ cache (cache.get_many cho các đề riêng tư).
+    """
+    now = now or timezone.now()
+    open_cards = [card for card in get_quiz_schedule() if card.is_open(now)]
+
+    private_ids = [card.id for card in open_cards if not card.is_public]
+    allowed = {}
+    if private_ids:
+        cached = cache.get_many([_allowed_cache_key(quiz_id) for quiz_id in private_ids])
+        for quiz_id in private_ids:
+            student_ids = cached.get(_allowed_cache_key(quiz_id))
+            allowed[quiz_id] = student_ids if student_ids is not None else get_allowed_student_ids(quiz_id)
+
+    return [
+        card for card in open_cards
+        if card.is_public or student.pk in allowed[card.id]
+    ]
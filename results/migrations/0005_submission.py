@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0009_question_explanation'),
+        ('results', '0004_practiceresult'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Submission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.JSONField(verbose_name='Dữ liệu bài làm')),
+                ('status', models.CharField(choices=[('PENDING', 'Đang chờ chấm'), ('PROCESSING', 'Đang chấm'), ('DONE', 'Đã chấm'), ('FAILED', 'Lỗi khi chấm')], default='PENDING', max_length=20, verbose_name='Trạng thái')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Lỗi')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='quiz.quiz')),
+                ('result', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='submission', to='results.result')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'id'], name='results_sub_status_a2b778_idx'), models.Index(fields=['student', 'quiz', 'status'], name='results_sub_student_38933f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0009_question_explanation'),
+        ('results', '0005_submission'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Attempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(default=1, verbose_name='Lần thi')),
+                ('status', models.CharField(choices=[('IN_PROGRESS', 'Đang làm bài'), ('SUBMITTED', 'Đã nộp bài')], default='IN_PROGRESS', max_length=20, verbose_name='Trạng thái')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='Bắt đầu lúc')),
+                ('deadline', models.DateTimeField(verbose_name='Hạn nộp bài')),
+                ('draft', models.JSONField(blank=True, default=dict, verbose_name='Bản nháp')),
+                ('draft_saved_at', models.DateTimeField(blank=True, null=True)),
+                ('submitted_at', models.DateTimeField(blank=True, null=True)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='quiz.quiz')),
+                ('result', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attempt', to='results.result')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='attempt',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='submissions', to='results.attempt'),
+        ),
+        migrations.AddIndex(
+            model_name='attempt',
+            index=models.Index(fields=['student', 'quiz', 'status'], name='results_att_student_00db83_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='attempt',
+            constraint=models.UniqueConstraint(fields=('student', 'quiz', 'number'), name='unique_attempt_number'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0009_question_explanation'),
+        ('results', '0006_attempt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizStats',
+            fields=[
+                ('quiz', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='quiz.quiz')),
+                ('attempt_count', models.PositiveIntegerField(default=0, verbose_name='Số bài nộp')),
+                ('score_sum', models.FloatField(default=0, verbose_name='Tổng điểm')),
+                ('score_sq_sum', models.FloatField(default=0, verbose_name='Tổng bình phương điểm')),
+                ('score_min', models.FloatField(blank=True, null=True, verbose_name='Điểm thấp nhất')),
+                ('score_max', models.FloatField(blank=True, null=True, verbose_name='Điểm cao nhất')),
+                ('bucket_0', models.PositiveIntegerField(default=0)),
+                ('bucket_1', models.PositiveIntegerField(default=0)),
+                ('bucket_2', models.PositiveIntegerField(default=0)),
+                ('bucket_3', models.PositiveIntegerField(default=0)),
+                ('bucket_4', models.PositiveIntegerField(default=0)),
+                ('bucket_5', models.PositiveIntegerField(default=0)),
+                ('bucket_6', models.PositiveIntegerField(default=0)),
+                ('bucket_7', models.PositiveIntegerField(default=0)),
+                ('bucket_8', models.PositiveIntegerField(default=0)),
+                ('bucket_9', models.PositiveIntegerField(default=0)),
+                ('correct_answers', models.PositiveIntegerField(default=0, verbose_name='Số câu trả lời đúng')),
+                ('total_answers', models.PositiveIntegerField(default=0, verbose_name='Số câu trả lời')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Thống kê đề thi',
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_practice_stats(apps, schema_editor):
+    """Tính PracticeStats từ lịch sử PracticeResult (duyệt theo thời gian, 1 lượt)"""
+    PracticeResult = apps.get_model('results', 'PracticeResult')
+    PracticeStats = apps.get_model('results', 'PracticeStats')
+
+    stats = {}
+    history = PracticeResult.objects.order_by('completed_at', 'id').values_list(
+        'student_id', 'quiz_id', 'score', 'completed_at'
+    )
+    for student_id, quiz_id, score, completed_at in history.iterator():
+        row = stats.get((student_id, quiz_id))
+        if row is None:
+            row = stats[(student_id, quiz_id)] = PracticeStats(student_id=student_id, quiz_id=quiz_id)
+        row.average_score = (row.average_score * row.attempt_count + score) / (row.attempt_count + 1)
+        row.attempt_count += 1
+        row.best_score = score if row.best_score is None else max(row.best_score, score)
+        row.previous_score, row.previous_practiced_at = row.last_score, row.last_practiced_at
+        row.last_score, row.last_practiced_at = score, completed_at
+    PracticeStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0009_question_explanation'),
+        ('results', '0007_quizstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PracticeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempt_count', models.PositiveIntegerField(default=0, verbose_name='Số lần luyện tập')),
+                ('best_score', models.FloatField(blank=True, null=True, verbose_name='Điểm cao nhất')),
+                ('last_score', models.FloatField(blank=True, null=True, verbose_name='Điểm lần gần nhất')),
+                ('previous_score', models.FloatField(blank=True, null=True, verbose_name='Điểm lần trước đó')),
+                ('average_score', models.FloatField(default=0, verbose_name='Điểm trung bình')),
+                ('last_practiced_at', models.DateTimeField(blank=True, null=True)),
+                ('previous_practiced_at', models.DateTimeField(blank=True, null=True)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='practice_stats', to='quiz.quiz')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='practice_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student', '-last_practiced_at'], name='results_pra_student_8344ba_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'quiz'), name='unique_practice_stats')],
+            },
+        ),
+        migrations.RunPython(backfill_practice_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0008_practicestats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='result',
+            name='review',
+            field=models.JSONField(blank=True, null=True, verbose_name='Bản chụp bài làm'),
+        ),
+    ]
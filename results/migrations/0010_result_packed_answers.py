@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0009_result_review'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='result',
+            name='packed_answers',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0015_quiz_pool_size'),
+        ('results', '0011_attempt_question_ids'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['is_graded', 'quiz'], name='results_res_is_grad_cdf3cc_idx'),
+        ),
+    ]
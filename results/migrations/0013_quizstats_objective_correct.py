@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 22:20
+
+from django.db import migrations
+from django.db.models import Count, F
+
+
+def exclude_short_answers(apps, schema_editor):
+    """Bỏ các câu tự luận có điểm > 0 khỏi QuizStats.correct_answers (định nghĩa tỉ lệ đúng ban đầu)"""
+    QuizStats = apps.get_model('results', 'QuizStats')
+    StudentAnswer = apps.get_model('results', 'StudentAnswer')
+
+    counts = (
+        StudentAnswer.objects.filter(question__question_type='SHORT_ANSWER', points_earned__gt=0)
+        .values_list('result__quiz_id').annotate(count=Count('id')).order_by()
+    )
+    for quiz_id, count in counts:
+        QuizStats.objects.filter(quiz_id=quiz_id, correct_answers__gte=count).update(
+            correct_answers=F('correct_answers') - count
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0012_result_pending_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(exclude_short_answers, migrations.RunPython.noop),
+    ]
@@ -13,6 +13,16 @@ class Result(models.Model):
     is_graded = models.BooleanField(default=False, verbose_name="Đã được chấm điểm?")
     teacher_feedback = models.TextField(blank=True, null=True, verbose_name="Nhận xét của giáo viên")
     short_answer_score = models.FloatField(default=0, verbose_name="Điểm tự luận")
+    # Bản chụp bài làm (đã chọn / đáp án đúng / đúng-sai từng câu) để hiển thị kết quả, xem quiz/review.py
+    review = models.JSONField(null=True, blank=True, verbose_name="Bản chụp bài làm")
+    # Lựa chọn của các câu có đáp án dạng nén (NULL: kết quả cũ lưu trong StudentAnswer), xem quiz/responses.py
+    packed_answers = models.BinaryField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Đếm / liệt kê bài chờ chấm (quiz/counters.py, grading_dashboard)
+            models.Index(fields=['is_graded', 'quiz']),
+        ]
 
     def __str__(self):
         return f"{self.student.username} - {self.quiz.title}"
@@ -67,4 +77,155 @@ class PracticeResult(models.Model):
         ordering = ['-completed_at']
     
     def __str__(self):
-        return f"{self.student.username} - {self.quiz.title} - {self.score}"
\ No newline at end of file
+        return f"{self.student.username} - {self.quiz.title} - {self.score}"
+
+class Attempt(models.Model):
+    """Lượt làm bài: tạo khi học sinh mở take_quiz, bản nháp được autosave (xem quiz/attempts.py)"""
+    class Status(models.TextChoices):
+        IN_PROGRESS = 'IN_PROGRESS', 'Đang làm bài'
+        SUBMITTED = 'SUBMITTED', 'Đã nộp bài'
+
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='attempts')
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='attempts')
+    number = models.PositiveIntegerField(default=1, verbose_name="Lần thi")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.IN_PROGRESS, verbose_name="Trạng thái")
+    started_at = models.DateTimeField(auto_now_add=True, verbose_name="Bắt đầu lúc")
+    deadline = models.DateTimeField(verbose_name="Hạn nộp bài")
+    draft = models.JSONField(default=dict, blank=True, verbose_name="Bản nháp")
+    draft_saved_at = models.DateTimeField(null=True, blank=True)
+    submitted_at = models.DateTimeField(null=True, blank=True)
+    result = models.OneToOneField(Result, on_delete=models.SET_NULL, null=True, blank=True, related_name='attempt')
+    # Các câu học sinh nhận được khi đề bốc ngẫu nhiên (Quiz.pool_size): mảng uint32 id câu hỏi,
+    # NULL = toàn bộ câu của đề (xem quiz/attempts.py)
+    question_ids = models.BinaryField(null=True, blank=True, editable=False)
+
+    class Meta:
+        ordering = ['-started_at']
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'quiz', 'number'], name='unique_attempt_number'),
+        ]
+        indexes = [models.Index(fields=['student', 'quiz', 'status'])]
+
+    def __str__(self):
+        return f"{self.student.username} - {self.quiz.title} (lần {self.number})"
+
+
+class Submission(models.Model):
+    """Hộp thư bài nộp: lưu nguyên dữ liệu POST, worker chấm điểm sau (manage.py grade_submissions)"""
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Đang chờ chấm'
+        PROCESSING = 'PROCESSING', 'Đang chấm'
+        DONE = 'DONE', 'Đã chấm'
+        FAILED = 'FAILED', 'Lỗi khi chấm'
+
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='submissions')
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='submissions')
+    payload = models.JSONField(verbose_name="Dữ liệu bài làm")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING, verbose_name="Trạng thái")
+    attempt = models.ForeignKey(Attempt, on_delete=models.SET_NULL, null=True, blank=True, related_name='submissions')
+    result = models.OneToOneField(Result, on_delete=models.SET_NULL, null=True, blank=True, related_name='submission')
+    error = models.TextField(blank=True, null=True, verbose_name="Lỗi")
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Lúc được nhận để chấm (lease: bài PROCESSING quá QUIZ_GRADING_LEASE_SECONDS được nhận lại)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id']),
+            models.Index(fields=['student', 'quiz', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.student.username} - {self.quiz.title} ({self.get_status_display()})"
+
+
+class QuizStats(models.Model):
+    """
+    Thống kê cộng dồn của một đề thi (1 dòng / đề), cập nhật bằng F() mỗi khi có kết quả mới
+    hoặc chấm lại (xem quiz/stats.py). Dựng lại từ đầu: manage.py rebuild_quiz_stats
+    """
+    # Histogram điểm: 10 khoảng cố định 0-10, 10-20, ..., 90-100 (điểm 100 thuộc khoảng cuối)
+    HISTOGRAM_BUCKETS = 10
+
+    quiz = models.OneToOneField(Quiz, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    attempt_count = models.PositiveIntegerField(default=0, verbose_name="Số bài nộp")
+    score_sum = models.FloatField(default=0, verbose_name="Tổng điểm")
+    score_sq_sum = models.FloatField(default=0, verbose_name="Tổng bình phương điểm")
+    score_min = models.FloatField(null=True, blank=True, verbose_name="Điểm thấp nhất")
+    score_max = models.FloatField(null=True, blank=True, verbose_name="Điểm cao nhất")
+    bucket_0 = models.PositiveIntegerField(default=0)
+    bucket_1 = models.PositiveIntegerField(default=0)
+    bucket_2 = models.PositiveIntegerField(default=0)
+    bucket_3 = models.PositiveIntegerField(default=0)
+    bucket_4 = models.PositiveIntegerField(default=0)
+    bucket_5 = models.PositiveIntegerField(default=0)
+    bucket_6 = models.PositiveIntegerField(default=0)
+    bucket_7 = models.PositiveIntegerField(default=0)
+    bucket_8 = models.PositiveIntegerField(default=0)
+    bucket_9 = models.PositiveIntegerField(default=0)
+    # Lựa chọn trắc nghiệm đúng; câu tự luận chỉ tính vào total_answers (xem quiz/stats.CORRECT_ANSWER_FILTER)
+    correct_answers = models.PositiveIntegerField(default=0, verbose_name="Số câu trả lời đúng")
+    total_answers = models.PositiveIntegerField(default=0, verbose_name="Số câu trả lời")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Thống kê đề thi"
+
+    def __str__(self):
+        return f"Thống kê {self.quiz.title}"
+
+    @classmethod
+    def bucket_for(cls, score):
+        return min(max(int(score // 10), 0), cls.HISTOGRAM_BUCKETS - 1)
+
+    @property
+    def average_score(self):
+        return self.score_sum / self.attempt_count if self.attempt_count else 0
+
+    @property
+    def score_stddev(self):
+        if not self.attempt_count:
+            return 0
+        variance = self.score_sq_sum / self.attempt_count - self.average_score ** 2
+        return max(variance, 0) ** 0.5
+
+    @property
+    def correct_rate(self):
+        return self.correct_answers / self.total_answers * 100 if self.total_answers else 0
+
+    @property
+    def histogram(self):
+        """[(nhãn khoảng, số bài, % so với khoảng nhiều nhất)] để vẽ biểu đồ cột"""
+        counts = [getattr(self, f'bucket_{i}') for i in range(self.HISTOGRAM_BUCKETS)]
+        peak = max(counts) or 1
+        return [
+            (f'{i * 10}-{i * 10 + 10}', count, round(count / peak * 100))
+            for i, count in enumerate(counts)
+        ]
+
+
+class PracticeStats(models.Model):
+    """
+    Thống kê luyện tập của một học sinh trên một đề (1 dòng / cặp học sinh-đề),
+    cập nhật bằng F() mỗi lần nộp bài luyện tập (xem quiz/stats.py)
+    """
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='practice_stats')
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='practice_stats')
+    attempt_count = models.PositiveIntegerField(default=0, verbose_name="Số lần luyện tập")
+    best_score = models.FloatField(null=True, blank=True, verbose_name="Điểm cao nhất")
+    last_score = models.FloatField(null=True, blank=True, verbose_name="Điểm lần gần nhất")
+    previous_score = models.FloatField(null=True, blank=True, verbose_name="Điểm lần trước đó")
+    average_score = models.FloatField(default=0, verbose_name="Điểm trung bình")
+    last_practiced_at = models.DateTimeField(null=True, blank=True)
+    previous_practiced_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'quiz'], name='unique_practice_stats'),
+        ]
+        indexes = [models.Index(fields=['student', '-last_practiced_at'])]
+
+    def __str__(self):
+        return f"{self.student.username} - {self.quiz.title} ({self.attempt_count} lần)"
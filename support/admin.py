@@ -1,5 +1,14 @@
 from django.contrib import admin
-from .models import SupportTicket
+from .models import SupportTicket, TicketMessage
+
+
+class TicketMessageInline(admin.TabularInline):
+    model = TicketMessage
+    extra = 0
+    fields = ['author', 'body', 'created_at', 'read_at']
+    readonly_fields = ['read_at']
+    raw_id_fields = ['author']
+
 
 @admin.register(SupportTicket)
 class SupportTicketAdmin(admin.ModelAdmin):
@@ -7,15 +16,16 @@ class SupportTicketAdmin(admin.ModelAdmin):
     list_filter = ['status', 'ticket_type', 'created_at']
     search_fields = ['subject', 'message', 'user__username', 'user__email']
     readonly_fields = ['created_at', 'updated_at']
+    inlines = [TicketMessageInline]
     fieldsets = (
         ('Thông tin yêu cầu', {
             'fields': ('user', 'teacher', 'quiz', 'ticket_type', 'subject', 'message')
         }),
         ('Phản hồi', {
-            'fields': ('admin', 'admin_response', 'status')
+            'fields': ('admin', 'status')
         }),
         ('Thông tin hệ thống', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
@@ -5,4 +5,4 @@ class SupportConfig(AppConfig):
     name = 'support'
     
     def ready(self):
-        pass  # Thay bằng pass
\ No newline at end of file
+        from . import signals  # noqa: F401
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0015_quiz_pool_size'),
+        ('support', '0002_supportticket_is_read_supportticket_replied_at_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='supportticket',
+            index=models.Index(fields=['teacher', 'status', 'created_at'], name='support_sup_teacher_ef3382_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supportticket',
+            index=models.Index(fields=['user', 'created_at'], name='support_sup_user_id_2e68d8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supportticket',
+            index=models.Index(fields=['status', 'created_at'], name='support_sup_status_eeda74_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supportticket',
+            index=models.Index(fields=['teacher', 'status', 'ticket_type', 'is_read'], name='support_sup_teacher_a39a9a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supportticket',
+            index=models.Index(fields=['status', 'ticket_type', 'is_read', 'teacher'], name='support_sup_status_e62ac7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supportticket',
+            index=models.Index(fields=['status', 'user'], name='support_sup_status_d608a2_idx'),
+        ),
+    ]
@@ -0,0 +1,141 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:00
+
+import re
+from datetime import datetime, timezone as dt_timezone
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+# Định dạng cũ (thời gian ghi bằng timezone.now().strftime, tức giờ UTC):
+#   message        += "\n\n--- Bổ sung từ <username> (dd/mm HH:MM) ---\n<nội dung>"
+#   admin_response  = "<phản hồi>" rồi += "\n\n--- Cập nhật trạng thái (dd/mm/YYYY HH:MM) ---\n<ghi chú>"
+FOLLOW_UP_RE = re.compile(r'\n\n--- Bổ sung từ (.+?) \((\d{2}/\d{2} \d{2}:\d{2})\) ---\n')
+STATUS_NOTE_RE = re.compile(r'\n\n--- Cập nhật trạng thái \((\d{2}/\d{2}/\d{4} \d{2}:\d{2})\) ---\n')
+
+BATCH_SIZE = 500
+
+
+def _utc(text, fmt):
+    try:
+        return datetime.strptime(text, fmt).replace(tzinfo=dt_timezone.utc)
+    except ValueError:
+        return None
+
+
+def _split_ticket(ticket, user_ids):
+    """(nội dung ban đầu, [(author_id, created_at, body)]) từ các khối message / admin_response"""
+    original, *parts = FOLLOW_UP_RE.split(ticket.message or '')
+    thread = []
+    previous = ticket.created_at
+    for username, stamp, body in zip(parts[0::3], parts[1::3], parts[2::3]):
+        # Mốc thời gian cũ không có năm: lấy năm của mốc trước, sang năm mới nếu bị lùi
+        created_at = _utc(f'{previous.year}/{stamp}', '%Y/%d/%m %H:%M') or previous
+        if created_at < previous.replace(second=0, microsecond=0):
+            created_at = created_at.replace(year=created_at.year + 1)
+        previous = created_at
+        thread.append((user_ids.get(username, ticket.user_id), created_at, body))
+
+    response, *parts = STATUS_NOTE_RE.split(ticket.admin_response or '')
+    notes = [
+        (ticket.replied_by_id, _utc(stamp, '%d/%m/%Y %H:%M') or ticket.updated_at, body)
+        for stamp, body in zip(parts[0::2], parts[1::2])
+    ]
+    if response.strip():
+        # Phản hồi (bị ghi đè mỗi lần trả lời) có trước các ghi chú cập nhật trạng thái nối sau nó
+        created_at = min([ticket.replied_at or ticket.updated_at] + [note[1] for note in notes])
+        thread.append((ticket.replied_by_id, created_at, response))
+    thread.extend(notes)
+    thread.sort(key=lambda item: item[1])
+    return original, thread
+
+
+def split_threads(apps, schema_editor):
+    """Tách các khối văn bản nối dồn thành TicketMessage (theo lô)"""
+    SupportTicket = apps.get_model('support', 'SupportTicket')
+    TicketMessage = apps.get_model('support', 'TicketMessage')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    tickets = SupportTicket.objects.filter(
+        models.Q(message__contains='\n\n--- Bổ sung từ ') | (models.Q(admin_response__isnull=False) & ~models.Q(admin_response=''))
+    ).order_by('id')
+    last_id = 0
+    while True:
+        batch = list(tickets.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            return
+        last_id = batch[-1].id
+        usernames = {username for ticket in batch for username, _ in FOLLOW_UP_RE.findall(ticket.message or '')}
+        user_ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+
+        messages = []
+        for ticket in batch:
+            ticket.message, thread = _split_ticket(ticket, user_ids)
+            if thread and ticket.replied_at is None and any(author != ticket.user_id for author, _, _ in thread):
+                ticket.replied_at = max(created_at for author, created_at, _ in thread if author != ticket.user_id)
+            messages.extend(
+                TicketMessage(ticket=ticket, author_id=author_id, created_at=created_at, body=body, read_at=created_at)
+                for author_id, created_at, body in thread
+            )
+        TicketMessage.objects.bulk_create(messages)
+        SupportTicket.objects.bulk_update(batch, ['message', 'replied_at'])
+
+
+def join_threads(apps, schema_editor):
+    """Ngược lại: nối tin nhắn về message (của người gửi) / admin_response (của người xử lý)"""
+    SupportTicket = apps.get_model('support', 'SupportTicket')
+    TicketMessage = apps.get_model('support', 'TicketMessage')
+
+    ticket_ids = TicketMessage.objects.order_by('ticket_id').values_list('ticket_id', flat=True).distinct()
+    for start in range(0, len(ticket_ids), BATCH_SIZE):
+        batch = list(SupportTicket.objects.filter(id__in=ticket_ids[start:start + BATCH_SIZE]))
+        threads = {}
+        for message in TicketMessage.objects.filter(ticket__in=batch).select_related('author').order_by('created_at', 'id'):
+            threads.setdefault(message.ticket_id, []).append(message)
+        for ticket in batch:
+            responses = []
+            for message in threads.get(ticket.id, ()):
+                stamp = message.created_at.astimezone(dt_timezone.utc)
+                if message.author_id == ticket.user_id:
+                    username = message.author.username
+                    ticket.message += f"\n\n--- Bổ sung từ {username} ({stamp:%d/%m %H:%M}) ---\n{message.body}"
+                elif not responses:
+                    responses.append(message.body)
+                else:
+                    responses.append(f"\n\n--- Cập nhật trạng thái ({stamp:%d/%m/%Y %H:%M}) ---\n{message.body}")
+            ticket.admin_response = ''.join(responses) or None
+        SupportTicket.objects.bulk_update(batch, ['message', 'admin_response'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0003_supportticket_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('body', models.TextField(verbose_name='Nội dung')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Thời gian gửi')),
+                ('read_at', models.DateTimeField(blank=True, null=True, verbose_name='Đã xem lúc')),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ticket_messages', to=settings.AUTH_USER_MODEL, verbose_name='Người gửi')),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='support.supportticket', verbose_name='Yêu cầu hỗ trợ')),
+            ],
+            options={
+                'verbose_name': 'Tin nhắn hỗ trợ',
+                'verbose_name_plural': 'Tin nhắn hỗ trợ',
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['ticket', 'created_at', 'id'], name='support_tic_ticket__148015_idx')],
+            },
+        ),
+        migrations.RunPython(split_threads, join_threads),
+        migrations.RemoveField(
+            model_name='supportticket',
+            name='admin_response',
+        ),
+    ]
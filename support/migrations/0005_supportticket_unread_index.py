@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0015_quiz_pool_size'),
+        ('support', '0004_ticketmessage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='supportticket',
+            index=models.Index(fields=['is_read', 'teacher'], name='support_sup_is_read_8273f4_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-18 21:10
+
+from django.db import migrations, models
+
+from support.search import REQUESTER_FIELDS, build_search_text, drop_search_index, ensure_search_index
+
+
+def backfill_search_text(apps, schema_editor):
+    """Tính search_text cho các yêu cầu đã có (theo lô)"""
+    SupportTicket = apps.get_model('support', 'SupportTicket')
+    TicketMessage = apps.get_model('support', 'TicketMessage')
+
+    last_id = 0
+    while True:
+        tickets = list(
+            SupportTicket.objects.filter(id__gt=last_id).order_by('id')
+            .select_related('user').only('id', 'subject', 'message', *(f'user__{field}' for field in REQUESTER_FIELDS))[:1000]
+        )
+        if not tickets:
+            return
+        last_id = tickets[-1].id
+        bodies = {}
+        for ticket_id, body in (
+            TicketMessage.objects.filter(ticket__in=tickets).order_by('created_at', 'id').values_list('ticket_id', 'body')
+        ):
+            bodies.setdefault(ticket_id, []).append(body)
+        for ticket in tickets:
+            requester = [getattr(ticket.user, field) for field in REQUESTER_FIELDS]
+            ticket.search_text = build_search_text(ticket.subject, ticket.message, requester, bodies.get(ticket.id, ()))
+        SupportTicket.objects.bulk_update(tickets, ['search_text'])
+
+
+def create_search_index(apps, schema_editor):
+    ensure_search_index(schema_editor.connection)
+
+
+def remove_search_index(apps, schema_editor):
+    drop_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0005_supportticket_unread_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supportticket',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, remove_search_index),
+    ]
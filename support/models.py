@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from quiz.models import Quiz
 
 class SupportTicket(models.Model):
@@ -33,8 +34,7 @@ class SupportTicket(models.Model):
     quiz = models.ForeignKey(Quiz, on_delete=models.SET_NULL, null=True, blank=True, 
                             verbose_name="Liên quan đến đề thi")
     
-    # Thông tin phản hồi
-    admin_response = models.TextField(blank=True, null=True, verbose_name="Phản hồi từ quản trị viên")
+    # Thông tin phản hồi (nội dung các phản hồi / tin nhắn bổ sung: TicketMessage)
     admin = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, 
                              related_name='handled_tickets', verbose_name="Người xử lý",
                              limit_choices_to={'role': 'ADMIN'})
@@ -48,15 +48,58 @@ class SupportTicket(models.Model):
                                    null=True, blank=True, verbose_name="Người phản hồi",
                                    related_name='replied_tickets')
     replied_at = models.DateTimeField(null=True, blank=True, verbose_name="Thời gian phản hồi")
+    # Tiêu đề, nội dung, tin nhắn và thông tin người gửi đã bỏ dấu - nguồn của chỉ mục tìm kiếm (support/search.py)
+    search_text = models.TextField(blank=True, default='', editable=False)
     
     class Meta:
         ordering = ['-created_at']
         verbose_name = "Yêu cầu hỗ trợ"
         verbose_name_plural = "Yêu cầu hỗ trợ"
+        indexes = [
+            # Danh sách: hộp thư giáo viên (lọc theo trạng thái), yêu cầu của một người gửi, trang admin lọc theo trạng thái
+            models.Index(fields=['teacher', 'status', 'created_at']),
+            models.Index(fields=['user', 'created_at']),
+            models.Index(fields=['status', 'created_at']),
+            # Thống kê (support/stats.py): GROUP BY chỉ đọc index, không đọc bảng
+            models.Index(fields=['teacher', 'status', 'ticket_type', 'is_read']),
+            models.Index(fields=['status', 'ticket_type', 'is_read', 'teacher']),
+            models.Index(fields=['status', 'user']),
+            # Bộ đếm yêu cầu chưa đọc (quiz/counters.py)
+            models.Index(fields=['is_read', 'teacher']),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.subject} ({self.get_status_display()})"
     
     def get_absolute_url(self):
         from django.urls import reverse
-        return reverse('quiz:support_ticket_detail', kwargs={'ticket_id': self.id})
\ No newline at end of file
+        return reverse('quiz:support_ticket_detail', kwargs={'ticket_id': self.id})
+
+
+class TicketMessage(models.Model):
+    """
+    Một tin nhắn trong luồng trao đổi của yêu cầu hỗ trợ (phản hồi của GV / admin, bổ sung của người gửi).
+    Chỉ thêm, không sửa: mỗi lần trả lời là 1 INSERT thay vì ghi lại cả khối văn bản ngày càng dài.
+    Nội dung ban đầu của yêu cầu vẫn nằm ở SupportTicket.message.
+    """
+    ticket = models.ForeignKey(SupportTicket, on_delete=models.CASCADE, related_name='messages',
+                               verbose_name="Yêu cầu hỗ trợ")
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                               related_name='ticket_messages', verbose_name="Người gửi")
+    body = models.TextField(verbose_name="Nội dung")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Thời gian gửi")
+    # Thời điểm phía bên kia (không phải người gửi tin) xem tin nhắn lần đầu
+    read_at = models.DateTimeField(null=True, blank=True, verbose_name="Đã xem lúc")
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        verbose_name = "Tin nhắn hỗ trợ"
+        verbose_name_plural = "Tin nhắn hỗ trợ"
+        indexes = [
+            # Phân trang keyset luồng tin nhắn của một yêu cầu theo (created_at, id)
+            models.Index(fields=['ticket', 'created_at', 'id']),
+        ]
+
+    def __str__(self):
+        author = self.author.username if self.author else '?'
+        return f"#{self.ticket_id} - {author} ({self.created_at:%d/%m/%Y %H:%M})"
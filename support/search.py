@@ -0,0 +1,76 @@
+# support/search.py
+
+# ===========================================================================
+# TÌM KIẾM YÊU CẦU HỖ TRỢ: FULL-TEXT, KHÔNG DẤU
+# ===========================================================================
+#
+# SupportTicket.search_text lưu bản "bỏ dấu + chữ thường" của tiêu đề, nội dung, các tin nhắn trong
+# luồng trao đổi (TicketMessage) và tên đăng nhập / họ tên / email người gửi. Cập nhật qua signal
+# (support/signals.py): tin nhắn mới chỉ nối thêm vào cuối (1 UPDATE), sửa / xoá tin nhắn hoặc đổi
+# thông tin người gửi thì tính lại. Chỉ mục giống tìm kiếm câu hỏi (quiz/search.py):
+#   - SQLite: bảng ảo FTS5 support_supportticket_fts (external content), đồng bộ bằng trigger
+#   - PostgreSQL: chỉ mục GIN trên to_tsvector('simple', search_text)
+# Ghi qua QuerySet.update() / bulk_create không đi qua signal: gọi refresh_search_text.
+
+from django.db import connection
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+
+from quiz.search import drop_text_index, ensure_text_index, filter_text_index, fold_text
+
+TICKET_TABLE = 'support_supportticket'
+
+REQUESTER_FIELDS = ('username', 'first_name', 'last_name', 'email')
+
+
+def build_search_text(subject, message, requester=(), message_bodies=()):
+    return fold_text(' '.join(filter(None, [subject, message, *requester, *message_bodies])))
+
+
+def ticket_search_text(ticket):
+    """search_text của một yêu cầu (tối đa 2 truy vấn: người gửi nếu chưa nạp, tin nhắn nếu đã lưu)"""
+    requester = [getattr(ticket.user, field) for field in REQUESTER_FIELDS] if ticket.user_id else ()
+    bodies = ticket.messages.order_by('created_at', 'id').values_list('body', flat=True) if ticket.pk else ()
+    return build_search_text(ticket.subject, ticket.message, requester, bodies)
+
+
+def append_search_text(ticket_id, body):
+    """Tin nhắn mới: nối vào cuối search_text (không đọc lại cả luồng)"""
+    from .models import SupportTicket
+
+    SupportTicket.objects.filter(pk=ticket_id).update(
+        search_text=Concat(F('search_text'), Value(' ' + fold_text(body)))
+    )
+
+
+def refresh_search_text(ticket_ids):
+    """Tính lại search_text cho các yêu cầu (sau khi sửa / xoá tin nhắn, đổi thông tin người gửi)"""
+    from .models import SupportTicket, TicketMessage
+
+    bodies = {}
+    for ticket_id, body in (
+        TicketMessage.objects.filter(ticket_id__in=ticket_ids).order_by('created_at', 'id').values_list('ticket_id', 'body')
+    ):
+        bodies.setdefault(ticket_id, []).append(body)
+    rows = SupportTicket.objects.filter(pk__in=ticket_ids).values_list(
+        'id', 'subject', 'message', *(f'user__{field}' for field in REQUESTER_FIELDS)
+    )
+    for ticket_id, subject, message, *requester in rows:
+        SupportTicket.objects.filter(pk=ticket_id).update(
+            search_text=build_search_text(subject, message, requester, bodies.get(ticket_id, ()))
+        )
+
+
+# ===== CHỈ MỤC, TÌM KIẾM =====
+
+def ensure_search_index(connection=connection):
+    ensure_text_index(connection, TICKET_TABLE)
+
+
+def drop_search_index(connection=connection):
+    drop_text_index(connection, TICKET_TABLE)
+
+
+def search_tickets(queryset, query):
+    """Lọc queryset yêu cầu hỗ trợ: mọi từ (bỏ dấu) đều phải xuất hiện, khớp theo tiền tố"""
+    return filter_text_index(queryset, TICKET_TABLE, query)
@@ -0,0 +1,53 @@
+# support/signals.py
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import SupportTicket, TicketMessage
+from .search import REQUESTER_FIELDS, append_search_text, ensure_search_index, refresh_search_text, ticket_search_text
+
+
+# ===== CHỈ MỤC TÌM KIẾM YÊU CẦU HỖ TRỢ (search_text đã bỏ dấu, xem support/search.py) =====
+
+@receiver(pre_save, sender=SupportTicket)
+def ticket_search_text_changed(sender, instance, raw=False, update_fields=None, **kwargs):
+    # save(update_fields=[...]) (đánh dấu đã đọc, đổi trạng thái...) không ghi tiêu đề / nội dung / người gửi
+    if not raw and update_fields is None:
+        instance.search_text = ticket_search_text(instance)
+
+
+@receiver(post_save, sender=TicketMessage)
+def message_search_text_changed(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        append_search_text(instance.ticket_id, instance.body)
+    else:
+        refresh_search_text([instance.ticket_id])
+
+
+@receiver(post_delete, sender=TicketMessage)
+def message_search_text_deleted(sender, instance, origin=None, **kwargs):
+    # Chỉ khi xoá chính tin nhắn; xoá yêu cầu / người gửi (cascade sang tin nhắn) thì yêu cầu cũng bị xoá
+    if isinstance(origin, TicketMessage) or (isinstance(origin, QuerySet) and origin.model is TicketMessage):
+        refresh_search_text([instance.ticket_id])
+
+
+@receiver(post_save, sender=get_user_model())
+def requester_search_text_changed(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Đăng nhập chỉ ghi last_login; tài khoản mới chưa có yêu cầu nào
+    if raw or created or (update_fields is not None and not set(update_fields) & set(REQUESTER_FIELDS)):
+        return
+    ticket_ids = list(SupportTicket.objects.filter(user=instance).values_list('id', flat=True))
+    if ticket_ids:
+        refresh_search_text(ticket_ids)
+
+
+@receiver(post_migrate)
+def search_index_after_migrate(sender, app_config, using, **kwargs):
+    # Migration dựng lại bảng support_supportticket trên SQLite làm mất trigger FTS -> tạo lại
+    if app_config.name == 'support':
+        ensure_search_index(connections[using])
@@ -0,0 +1,90 @@
+# support/stats.py
+
+# ===========================================================================
+# THỐNG KÊ YÊU CẦU HỖ TRỢ: 1-2 TRUY VẤN GROUP BY THAY CHO MỖI SỐ ĐẾM 1 LẦN QUÉT BẢNG
+# ===========================================================================
+#
+# Số yêu cầu theo trạng thái / loại / chưa đọc (và theo giáo viên) lấy từ MỘT truy vấn
+# GROUP BY (trạng thái, loại, đã đọc[, giáo viên]) - tối đa vài chục nhóm mỗi giáo viên,
+# cộng dồn trong Python. Top học sinh là truy vấn GROUP BY thứ hai (chỉ trang admin).
+# Kết quả được cache theo từng tổ hợp bộ lọc trong STATS_TIMEOUT giây.
+
+import hashlib
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import SupportTicket
+
+# Số liệu có thể trễ tối đa STATS_TIMEOUT giây so với danh sách yêu cầu
+STATS_TIMEOUT = 30
+TOP_STUDENTS = 10
+
+
+def _cache_key(scope, filters):
+    digest = hashlib.md5(json.dumps(filters, sort_keys=True).encode()).hexdigest()
+    return f'support:stats:{scope}:{digest}'
+
+
+def compute_ticket_stats(tickets, by_teacher=False, top_students=0):
+    """
+    Thống kê của queryset yêu cầu hỗ trợ (đã lọc): 1 truy vấn GROUP BY, +1 nếu top_students,
+    +1 truy vấn lấy username giáo viên / học sinh.
+    """
+    tickets = tickets.order_by()
+    fields = ['status', 'ticket_type', 'is_read'] + (['teacher_id'] if by_teacher else [])
+
+    stats = {
+        'total': 0,
+        'unread': 0,
+        'status': dict.fromkeys(SupportTicket.Status.values, 0),
+        'type': dict.fromkeys(SupportTicket.TicketType.values, 0),
+        'teachers': {},
+        'students': {},
+    }
+    teacher_counts = {}
+    for *group, count in tickets.values_list(*fields).annotate(count=Count('*')):
+        status, ticket_type, is_read = group[:3]
+        stats['total'] += count
+        stats['status'][status] = stats['status'].get(status, 0) + count
+        stats['type'][ticket_type] = stats['type'].get(ticket_type, 0) + count
+        if not is_read:
+            stats['unread'] += count
+        if by_teacher and group[3] is not None:
+            teacher_counts[group[3]] = teacher_counts.get(group[3], 0) + count
+
+    student_counts = []
+    if top_students:
+        student_counts = list(
+            tickets.values_list('user_id').annotate(count=Count('*')).order_by('-count', 'user_id')[:top_students]
+        )
+
+    user_ids = set(teacher_counts) | {user_id for user_id, _ in student_counts}
+    usernames = dict(get_user_model().objects.filter(id__in=user_ids).values_list('id', 'username')) if user_ids else {}
+    stats['teachers'] = {
+        usernames.get(teacher_id, teacher_id): count
+        for teacher_id, count in sorted(teacher_counts.items(), key=lambda item: -item[1])
+    }
+    stats['students'] = {usernames.get(user_id, user_id): count for user_id, count in student_counts}
+    return stats
+
+
+def get_ticket_stats(scope, filters, tickets, **options):
+    """Thống kê đã cache cho (phạm vi, bộ lọc); scope VD: 'admin', 'teacher:12'"""
+    key = _cache_key(scope, filters)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_ticket_stats(tickets, **options)
+        cache.set(key, stats, STATS_TIMEOUT)
+    return stats
+
+
+def type_stats(stats):
+    """{tên loại yêu cầu: số lượng} (bỏ loại không có yêu cầu nào)"""
+    return {
+        label: stats['type'][value]
+        for value, label in SupportTicket.TicketType.choices
+        if stats['type'].get(value)
+    }
@@ -1,3 +1,179 @@
-from django.test import TestCase
+from datetime import datetime, timezone as dt_timezone
 
-# Create your tests here.
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+
+from users.models import User
+
+from .models import SupportTicket, TicketMessage
+from .search import search_tickets
+
+
+# ===== TÌM KIẾM YÊU CẦU HỖ TRỢ (support/search.py) =====
+
+class TicketSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(
+            'hocsinh', 'hocsinh@example.com', 'pw', role='STUDENT', first_name='Lê', last_name='Văn Đức',
+        )
+        cls.teacher = User.objects.create_user('giaovien', 'giaovien@example.com', 'pw', role='TEACHER')
+        cls.ticket = SupportTicket.objects.create(
+            user=cls.student, teacher=cls.teacher, subject='Không nộp được bài', message='Lỗi khi bấm Nộp bài',
+        )
+        cls.other = SupportTicket.objects.create(
+            user=cls.teacher, subject='Đổi mật khẩu', message='Quên mật khẩu đăng nhập',
+        )
+
+    def search(self, query):
+        return set(search_tickets(SupportTicket.objects.all(), query).values_list('id', flat=True))
+
+    def test_accent_insensitive_prefix(self):
+        self.assertEqual(self.search('KHÔNG NỘP'), {self.ticket.pk})
+        self.assertEqual(self.search('khong nop duoc'), {self.ticket.pk})
+        self.assertEqual(self.search('mat kh'), {self.other.pk})
+        # Thông tin người gửi
+        self.assertEqual(self.search('duc'), {self.ticket.pk})
+        self.assertEqual(self.search('giaovien@example'), {self.other.pk})
+
+    def test_operators_are_literal(self):
+        for query in ('"', 'nộp"bài', '*', 'NOT mật', 'bài AND', '(lỗi', 'subject:nop', 'a" OR "b'):
+            with self.subTest(query=query):
+                list(search_tickets(SupportTicket.objects.all(), query))
+        self.assertEqual(self.search('nộp" OR "mật'), set())
+        self.assertEqual(self.search('"lỗi"*'), {self.ticket.pk})
+
+    def test_messages(self):
+        message = TicketMessage.objects.create(ticket=self.ticket, author=self.teacher, body='Em thử tải lại trang')
+        self.assertEqual(self.search('tai lai'), {self.ticket.pk})
+        message.body = 'Em đăng xuất rồi đăng nhập lại'
+        message.save()
+        self.assertEqual(self.search('tai lai'), set())
+        self.assertEqual(self.search('dang xuat'), {self.ticket.pk})
+        message.delete()
+        self.assertEqual(self.search('dang xuat'), set())
+        self.assertEqual(self.search('nop bai'), {self.ticket.pk})
+
+    def test_requester_renamed(self):
+        self.student.last_name = 'Thị Hoa'
+        self.student.save()
+        self.assertEqual(self.search('duc'), set())
+        self.assertEqual(self.search('hoa'), {self.ticket.pk})
+
+    def test_cascade_delete(self):
+        TicketMessage.objects.create(ticket=self.ticket, author=self.student, body='Bổ sung ảnh chụp màn hình')
+        self.ticket.delete()
+        self.assertFalse(SupportTicket.objects.filter(pk=self.ticket.pk).exists())
+        self.assertEqual(self.search('anh chup'), set())
+
+
+# ===== MIGRATION 0004: TÁCH message / admin_response THÀNH TicketMessage =====
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class TicketThreadMigrationTests(TransactionTestCase):
+    migrate_from = [('support', '0003_supportticket_indexes')]
+    migrate_to = [('support', '0004_ticketmessage')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def setUp(self):
+        apps = self.migrate(self.migrate_from)
+        User = apps.get_model('users', 'User')
+        SupportTicket = apps.get_model('support', 'SupportTicket')
+        self.student = User.objects.create(username='hocsinh', email='hocsinh@example.com', role='STUDENT')
+        self.teacher = User.objects.create(username='giaovien', email='giaovien@example.com', role='TEACHER')
+        self.admin = User.objects.create(username='quantri', email='quantri@example.com', role='ADMIN')
+
+        # Bổ sung vắt qua năm mới, một bổ sung của tên đăng nhập không còn tồn tại,
+        # phản hồi + ghi chú cập nhật trạng thái, replied_at chưa có (dữ liệu trước khi có cột)
+        self.thread_message = (
+            "Không nộp được bài"
+            "\n\n--- Bổ sung từ hocsinh (31/12 23:50) ---\nVẫn lỗi"
+            "\n\n--- Bổ sung từ taikhoancu (01/01 08:05) ---\nEm gửi lại ảnh"
+        )
+        self.thread_response = (
+            "Thầy đã mở lại bài"
+            "\n\n--- Cập nhật trạng thái (02/01/2026 09:00) ---\nĐã xử lý"
+        )
+        self.thread = SupportTicket.objects.create(
+            user=self.student, subject='Lỗi nộp bài', message=self.thread_message,
+            admin_response=self.thread_response, replied_by=self.teacher,
+        )
+        # admin_response bắt đầu bằng ghi chú cập nhật trạng thái (đổi trạng thái, chưa ai trả lời)
+        self.status_only = SupportTicket.objects.create(
+            user=self.student, subject='Hỏi điểm', message='Điểm bài 2?',
+            admin_response="\n\n--- Cập nhật trạng thái (05/03/2026 14:30) ---\nĐóng yêu cầu", replied_by=self.admin,
+        )
+        self.plain = SupportTicket.objects.create(user=self.student, subject='Góp ý', message='Giao diện đẹp')
+        SupportTicket.objects.filter(pk=self.thread.pk).update(
+            created_at=utc(2025, 12, 30, 10, 0), updated_at=utc(2026, 1, 1, 12, 0),
+        )
+        SupportTicket.objects.filter(pk=self.status_only.pk).update(
+            created_at=utc(2026, 3, 1, 8, 0), updated_at=utc(2026, 3, 5, 14, 30),
+        )
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def thread_of(self, apps, ticket):
+        TicketMessage = apps.get_model('support', 'TicketMessage')
+        return list(
+            TicketMessage.objects.filter(ticket_id=ticket.pk).order_by('created_at', 'id')
+            .values_list('author_id', 'created_at', 'body')
+        )
+
+    def test_split_and_join(self):
+        apps = self.migrate(self.migrate_to)
+        SupportTicket = apps.get_model('support', 'SupportTicket')
+
+        thread = SupportTicket.objects.get(pk=self.thread.pk)
+        self.assertEqual(thread.message, 'Không nộp được bài')
+        self.assertEqual(self.thread_of(apps, thread), [
+            (self.student.pk, utc(2025, 12, 31, 23, 50), 'Vẫn lỗi'),
+            # Tên đăng nhập không tìm thấy -> người gửi yêu cầu; 01/01 sau 31/12 là năm sau
+            (self.student.pk, utc(2026, 1, 1, 8, 5), 'Em gửi lại ảnh'),
+            # Phản hồi không có mốc thời gian riêng: updated_at (trước các ghi chú nối sau nó)
+            (self.teacher.pk, utc(2026, 1, 1, 12, 0), 'Thầy đã mở lại bài'),
+            (self.teacher.pk, utc(2026, 1, 2, 9, 0), 'Đã xử lý'),
+        ])
+        self.assertEqual(thread.replied_at, utc(2026, 1, 2, 9, 0))
+
+        status_only = SupportTicket.objects.get(pk=self.status_only.pk)
+        self.assertEqual(status_only.message, 'Điểm bài 2?')
+        self.assertEqual(self.thread_of(apps, status_only), [(self.admin.pk, utc(2026, 3, 5, 14, 30), 'Đóng yêu cầu')])
+        self.assertEqual(status_only.replied_at, utc(2026, 3, 5, 14, 30))
+
+        plain = SupportTicket.objects.get(pk=self.plain.pk)
+        self.assertEqual((plain.message, plain.replied_at), ('Giao diện đẹp', None))
+        self.assertEqual(self.thread_of(apps, plain), [])
+
+        # Rollback về 0003: nối lại các khối văn bản
+        apps = self.migrate(self.migrate_from)
+        SupportTicket = apps.get_model('support', 'SupportTicket')
+        thread = SupportTicket.objects.get(pk=self.thread.pk)
+        self.assertEqual(thread.message, self.thread_message.replace('taikhoancu', 'hocsinh'))
+        self.assertEqual(thread.admin_response, self.thread_response)
+        # Sau khi tách, ghi chú trạng thái đứng đầu không còn phân biệt được với phản hồi
+        self.assertEqual(SupportTicket.objects.get(pk=self.status_only.pk).admin_response, 'Đóng yêu cầu')
+        plain = SupportTicket.objects.get(pk=self.plain.pk)
+        self.assertEqual((plain.message, plain.admin_response), ('Giao diện đẹp', None))
+
+    def test_keeps_replied_at(self):
+        apps = self.migrate(self.migrate_from)
+        SupportTicket = apps.get_model('support', 'SupportTicket')
+        SupportTicket.objects.filter(pk=self.thread.pk).update(replied_at=utc(2026, 1, 1, 11, 0))
+        apps = self.migrate(self.migrate_to)
+        SupportTicket = apps.get_model('support', 'SupportTicket')
+        thread = SupportTicket.objects.get(pk=self.thread.pk)
+        self.assertEqual(thread.replied_at, utc(2026, 1, 1, 11, 0))
+        # Phản hồi lấy mốc replied_at
+        self.assertIn((self.teacher.pk, utc(2026, 1, 1, 11, 0), 'Thầy đã mở lại bài'), self.thread_of(apps, thread))